@@ -5,6 +5,11 @@ Analyzes exported WAV files and outputs mood tags + Audial prompts for adjustmen
 Usage:
     python tools/analyze_mood.py path/to/file.wav
     python tools/analyze_mood.py path/to/file.wav --json
+    python tools/analyze_mood.py path/to/file.wav --keys     # key changes over time
+    python tools/analyze_mood.py path/to/long_set.flac --stream  # bounded memory
+    python tools/analyze_mood.py --batch exports/ "renders/*.wav" [--workers N] [--stream]
+
+Results are cached by audio content (see feature_cache.py); pass --no-cache to re-analyze.
 """
 
 import sys
@@ -28,92 +33,501 @@ MAJOR_PROFILE = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39,
 MINOR_PROFILE = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
 
 
+def _standardize(x, axis=-1):
+    """Zero-mean, unit-norm rows so a dot product is a Pearson correlation."""
+    x = x - x.mean(axis=axis, keepdims=True)
+    norm = np.linalg.norm(x, axis=axis, keepdims=True)
+    return np.divide(x, norm, out=np.zeros_like(x), where=norm > 0)
+
+
+# All 24 rotated profiles, standardized once: rows 0-11 major, 12-23 minor.
+# Rolling the chroma by -i against a profile equals rolling the profile by +i.
+KEY_PROFILES = _standardize(np.array(
+    [np.roll(MAJOR_PROFILE, i) for i in range(12)]
+    + [np.roll(MINOR_PROFILE, i) for i in range(12)]
+))
+
+
+def key_scores(chroma_vectors):
+    """Correlate chroma vectors (n, 12) against all 24 key profiles -> (n, 24)."""
+    chroma_vectors = np.atleast_2d(np.asarray(chroma_vectors, dtype=float))
+    return _standardize(chroma_vectors) @ KEY_PROFILES.T
+
+
+def estimate_keys(chroma_vectors):
+    """Estimate (key, mode, confidence) for every row of a chroma matrix (n, 12).
+
+    Scores all rows against all profiles in a single matrix product, so one
+    call covers per-window keys of a track or track-mean chroma of many files.
+    """
+    scores = key_scores(chroma_vectors)
+    major_idx = scores[:, :12].argmax(axis=1)
+    minor_idx = scores[:, 12:].argmax(axis=1)
+    rows = np.arange(len(scores))
+    major_corr = scores[rows, major_idx]
+    minor_corr = scores[rows, 12 + minor_idx]
+
+    keys = []
+    for i in range(len(scores)):
+        if major_corr[i] > minor_corr[i]:
+            keys.append((KEY_NAMES[major_idx[i]], "major", float(major_corr[i])))
+        else:
+            keys.append((KEY_NAMES[minor_idx[i]], "minor", float(minor_corr[i])))
+    return keys
+
+
 def detect_key(y, sr):
     """Detect musical key using chroma features and Krumhansl-Kessler profiles."""
     chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
-    chroma_mean = chroma.mean(axis=1)
-
-    major_corrs = []
-    minor_corrs = []
-    for i in range(12):
-        rolled = np.roll(chroma_mean, -i)
-        major_corrs.append(np.corrcoef(rolled, MAJOR_PROFILE)[0, 1])
-        minor_corrs.append(np.corrcoef(rolled, MINOR_PROFILE)[0, 1])
-
-    best_major_idx = int(np.argmax(major_corrs))
-    best_minor_idx = int(np.argmax(minor_corrs))
-    best_major_corr = major_corrs[best_major_idx]
-    best_minor_corr = minor_corrs[best_minor_idx]
-
-    if best_major_corr > best_minor_corr:
-        return KEY_NAMES[best_major_idx], "major", best_major_corr
-    else:
-        return KEY_NAMES[best_minor_idx], "minor", best_minor_corr
+    return estimate_keys(chroma.mean(axis=1))[0]
+
+
+def window_chroma(chroma, frames_per_window):
+    """Average a (12, T) chroma matrix over consecutive windows -> (n_windows, 12)."""
+    starts = np.arange(0, chroma.shape[1], frames_per_window)
+    counts = np.diff(np.append(starts, chroma.shape[1]))
+    return (np.add.reduceat(chroma, starts, axis=1) / counts).T
+
+
+KEY_WINDOW_SECONDS = 15.0
+
+
+def window_frames(sr, window_seconds=KEY_WINDOW_SECONDS):
+    """Chroma frames (at HOP_LENGTH) per key window."""
+    return max(1, int(round(window_seconds * sr / HOP_LENGTH)))
+
+
+def detect_key_windows(y, sr, window_seconds=KEY_WINDOW_SECONDS, chroma=None):
+    """Detect the key of each window across a track to expose modulations.
+
+    ``chroma`` may pass in the track's (12, T) CQT chroma at HOP_LENGTH (as
+    computed by ``frame_features``) to skip recomputing it.
+    Returns a list of {"start", "end", "key", "mode", "key_confidence"}.
+    """
+    if chroma is None:
+        chroma = librosa.feature.chroma_cqt(y=y, sr=sr, hop_length=HOP_LENGTH)
+    means = window_chroma(chroma, window_frames(sr, window_seconds))
+    return window_keys(means, window_seconds, librosa.get_duration(y=y, sr=sr))
+
+
+def window_keys(window_means, window_seconds, duration):
+    """Key of each row of (n_windows, 12) mean chroma, as detect_key_windows() returns."""
+    windows = []
+    for i, (key, mode, conf) in enumerate(estimate_keys(window_means)):
+        start = i * window_seconds
+        windows.append({
+            "start": round(start, 1),
+            "end": round(min(start + window_seconds, duration), 1),
+            "key": key,
+            "mode": mode,
+            "key_confidence": round(conf, 2),
+        })
+    return windows
+
+
+def modulations(windows):
+    """Reduce per-window keys to the points where the key changes."""
+    changes = []
+    for w in windows:
+        if not changes or (w["key"], w["mode"]) != (changes[-1]["key"], changes[-1]["mode"]):
+            changes.append(w)
+    return changes
 
 
 # --- Feature extraction ---
 
-def analyze(filepath):
-    """Extract all mood-relevant features from an audio file."""
-    y, sr = librosa.load(filepath, sr=22050, mono=True)
-    duration = librosa.get_duration(y=y, sr=sr)
+SAMPLE_RATE = 22050
+N_FFT = 2048
+HOP_LENGTH = 512
 
-    # Tempo
-    tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
-    tempo = float(np.atleast_1d(tempo)[0])
+# Normalisation constants for the 0-1 feature scales
+ENERGY_SCALE = 0.15       # typical RMS range for music
+BRIGHTNESS_FLOOR = 500    # Hz — centroid at/below this reads as 0
+BRIGHTNESS_SPAN = 4000    # Hz — <1500 = dark, >4000 = bright
+DENSITY_SCALE = 3000      # Hz of spectral bandwidth
+RHYTHM_SCALE = 15.0       # mean onset strength
 
-    # Key
-    key_name, key_mode, key_confidence = detect_key(y, sr)
 
-    # Energy (RMS)
-    rms = librosa.feature.rms(y=y)[0]
-    energy_mean = float(rms.mean())
-    energy_max = float(rms.max())
-    # Normalize to 0-1 scale (typical RMS range for music)
-    energy_norm = min(1.0, energy_mean / 0.15)
+def frame_features(y, sr):
+    """Compute every frame-level descriptor from one shared STFT.
 
-    # Spectral centroid (brightness)
-    centroid = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
-    brightness = float(centroid.mean())
-    # Normalize: <1500 = dark, >4000 = bright
-    brightness_norm = min(1.0, max(0.0, (brightness - 500) / 4000))
+    The magnitude spectrogram is computed once and reused for centroid,
+    bandwidth, flatness and the mel/onset envelopes, so the result matches
+    calling each librosa feature on ``y`` separately.
+    """
+    S = np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH))
 
-    # Spectral bandwidth (texture density)
-    bandwidth = librosa.feature.spectral_bandwidth(y=y, sr=sr)[0]
-    density_norm = min(1.0, float(bandwidth.mean()) / 3000)
+    centroid = librosa.feature.spectral_centroid(S=S, sr=sr)[0]
+    bandwidth = librosa.feature.spectral_bandwidth(
+        S=S, sr=sr, centroid=centroid[np.newaxis, :])[0]
+    flatness = librosa.feature.spectral_flatness(S=S)[0]
 
-    # Spectral flatness (noise-like vs tonal)
-    flatness = librosa.feature.spectral_flatness(y=y)[0]
-    flatness_mean = float(flatness.mean())
+    # Onset envelopes share one mel spectrogram: beat tracking aggregates
+    # with the median, rhythmic activity with the mean (librosa defaults)
+    mel_db = librosa.power_to_db(librosa.feature.melspectrogram(S=S**2, sr=sr))
+    onset_env = librosa.onset.onset_strength(S=mel_db, sr=sr)
+    beat_env = librosa.onset.onset_strength(S=mel_db, sr=sr, aggregate=np.median)
 
-    # Zero crossing rate (percussiveness)
-    zcr = librosa.feature.zero_crossing_rate(y=y)[0]
-    percussiveness = float(zcr.mean())
+    # RMS and ZCR are framed directly from y (no transform needed)
+    rms = librosa.feature.rms(y=y, frame_length=N_FFT, hop_length=HOP_LENGTH)[0]
+    zcr = librosa.feature.zero_crossing_rate(y, frame_length=N_FFT, hop_length=HOP_LENGTH)[0]
 
-    # Onset strength (rhythmic activity)
-    onset_env = librosa.onset.onset_strength(y=y, sr=sr)
-    rhythmic_activity = float(onset_env.mean())
-    rhythmic_norm = min(1.0, rhythmic_activity / 15.0)
+    # Chroma for key detection (CQT — not derivable from the STFT)
+    chroma = librosa.feature.chroma_cqt(y=y, sr=sr, hop_length=HOP_LENGTH)
+
+    return {
+        "rms": rms,
+        "centroid": centroid,
+        "bandwidth": bandwidth,
+        "flatness": flatness,
+        "zcr": zcr,
+        "onset": onset_env,
+        "beat_onset": beat_env,
+        "chroma": chroma,
+    }
 
-    # Dynamics (variation in energy)
-    dynamics = float(rms.std() / (rms.mean() + 1e-8))
 
+def slice_frames(frames, start, stop):
+    """Frames [start, stop) of a ``frame_features`` dict."""
+    return {name: values[..., start:stop] for name, values in frames.items()
+            if name != "start_frame"}
+
+
+def concat_frames(parts):
+    """Join consecutive ``frame_features`` dicts along the time axis."""
+    parts = list(parts)
+    return {name: np.concatenate([p[name] for p in parts], axis=-1)
+            for name in parts[0] if name != "start_frame"}
+
+
+class FeatureAccumulator:
+    """Running sums over frame-level descriptors.
+
+    Frames can be fed in any number of chunks; ``features()`` reduces them to
+    the normalised feature dict returned by ``analyze()``. Only the onset
+    envelope used for tempo is kept per frame (one float per hop).
+
+    With ``key_window_seconds`` set, chroma is also summed per key window
+    (frames at ``sr``), for ``key_windows()``.
+    """
+
+    MEAN_KEYS = ("centroid", "bandwidth", "flatness", "zcr", "onset")
+
+    def __init__(self, key_window_seconds=0.0, sr=SAMPLE_RATE):
+        self.n_frames = 0
+        self.sums = dict.fromkeys(self.MEAN_KEYS, 0.0)
+        self.rms_sum = 0.0
+        self.rms_sq_sum = 0.0
+        self.chroma_sum = np.zeros(12)
+        self.beat_onset = []
+        self.key_window_seconds = key_window_seconds
+        self.key_window_frames = window_frames(sr, key_window_seconds) if key_window_seconds else 0
+        self.window_chroma_sums = np.zeros((0, 12))
+        self.window_counts = np.zeros(0)
+
+    def update(self, frames):
+        rms = frames["rms"].astype(np.float64)
+        self.n_frames += len(rms)
+        self.rms_sum += float(rms.sum())
+        self.rms_sq_sum += float((rms ** 2).sum())
+        for name in self.MEAN_KEYS:
+            self.sums[name] += float(frames[name].sum(dtype=np.float64))
+        self.chroma_sum += frames["chroma"].sum(axis=1)
+        self.beat_onset.append(frames["beat_onset"])
+        if self.key_window_frames:
+            self._update_windows(frames)
+
+    def _update_windows(self, frames):
+        chroma = frames["chroma"]
+        start = frames.get("start_frame", 0)
+        window = (start + np.arange(chroma.shape[1])) // self.key_window_frames
+        n_windows = int(window[-1]) + 1 if len(window) else 0
+        if n_windows > len(self.window_counts):
+            grow = n_windows - len(self.window_counts)
+            self.window_chroma_sums = np.vstack([self.window_chroma_sums, np.zeros((grow, 12))])
+            self.window_counts = np.append(self.window_counts, np.zeros(grow))
+        np.add.at(self.window_chroma_sums, window, chroma.T)
+        self.window_counts += np.bincount(window, minlength=len(self.window_counts))
+
+    def key_windows(self, duration):
+        """Per-window keys of the frames seen so far, as detect_key_windows() returns."""
+        means = self.window_chroma_sums / np.maximum(self.window_counts, 1)[:, None]
+        return window_keys(means, self.key_window_seconds, duration)
+
+    def features(self, sr, duration):
+        n = max(self.n_frames, 1)
+
+        # Tempo
+        beat_onset = np.concatenate(self.beat_onset) if self.beat_onset else np.zeros(1)
+        tempo, _ = librosa.beat.beat_track(onset_envelope=beat_onset, sr=sr)
+        tempo = float(np.atleast_1d(tempo)[0])
+
+        # Key
+        key_name, key_mode, key_confidence = estimate_keys(self.chroma_sum / n)[0]
+
+        # Energy (RMS)
+        energy_mean = self.rms_sum / n
+        energy_norm = min(1.0, energy_mean / ENERGY_SCALE)
+
+        # Spectral centroid (brightness)
+        brightness = self.sums["centroid"] / n
+        brightness_norm = min(1.0, max(0.0, (brightness - BRIGHTNESS_FLOOR) / BRIGHTNESS_SPAN))
+
+        # Spectral bandwidth (texture density)
+        density_norm = min(1.0, (self.sums["bandwidth"] / n) / DENSITY_SCALE)
+
+        # Spectral flatness (noise-like vs tonal)
+        flatness_mean = self.sums["flatness"] / n
+
+        # Zero crossing rate (percussiveness)
+        percussiveness = self.sums["zcr"] / n
+
+        # Onset strength (rhythmic activity)
+        rhythmic_activity = self.sums["onset"] / n
+        rhythmic_norm = min(1.0, rhythmic_activity / RHYTHM_SCALE)
+
+        # Dynamics (variation in energy)
+        energy_std = np.sqrt(max(0.0, self.rms_sq_sum / n - energy_mean ** 2))
+        dynamics = float(energy_std / (energy_mean + 1e-8))
+
+        return {
+            "duration": round(duration, 1),
+            "tempo": round(tempo, 1),
+            "key": key_name,
+            "mode": key_mode,
+            "key_confidence": round(key_confidence, 2),
+            "energy": round(energy_norm, 2),
+            "brightness": round(brightness_norm, 2),
+            "density": round(density_norm, 2),
+            "flatness": round(flatness_mean, 3),
+            "percussiveness": round(percussiveness, 3),
+            "rhythmic_activity": round(rhythmic_norm, 2),
+            "dynamics": round(dynamics, 2),
+        }
+
+
+def analyze_signal(y, sr, frames=None):
+    """Extract all mood-relevant features from an already-decoded signal.
+
+    ``frames`` may pass in ``frame_features(y, sr)`` when the caller needs them too.
+    """
+    acc = FeatureAccumulator()
+    acc.update(frame_features(y, sr) if frames is None else frames)
+    return acc.features(sr, librosa.get_duration(y=y, sr=sr))
+
+
+def analyze(filepath, keys=False):
+    """Extract all mood-relevant features from an audio file.
+
+    With ``keys``, the result also holds "key_windows" (detect_key_windows()),
+    sharing the chroma pass with the track key.
+    """
+    y, sr = librosa.load(filepath, sr=SAMPLE_RATE, mono=True)
+    if not keys:
+        return analyze_signal(y, sr)
+    frames = frame_features(y, sr)
+    features = analyze_signal(y, sr, frames)
+    features["key_windows"] = detect_key_windows(y, sr, chroma=frames["chroma"])
+    return features
+
+
+# --- Streaming analysis (long recordings) ---
+
+STREAM_BLOCK_SECONDS = 30.0
+# Real audio kept either side of a block so CQT chroma frames match a full decode
+CHROMA_CONTEXT = 176 * HOP_LENGTH  # ~4 s at 22050 Hz
+
+# Onset frame t compares mel frames t-2 and t-3 (lag 1 plus the centering offset)
+_ONSET_OFFSET = 1 + N_FFT // (2 * HOP_LENGTH)
+_TOP_DB = 80.0
+
+
+def _read_blocks(filepath, block_seconds):
+    """Yield mono float32 blocks of a file resampled to SAMPLE_RATE."""
+    import soundfile as sf
+    import soxr
+
+    with sf.SoundFile(filepath) as f:
+        resampler = None
+        if f.samplerate != SAMPLE_RATE:
+            resampler = soxr.ResampleStream(f.samplerate, SAMPLE_RATE, 1, dtype="float32", quality="HQ")
+        blocksize = max(1, int(block_seconds * f.samplerate))
+        while True:
+            block = f.read(blocksize, dtype="float32", always_2d=True)
+            last = len(block) < blocksize
+            block = block.mean(axis=1)
+            if resampler is not None:
+                block = resampler.resample_chunk(block, last=last)
+            if len(block):
+                yield block
+            if last:
+                return
+
+
+def stream_frame_features(filepath, block_seconds=STREAM_BLOCK_SECONDS, blocks=None):
+    """Yield ``frame_features``-style dicts for consecutive frame ranges of a file.
+
+    The file is read block by block, so memory is bounded by the block size
+    rather than the file length. Frames are aligned exactly with a full decode;
+    the one approximation is the 80 dB floor of the onset spectrogram, which is
+    taken relative to the loudest frame seen so far instead of the whole file.
+    ``blocks`` may supply mono SAMPLE_RATE float32 blocks from another decoder.
+    """
+    half = N_FFT // 2
+    context = max(CHROMA_CONTEXT, half)
+
+    raw = np.zeros(0, dtype=np.float32)  # real samples, starting at raw_start
+    raw_start = 0
+    total = None                          # signal length, known once the file ends
+    first_sample = None
+    next_frame = 0
+    mel_history = None                    # last _ONSET_OFFSET mel frames (dB, unclipped)
+    db_max = -np.inf
+
+    def segment(lo, hi, pad):
+        """Samples [lo, hi) of the signal, padded past either end like librosa."""
+        out = np.empty(hi - lo, dtype=np.float32)
+        src_lo = max(lo, 0)
+        src_hi = hi if total is None else min(hi, total)
+        out[src_lo - lo:src_hi - lo] = raw[src_lo - raw_start:src_hi - raw_start]
+        if pad == "edge":
+            out[:src_lo - lo] = first_sample
+            out[src_hi - lo:] = raw[total - 1 - raw_start] if total else 0.0
+        else:
+            out[:src_lo - lo] = 0.0
+            out[src_hi - lo:] = 0.0
+        return out
+
+    if blocks is None:
+        blocks = _read_blocks(filepath, block_seconds)
+    while total is None or next_frame < 1 + total // HOP_LENGTH:
+        block = next(blocks, None)
+        if block is None:
+            total = raw_start + len(raw)
+            if total == 0:
+                return
+            stop_frame = 1 + total // HOP_LENGTH
+        else:
+            if first_sample is None:
+                first_sample = block[0]
+            raw = np.concatenate([raw, block])
+            stop_frame = max(next_frame, (raw_start + len(raw) - context) // HOP_LENGTH)
+        if stop_frame <= next_frame:
+            continue
+
+        f0, f1 = next_frame, stop_frame
+        lo, hi = f0 * HOP_LENGTH - half, (f1 - 1) * HOP_LENGTH + half
+
+        y_const = segment(lo, hi, "constant")
+        S = np.abs(librosa.stft(y_const, n_fft=N_FFT, hop_length=HOP_LENGTH, center=False))
+        centroid = librosa.feature.spectral_centroid(S=S, sr=SAMPLE_RATE)[0]
+        bandwidth = librosa.feature.spectral_bandwidth(
+            S=S, sr=SAMPLE_RATE, centroid=centroid[np.newaxis, :])[0]
+        flatness = librosa.feature.spectral_flatness(S=S)[0]
+        frames_y = librosa.util.frame(y_const, frame_length=N_FFT, hop_length=HOP_LENGTH)
+        rms = np.sqrt(np.mean(np.abs(frames_y) ** 2, axis=0))
+        zcr = librosa.feature.zero_crossing_rate(
+            segment(lo, hi, "edge"), frame_length=N_FFT, hop_length=HOP_LENGTH, center=False)[0]
+
+        # Onset: diff against the previous mel frames, floored at running max - 80 dB
+        mel_db = librosa.power_to_db(
+            librosa.feature.melspectrogram(S=S**2, sr=SAMPLE_RATE), top_db=None)
+        db_max = max(db_max, float(mel_db.max()))
+        if mel_history is not None:
+            mel_db = np.concatenate([mel_history, mel_db], axis=1)
+        mel_history = mel_db[:, -_ONSET_OFFSET:]
+        floored = np.maximum(mel_db, db_max - _TOP_DB)
+        diff = np.maximum(0.0, floored[:, 1:] - floored[:, :-1])
+        # Frame t uses mel frames (t-3, t-2); the first _ONSET_OFFSET frames are zero
+        n_lead = min(f1 - f0, max(0, _ONSET_OFFSET - f0))
+        diff = diff[:, :f1 - f0 - n_lead]
+        onset = np.concatenate([np.zeros(n_lead), diff.mean(axis=0)])
+        beat_onset = np.concatenate([np.zeros(n_lead), np.median(diff, axis=0)])
+
+        # Chroma from a context-padded slice so CQT frames match a full decode
+        c_lo = max(0, f0 * HOP_LENGTH - context)
+        c_lo -= c_lo % HOP_LENGTH
+        c_hi = (f1 - 1) * HOP_LENGTH + context
+        if total is not None:
+            c_hi = min(c_hi, total)
+        chroma = librosa.feature.chroma_cqt(
+            y=segment(c_lo, c_hi, "constant"), sr=SAMPLE_RATE, hop_length=HOP_LENGTH)
+        first = f0 - c_lo // HOP_LENGTH
+        chroma = chroma[:, first:first + (f1 - f0)]
+
+        yield {
+            "start_frame": f0,
+            "rms": rms,
+            "centroid": centroid,
+            "bandwidth": bandwidth,
+            "flatness": flatness,
+            "zcr": zcr,
+            "onset": onset,
+            "beat_onset": beat_onset,
+            "chroma": chroma,
+        }
+
+        next_frame = f1
+        keep_from = max(0, f1 * HOP_LENGTH - context)
+        keep_from -= keep_from % HOP_LENGTH
+        if keep_from > raw_start:
+            raw = raw[keep_from - raw_start:]
+            raw_start = keep_from
+
+
+def analyze_stream(filepath, block_seconds=STREAM_BLOCK_SECONDS, keys=False):
+    """Streaming equivalent of ``analyze()`` with memory flat in file length."""
+    import soundfile as sf
+
+    acc = FeatureAccumulator(KEY_WINDOW_SECONDS if keys else 0.0)
+    for frames in stream_frame_features(filepath, block_seconds):
+        acc.update(frames)
+    duration = sf.info(filepath).duration
+    features = acc.features(SAMPLE_RATE, duration)
+    if keys:
+        features["key_windows"] = acc.key_windows(duration)
+    return features
+
+
+# --- Feature cache ---
+
+# Bump when the feature extraction changes in a way the parameters below don't capture
+ANALYZER_VERSION = 2
+
+
+def analysis_params(stream=False):
+    """Everything that affects analyze() output, for the cache fingerprint."""
     return {
-        "duration": round(duration, 1),
-        "tempo": round(tempo, 1),
-        "key": key_name,
-        "mode": key_mode,
-        "key_confidence": round(key_confidence, 2),
-        "energy": round(energy_norm, 2),
-        "brightness": round(brightness_norm, 2),
-        "density": round(density_norm, 2),
-        "flatness": round(flatness_mean, 3),
-        "percussiveness": round(percussiveness, 3),
-        "rhythmic_activity": round(rhythmic_norm, 2),
-        "dynamics": round(dynamics, 2),
+        "version": ANALYZER_VERSION,
+        "librosa": librosa.__version__,
+        "stream": stream,
+        "sample_rate": SAMPLE_RATE,
+        "n_fft": N_FFT,
+        "hop_length": HOP_LENGTH,
+        "energy_scale": ENERGY_SCALE,
+        "brightness_floor": BRIGHTNESS_FLOOR,
+        "brightness_span": BRIGHTNESS_SPAN,
+        "density_scale": DENSITY_SCALE,
+        "rhythm_scale": RHYTHM_SCALE,
+        "major_profile": MAJOR_PROFILE.tolist(),
+        "minor_profile": MINOR_PROFILE.tolist(),
     }
 
 
+def cached_analyze(filepath, stream=False, cache=None, keys=False):
+    """analyze() (or analyze_stream()) backed by the content-addressed feature cache."""
+    from feature_cache import cached
+
+    params = analysis_params(stream)
+    if keys:
+        params["key_window_seconds"] = KEY_WINDOW_SECONDS  # separate entry: carries key_windows
+    if stream:
+        compute = lambda: analyze_stream(filepath, keys=keys)
+    else:
+        compute = lambda: analyze(filepath, keys=keys)
+    return cached(filepath, params, compute, cache)
+
+
 # --- Mood tagging ---
 
 def tag_mood(features):
@@ -222,7 +636,7 @@ def suggest_changes(features, tags):
 
 # --- Output ---
 
-def print_report(filepath, features, tags, suggestions):
+def print_report(filepath, features, tags, suggestions, key_windows=None):
     """Print a human-readable mood report."""
     print(f"\n{'='*55}")
     print(f"  MOOD ANALYSIS: {os.path.basename(filepath)}")
@@ -246,6 +660,11 @@ def print_report(filepath, features, tags, suggestions):
 
     print(f"\n  Mood tags:  {', '.join(tags)}")
 
+    if key_windows:
+        print(f"\n  Key changes:")
+        for w in modulations(key_windows):
+            print(f"    {w['start']:5.0f}s  {w['key']} {w['mode']} (confidence: {w['key_confidence']})")
+
     if suggestions:
         print(f"\n  To adjust in Audial:")
         for direction, prompt in suggestions:
@@ -254,40 +673,149 @@ def print_report(filepath, features, tags, suggestions):
     print(f"{'='*55}\n")
 
 
-def print_json(features, tags, suggestions):
-    """Print machine-readable JSON output."""
-    import json
-    output = {
+def json_output(features, tags, suggestions):
+    """Machine-readable result dict shared by --json and --batch."""
+    return {
         **features,
         "mood_tags": tags,
         "suggestions": [{"direction": d, "prompt": p} for d, p in suggestions],
     }
+
+
+def print_json(features, tags, suggestions, key_windows=None):
+    """Print machine-readable JSON output."""
+    import json
+    output = json_output(features, tags, suggestions)
+    if key_windows is not None:
+        output["key_windows"] = key_windows
     print(json.dumps(output, indent=2))
 
 
+# --- Batch mode ---
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".flac", ".ogg")
+
+
+def collect_audio_files(patterns):
+    """Expand directories (recursively) and glob patterns into audio file paths."""
+    import glob
+
+    files = []
+    seen = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = []
+            for root, _, names in os.walk(pattern):
+                matches.extend(os.path.join(root, n) for n in names)
+        else:
+            matches = glob.glob(pattern, recursive=True) or [pattern]
+        for path in sorted(matches):
+            if path.lower().endswith(AUDIO_EXTENSIONS) and path not in seen:
+                seen.add(path)
+                files.append(path)
+    return files
+
+
+def analyze_file_result(filepath, stream=False, use_cache=True):
+    """Analyze one file for batch mode; errors are returned, not raised."""
+    try:
+        if use_cache:
+            features = cached_analyze(filepath, stream)
+        else:
+            features = analyze_stream(filepath) if stream else analyze(filepath)
+        tags = tag_mood(features)
+        return {"file": filepath, **json_output(features, tags, suggest_changes(features, tags))}
+    except Exception as e:
+        return {"file": filepath, "error": f"{type(e).__name__}: {e}"}
+
+
+def run_batch(files, workers=None, stream=False, use_cache=True):
+    """Analyze files across a process pool, yielding results as each one finishes."""
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=min(workers, max(len(files), 1))) as pool:
+        futures = {pool.submit(analyze_file_result, f, stream, use_cache): f for f in files}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:  # worker crashed (e.g. killed by the OS)
+                yield {"file": futures[future], "error": f"{type(e).__name__}: {e}"}
+
+
+def batch_main(args):
+    """--batch <dirs/globs...> [--workers N] [--stream] [--no-cache]: one JSON line per file."""
+    import json
+
+    workers = None
+    stream = False
+    use_cache = True
+    patterns = []
+    i = 0
+    while i < len(args):
+        if args[i] == "--workers" and i + 1 < len(args):
+            workers = int(args[i + 1]); i += 2
+        elif args[i] == "--stream":
+            stream = True; i += 1
+        elif args[i] == "--no-cache":
+            use_cache = False; i += 1
+        elif args[i] == "--json":
+            i += 1
+        else:
+            patterns.append(args[i]); i += 1
+
+    files = collect_audio_files(patterns)
+    if not files:
+        print(f"Error: no audio files found in: {' '.join(patterns)}", file=sys.stderr)
+        sys.exit(1)
+
+    failed = 0
+    for result in run_batch(files, workers=workers, stream=stream, use_cache=use_cache):
+        failed += "error" in result
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+
+    print(f"  analyzed {len(files) - failed}/{len(files)} files ({failed} failed)", file=sys.stderr)
+    if failed:
+        sys.exit(2)
+
+
 # --- Main ---
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python tools/analyze_mood.py <audio_file> [--json]")
+        print("Usage: python tools/analyze_mood.py <audio_file> [--json] [--keys] [--stream] [--no-cache]")
+        print("       python tools/analyze_mood.py --batch <dir_or_glob>... [--workers N] [--stream] [--no-cache]")
         print("  Supported: .wav, .mp3, .flac, .ogg")
         sys.exit(1)
 
+    if sys.argv[1] == "--batch":
+        batch_main(sys.argv[2:])
+        return
+
     filepath = sys.argv[1]
     use_json = "--json" in sys.argv
+    show_keys = "--keys" in sys.argv
+    stream = "--stream" in sys.argv
+    use_cache = "--no-cache" not in sys.argv
 
     if not os.path.exists(filepath):
         print(f"Error: file not found: {filepath}")
         sys.exit(1)
 
-    features = analyze(filepath)
+    if use_cache:
+        features = cached_analyze(filepath, stream, keys=show_keys)
+    elif stream:
+        features = analyze_stream(filepath, keys=show_keys)
+    else:
+        features = analyze(filepath, keys=show_keys)
+    windows = features.pop("key_windows", None)
     tags = tag_mood(features)
     suggestions = suggest_changes(features, tags)
 
     if use_json:
-        print_json(features, tags, suggestions)
+        print_json(features, tags, suggestions, windows)
     else:
-        print_report(filepath, features, tags, suggestions)
+        print_report(filepath, features, tags, suggestions, windows)
 
 
 if __name__ == "__main__":
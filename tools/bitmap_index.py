@@ -0,0 +1,223 @@
+"""
+Bitmap Indexes and Facet Counts
+One bitset per tag, category, key, mode and game of the track library.
+
+Bit i of a bitmap is set when library row i has that value. Boolean filter
+combinations become bitwise operations on whole bitmaps (OR within a facet,
+AND across facets), and the facet counts of any result set are popcounts:
+
+    count(category=c | results) = (bitmap[category][c] & results).bit_count()
+
+so "how many of the dark minor tracks fall in each category" costs one AND
+and one popcount per category, not a pass over the tracks. Bitmaps are plain
+Python ints.
+
+The index is saved to data/tracks.bitmaps.json and rebuilt from the library
+whenever tracks.json or its journal changes. search_tracks --facets builds
+one in memory when none has been saved.
+
+Usage:
+    python tools/bitmap_index.py build
+    python tools/bitmap_index.py status
+    python tools/bitmap_index.py facets [category|game|key|mode|tag]
+"""
+
+import sys
+import os
+import json
+
+try:
+    sys.stdout.reconfigure(encoding="utf-8")
+except AttributeError:
+    pass
+
+sys.path.insert(0, os.path.dirname(__file__))
+import track_store
+
+INDEX_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "tracks.bitmaps.json")
+FORMAT_VERSION = 1
+
+FACETS = ("category", "game", "key", "mode", "tag")
+
+
+def facet_values(track: dict, facet: str) -> list[str]:
+    """The values a track has for a facet (tags: every tag; others: one value)."""
+    if facet == "tag":
+        return [tag for tag in (track.get("tags") or []) if tag]
+    return [track.get(facet) or ""]
+
+
+def enabled(index_file: str = INDEX_FILE) -> bool:
+    """True once an index has been built (``bitmap_index.py build``)."""
+    return os.path.exists(index_file)
+
+
+class BitmapIndex:
+    def __init__(self, size: int, bitmaps: dict[str, dict[str, int]], signature: str = ""):
+        self.size = size
+        # facet -> value -> bitset, values in order of first appearance
+        self.bitmaps = bitmaps
+        self.signature = signature
+
+    @classmethod
+    def from_tracks(cls, tracks: list[dict], signature: str = "") -> "BitmapIndex":
+        bitmaps = {facet: {} for facet in FACETS}
+        for facet in FACETS:
+            rows = {}
+            for row, track in enumerate(tracks):
+                for value in facet_values(track, facet):
+                    rows.setdefault(value, []).append(row)
+            bitmaps[facet] = {value: rows_to_bits(r) for value, r in rows.items()}
+        return cls(len(tracks), bitmaps, signature)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def match(self, facet: str, predicate) -> int:
+        """OR of the bitmaps of every value of facet satisfying predicate(value)."""
+        bits = 0
+        for value, bitmap in self.bitmaps[facet].items():
+            if predicate(value):
+                bits |= bitmap
+        return bits
+
+    def key_bits(self, key_query: str) -> int:
+        """search_tracks --key semantics: substring of "<key> <mode>", case-insensitive."""
+        k = key_query.lower()
+        bits = 0
+        for key, key_bitmap in self.bitmaps["key"].items():
+            for mode, mode_bitmap in self.bitmaps["mode"].items():
+                if k in f"{key} {mode}".strip().lower():
+                    bits |= key_bitmap & mode_bitmap
+        return bits
+
+    def select(self, key: str | None = None, category: str | None = None,
+               game: str | None = None, tags: list[str] | None = None) -> int | None:
+        """Bitset of rows matching every given filter (None: no filter given).
+
+        key/category/game match as search_tracks does (case-insensitive
+        substring); each tag in ``tags`` must be one of the track's tags exactly.
+        """
+        bits = None
+        parts = []
+        if key:
+            parts.append(self.key_bits(key))
+        for facet, query in (("category", category), ("game", game)):
+            if query:
+                q = query.lower()
+                parts.append(self.match(facet, lambda v: q in v.lower()))
+        for tag in tags or []:
+            parts.append(self.bitmaps["tag"].get(tag, 0))
+        for part in parts:
+            bits = part if bits is None else bits & part
+        return bits
+
+    def facet_counts(self, facet: str, bits: int | None = None,
+                     min_count: int = 1) -> list[tuple[str, int]]:
+        """(value, count) within the rows of ``bits`` (default: all), most common first."""
+        counts = []
+        for value, bitmap in self.bitmaps[facet].items():
+            n = (bitmap if bits is None else bitmap & bits).bit_count()
+            if n >= min_count:
+                counts.append((value, n))
+        counts.sort(key=lambda x: -x[1])
+        return counts
+
+    def facets(self, bits: int | None = None) -> dict[str, list[tuple[str, int]]]:
+        return {facet: self.facet_counts(facet, bits) for facet in FACETS}
+
+    def to_json(self) -> dict:
+        return {
+            "version": FORMAT_VERSION,
+            "signature": self.signature,
+            "size": self.size,
+            "bitmaps": {facet: {value: format(bits, "x") for value, bits in values.items()}
+                        for facet, values in self.bitmaps.items()},
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "BitmapIndex":
+        bitmaps = {facet: {value: int(bits, 16) for value, bits in values.items()}
+                   for facet, values in data["bitmaps"].items()}
+        return cls(data["size"], bitmaps, data.get("signature", ""))
+
+
+def rows_to_bits(rows) -> int:
+    """Bitset with bit i set for each row i."""
+    if not rows:
+        return 0
+    buf = bytearray((max(rows) >> 3) + 1)
+    for row in rows:
+        buf[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(buf, "little")
+
+
+def bits_to_rows(bits: int) -> list[int]:
+    """Rows of a bitset, ascending."""
+    rows = []
+    data = bits.to_bytes((bits.bit_length() + 7) >> 3, "little")
+    for i, byte in enumerate(data):
+        while byte:
+            low = byte & -byte
+            rows.append((i << 3) + low.bit_length() - 1)
+            byte ^= low
+    return rows
+
+
+def load(index_file: str = INDEX_FILE) -> BitmapIndex | None:
+    data = track_store.load_index_json(index_file, FORMAT_VERSION)
+    return BitmapIndex.from_json(data) if data is not None else None
+
+
+def save(index: BitmapIndex, index_file: str = INDEX_FILE):
+    track_store.save_index_json(index, index_file)
+
+
+def open_index(tracks: list[dict] | None = None, index_file: str = INDEX_FILE,
+               json_path: str = track_store.DB_PATH) -> BitmapIndex | None:
+    """The saved index, rebuilt from the library if stale.
+
+    ``tracks`` is the current library when the caller already has it loaded.
+    Returns None when no index has been built (the feature is off).
+    """
+    def refresh(_, signature):
+        return BitmapIndex.from_tracks(
+            tracks if tracks is not None else track_store.load_tracks(json_path), signature)
+
+    return track_store.open_index(index_file, load, refresh, save, tracks, json_path)
+
+
+def build(index_file: str = INDEX_FILE, json_path: str = track_store.DB_PATH) -> BitmapIndex:
+    signature = track_store.library_signature(json_path)
+    index = BitmapIndex.from_tracks(track_store.load_tracks(json_path), signature)
+    save(index, index_file)
+    return index
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("build", "status", "facets"):
+        print(__doc__.strip())
+        sys.exit(1)
+
+    cmd = sys.argv[1]
+    if cmd == "build":
+        index = build()
+        plural = {"category": "categories"}
+        print(f"  {os.path.normpath(INDEX_FILE)}: {len(index)} tracks, "
+              + ", ".join(f"{len(index.bitmaps[f])} {plural.get(f, f + 's')}" for f in FACETS))
+    elif cmd == "status":
+        track_store.print_index_status("Bitmap index", INDEX_FILE, load)
+    else:
+        facets = sys.argv[2:] or list(FACETS)
+        index = open_index() or BitmapIndex.from_tracks(track_store.load_tracks())
+        for facet in facets:
+            if facet not in FACETS:
+                print(f"  Unknown facet: {facet} (one of {', '.join(FACETS)})")
+                sys.exit(1)
+            print(f"\n  {facet}:")
+            for value, n in index.facet_counts(facet):
+                print(f"    {n:>5}  {value or '(none)'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+BM25 Text Ranking
+Relevance scores for the free words of search_tracks --recommend.
+
+Each track is a document made of its audial_prompt, tags, aliases and notes
+(plus title and game, so a named game or piece still counts). For a query
+term t and a track d:
+
+    idf(t)      = ln(1 + (N - df + 0.5) / (df + 0.5))
+    score(t, d) = idf(t) * tf * (K1 + 1) / (tf + K1 * (1 - B + B * len(d) / avg_len))
+
+so a word that appears on a handful of tracks outweighs one that appears on
+half of them, and repeating a word in a long note counts for less than once
+in a short tag list. A query term that is not a whole word of any track falls
+back to the words it is a prefix of ("sacr" -> "sacred", "sacrifice").
+
+Scoring only walks the postings of the query terms. The index is saved to
+data/tracks.bm25.json and rebuilt from the library whenever tracks.json or
+its journal changes; --recommend builds one in memory when none is saved.
+
+Usage:
+    python tools/bm25_index.py build
+    python tools/bm25_index.py status
+    python tools/bm25_index.py query "dark sacred choir"
+"""
+
+import sys
+import os
+import re
+import math
+import heapq
+from bisect import bisect_left
+
+try:
+    sys.stdout.reconfigure(encoding="utf-8")
+except AttributeError:
+    pass
+
+sys.path.insert(0, os.path.dirname(__file__))
+import track_store
+
+INDEX_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "tracks.bm25.json")
+FORMAT_VERSION = 1
+
+K1 = 1.2
+B = 0.75
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+def document_terms(track: dict) -> list[str]:
+    """The terms of one track's document, with repeats."""
+    parts = [track.get("audial_prompt") or "", track.get("notes") or "",
+             track.get("title") or "", track.get("game") or ""]
+    parts += [alias or "" for alias in (track.get("aliases") or [])]
+    parts += [tag or "" for tag in (track.get("tags") or [])]
+    return [term for part in parts for term in tokenize(part)]
+
+
+def enabled(index_file: str = INDEX_FILE) -> bool:
+    """True once an index has been built (``bm25_index.py build``)."""
+    return os.path.exists(index_file)
+
+
+class BM25Index:
+    def __init__(self, lengths: list[int], postings: dict[str, dict[int, int]],
+                 signature: str = ""):
+        self.lengths = lengths
+        # term -> {row: term frequency}
+        self.postings = postings
+        self.signature = signature
+        self.avg_len = (sum(lengths) / len(lengths)) if lengths else 0.0
+        self._vocabulary = None
+
+    @classmethod
+    def from_tracks(cls, tracks: list[dict], signature: str = "") -> "BM25Index":
+        lengths, postings = [], {}
+        for row, track in enumerate(tracks):
+            terms = document_terms(track)
+            lengths.append(len(terms))
+            for term in terms:
+                tf = postings.setdefault(term, {})
+                tf[row] = tf.get(row, 0) + 1
+        return cls(lengths, postings, signature)
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self) - df + 0.5) / (df + 0.5))
+
+    def expand(self, term: str) -> list[str]:
+        """The indexed terms a query term stands for: itself, or the words it prefixes."""
+        if term in self.postings:
+            return [term]
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        i = bisect_left(self._vocabulary, term)
+        terms = []
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(term):
+            terms.append(self._vocabulary[i])
+            i += 1
+        return terms
+
+    def scores(self, query: str | list[str]) -> dict[int, float]:
+        """BM25 score of every track matching at least one query term (others score 0)."""
+        words = tokenize(query) if isinstance(query, str) else \
+            [t for q in query for t in tokenize(q)]
+        scores: dict[int, float] = {}
+        if not self.avg_len:
+            return scores
+        for word in dict.fromkeys(words):
+            # A prefix expanding to several words scores each track once, by its best word
+            best: dict[int, float] = {}
+            for term in self.expand(word):
+                idf = self.idf(term)
+                for row, tf in self.postings[term].items():
+                    norm = K1 * (1 - B + B * self.lengths[row] / self.avg_len)
+                    s = idf * tf * (K1 + 1) / (tf + norm)
+                    if s > best.get(row, 0.0):
+                        best[row] = s
+            for row, s in best.items():
+                scores[row] = scores.get(row, 0.0) + s
+        return scores
+
+    def top_k(self, query: str | list[str], k: int = 10) -> list[tuple[float, int]]:
+        """(score, row) of the k best tracks, best first; ties keep library order."""
+        return heapq.nlargest(k, ((s, row) for row, s in self.scores(query).items()),
+                              key=lambda x: (x[0], -x[1]))
+
+    def to_json(self) -> dict:
+        return {
+            "version": FORMAT_VERSION,
+            "signature": self.signature,
+            "lengths": self.lengths,
+            # Postings as flat [row, tf, row, tf, ...] lists keep the file small
+            "postings": {term: [v for item in tf.items() for v in item]
+                         for term, tf in self.postings.items()},
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "BM25Index":
+        postings = {term: dict(zip(flat[::2], flat[1::2]))
+                    for term, flat in data["postings"].items()}
+        return cls(data["lengths"], postings, data.get("signature", ""))
+
+
+def load(index_file: str = INDEX_FILE) -> BM25Index | None:
+    data = track_store.load_index_json(index_file, FORMAT_VERSION)
+    return BM25Index.from_json(data) if data is not None else None
+
+
+def save(index: BM25Index, index_file: str = INDEX_FILE):
+    track_store.save_index_json(index, index_file)
+
+
+def open_index(tracks: list[dict], index_file: str = INDEX_FILE,
+               json_path: str = track_store.DB_PATH) -> BM25Index | None:
+    """The saved index, rebuilt from ``tracks`` (the current library) if stale.
+
+    Returns None when no index has been built (the feature is off).
+    """
+    return track_store.open_index(
+        index_file, load, lambda _, signature: BM25Index.from_tracks(tracks, signature), save,
+        tracks, json_path)
+
+
+def build(index_file: str = INDEX_FILE, json_path: str = track_store.DB_PATH) -> BM25Index:
+    signature = track_store.library_signature(json_path)
+    index = BM25Index.from_tracks(track_store.load_tracks(json_path), signature)
+    save(index, index_file)
+    return index
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("build", "status", "query"):
+        print(__doc__.strip())
+        sys.exit(1)
+
+    cmd = sys.argv[1]
+    if cmd == "build":
+        index = build()
+        print(f"  {os.path.normpath(INDEX_FILE)}: {len(index)} tracks, {len(index.postings)} terms")
+    elif cmd == "status":
+        track_store.print_index_status("BM25 index", INDEX_FILE, load)
+    else:
+        if len(sys.argv) < 3:
+            print("Usage: python tools/bm25_index.py query <text>")
+            sys.exit(1)
+        tracks = track_store.load_tracks()
+        index = open_index(tracks) or BM25Index.from_tracks(tracks)
+        for score, row in index.top_k(sys.argv[2], k=10):
+            print(f"  {score:5.2f}  {tracks[row].get('title', 'Unknown')}")
+
+
+if __name__ == "__main__":
+    main()
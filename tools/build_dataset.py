@@ -26,6 +26,10 @@ except AttributeError:
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import track_store
+import track_db
+
 
 def load_dotenv():
     """Load .env file from project root into os.environ."""
@@ -70,10 +74,8 @@ DEFAULT_LIMITS = {
 
 
 def load_tracks() -> list[dict]:
-    """Load reference tracks from tracks.json."""
-    with open(TRACKS_PATH, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return data["tracks"]
+    """Load reference tracks from tracks.json (plus any journaled saves)."""
+    return track_store.load_tracks(str(TRACKS_PATH))
 
 
 def load_existing_index() -> dict:
@@ -87,7 +89,10 @@ def load_existing_index() -> dict:
 def select_tracks(tracks: list[dict], category: str | None, limit: int | None) -> list[dict]:
     """Select tracks for generation, prioritizing energy spread within each category."""
     if category:
-        filtered = [t for t in tracks if category.lower() in t.get("category", "").lower()]
+        if track_db.enabled():
+            filtered = track_db.search(track_db.connect(), category=category)
+        else:
+            filtered = [t for t in tracks if category.lower() in t.get("category", "").lower()]
         if limit:
             filtered = sorted(filtered, key=lambda t: t.get("energy") or 0.5)
             filtered = spread_select(filtered, limit)
@@ -421,7 +426,8 @@ def main():
             print("ERROR: --api-key required or set ANTHROPIC_API_KEY/OPENAI_API_KEY", file=sys.stderr)
             sys.exit(1)
 
-    tracks = load_tracks()
+    # A --category selection is answered by the SQLite mirror when it exists
+    tracks = [] if args.category and track_db.enabled() else load_tracks()
     selected = select_tracks(tracks, args.category, args.limit)
     print(f"Selected {len(selected)} tracks for generation")
 
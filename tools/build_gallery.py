@@ -7,7 +7,6 @@ with YouTube thumbnails, audio characteristics, mood tags, and copyable Audial p
 Usage:
     python tools/build_gallery.py
 """
-import json
 import html
 import math
 import sys
@@ -20,12 +19,15 @@ except AttributeError:
 
 BASE = Path(__file__).parent.parent
 
+sys.path.insert(0, str(Path(__file__).parent))
+import track_store
+import track_db
+import bitmap_index
+
 
 def load_tracks():
-    """Load tracks from data/tracks.json."""
-    with open(BASE / "data" / "tracks.json", encoding="utf-8") as f:
-        data = json.load(f)
-    return data["tracks"]
+    """Load tracks from data/tracks.json (plus any journaled saves)."""
+    return track_store.load_tracks(str(BASE / "data" / "tracks.json"))
 
 
 def clean_category(cat):
@@ -45,26 +47,21 @@ def get_game_label(track):
 
 def build_filters(tracks):
     """Extract category and tag distributions for filter UI."""
+    bitmaps = bitmap_index.open_index(tracks)
+    if bitmaps is None and track_db.enabled():
+        # Counted by GROUP BY in the SQLite mirror instead of walking every track
+        conn = track_db.connect()
+        return track_db.category_counts(conn), track_db.tag_counts(conn, min_count=5)
+    if bitmaps is None:
+        bitmaps = bitmap_index.BitmapIndex.from_tracks(tracks)
+
+    # Popcounts over the bitmap index instead of a counter per track and tag
     categories = {}
-    tags = {}
-    games = {}
-
-    for t in tracks:
-        cat = clean_category(t.get("category", ""))
-        categories[cat] = categories.get(cat, 0) + 1
-
-        game = t.get("game", "")
-        if game:
-            games[game] = games.get(game, 0) + 1
-
-        for tag in t.get("tags", []):
-            tags[tag] = tags.get(tag, 0) + 1
-
+    for cat, bits in bitmaps.bitmaps["category"].items():
+        categories[clean_category(cat)] = categories.get(clean_category(cat), 0) + bits.bit_count()
     sorted_cats = sorted(categories.items(), key=lambda x: -x[1])
     # Top tags with 5+ occurrences for filter pills
-    sorted_tags = [(t, n) for t, n in sorted(tags.items(), key=lambda x: -x[1]) if n >= 5]
-
-    return sorted_cats, sorted_tags
+    return sorted_cats, bitmaps.facet_counts("tag", min_count=5)
 
 
 def energy_color(val):
@@ -0,0 +1,126 @@
+"""
+Content-addressed on-disk cache for analysis results.
+
+Entries are keyed by a hash of the audio file's bytes plus a fingerprint of the
+analyzer version and parameters, so a re-exported or renamed file with the same
+content hits the cache, and any change to the analysis parameters misses it.
+Each entry is a small JSON file; its mtime doubles as the LRU timestamp.
+
+Location and size can be overridden with AUDIAL_FEATURE_CACHE (directory) and
+AUDIAL_FEATURE_CACHE_MB (size limit). Set AUDIAL_FEATURE_CACHE_MB=0 to disable.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", ".cache", "features")
+DEFAULT_MAX_MB = 64.0
+
+
+def content_hash(filepath: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's bytes, read in chunks."""
+    h = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def fingerprint(params: dict) -> str:
+    """Short stable hash of analyzer parameters (version, sample rate, constants...)."""
+    blob = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+
+class FeatureCache:
+    """Size-bounded LRU cache of JSON results in a directory."""
+
+    def __init__(self, cache_dir: str | None = None, max_bytes: int | None = None):
+        self.cache_dir = cache_dir or os.environ.get("AUDIAL_FEATURE_CACHE") or DEFAULT_CACHE_DIR
+        if max_bytes is None:
+            max_mb = float(os.environ.get("AUDIAL_FEATURE_CACHE_MB", DEFAULT_MAX_MB))
+            max_bytes = int(max_mb * 1024 * 1024)
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> dict | None:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return value
+
+    def put(self, key: str, value: dict):
+        if not self.enabled:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Write to a temp file and rename so concurrent readers never see partial JSON
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+        self.evict()
+
+    def evict(self):
+        """Delete least-recently-used entries until the cache fits its size limit."""
+        entries = []
+        total = 0
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+            total += st.st_size
+
+        entries.sort()
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+            total -= size
+
+
+def cached(filepath: str, params: dict, compute, cache: FeatureCache | None = None):
+    """Return compute()'s result for this file's content and params, computing at most once."""
+    cache = cache or FeatureCache()
+    if not cache.enabled:
+        return compute()
+    key = f"{content_hash(filepath)}-{fingerprint(params)}"
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.put(key, value)
+    return value
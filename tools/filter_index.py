@@ -0,0 +1,238 @@
+"""
+Filter Indexes and Query Planner
+Answers search_tracks' numeric and key/category/game filters from indexes.
+
+Per library row the index keeps the filtered values, and per filter one
+lookup structure:
+
+    bpm, energy, brightness, density   rows sorted by value (range = two bisects)
+    key, category, game                distinct lowercased value -> rows (hash)
+
+Every predicate can report exactly how many rows it matches before anything
+is materialized: a range is the distance between two bisect positions, a
+categorical filter the size of the postings of the values it matches. The
+planner orders predicates by that count, reads the rows of the most selective
+one from its index, and checks the rest on those rows only, most selective
+first, against the per-row values. A combined filter touches the rows of its
+narrowest predicate and nothing else.
+
+The index is saved to data/tracks.filterindex.json and rebuilt from the
+library whenever tracks.json or its journal changes.
+
+Usage:
+    python tools/filter_index.py build
+    python tools/filter_index.py status
+    python tools/filter_index.py explain --bpm 80:120 --energy 0.7:1 --key minor
+"""
+
+import sys
+import os
+import math
+from bisect import bisect_left, bisect_right
+
+try:
+    sys.stdout.reconfigure(encoding="utf-8")
+except AttributeError:
+    pass
+
+sys.path.insert(0, os.path.dirname(__file__))
+import track_store
+
+INDEX_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "tracks.filterindex.json")
+FORMAT_VERSION = 1
+
+RANGE_FIELDS = ("bpm", "energy", "brightness", "density")
+HASH_FIELDS = ("key", "category", "game")
+
+
+def _number(value) -> float | None:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or math.isnan(value):
+        return None
+    return float(value)
+
+
+def row_values(track: dict) -> dict:
+    """The values search_tracks filters on, as its matchers read them."""
+    key = (track.get("key") or "").lower()
+    mode = (track.get("mode") or "").lower()
+    return {
+        "bpm": _number(track.get("bpm_feel") or track.get("bpm")),
+        "energy": _number(track.get("energy")),
+        "brightness": _number(track.get("brightness")),
+        "density": _number(track.get("density")),
+        "key": f"{key} {mode}".strip(),
+        "category": (track.get("category") or "").lower(),
+        "game": (track.get("game") or "").lower(),
+    }
+
+
+def enabled(index_file: str = INDEX_FILE) -> bool:
+    """True once an index has been built (``filter_index.py build``)."""
+    return os.path.exists(index_file)
+
+
+class FilterIndex:
+    def __init__(self, columns: dict[str, list], signature: str = ""):
+        # columns: field -> per-row value (None = missing for range fields)
+        self.columns = columns
+        self.signature = signature
+        self.sorted_rows: dict[str, list[int]] = {}
+        self.sorted_values: dict[str, list[float]] = {}
+        for name in RANGE_FIELDS:
+            col = columns[name]
+            rows = sorted((r for r, v in enumerate(col) if v is not None), key=col.__getitem__)
+            self.sorted_rows[name] = rows
+            self.sorted_values[name] = [col[r] for r in rows]
+        self.postings: dict[str, dict[str, list[int]]] = {}
+        for name in HASH_FIELDS:
+            postings = {}
+            for row, value in enumerate(columns[name]):
+                postings.setdefault(value, []).append(row)
+            self.postings[name] = postings
+
+    @classmethod
+    def from_tracks(cls, tracks: list[dict], signature: str = "") -> "FilterIndex":
+        values = [row_values(t) for t in tracks]
+        columns = {name: [v[name] for v in values] for name in RANGE_FIELDS + HASH_FIELDS}
+        return cls(columns, signature)
+
+    def __len__(self) -> int:
+        return len(self.columns["key"])
+
+    # -- predicates ------------------------------------------------------
+
+    def _range(self, name: str, lo: float, hi: float) -> dict:
+        values = self.sorted_values[name]
+        start, stop = bisect_left(values, lo), bisect_right(values, hi)
+        col = self.columns[name]
+        return {
+            "filter": f"{name}={lo}:{hi}",
+            "count": max(stop - start, 0),
+            "rows": lambda: self.sorted_rows[name][start:stop],
+            "check": lambda row: col[row] is not None and lo <= col[row] <= hi,
+        }
+
+    def _substring(self, name: str, query: str) -> dict:
+        q = query.lower()
+        matched = [v for v in self.postings[name] if q in v]
+        hits = set(matched)
+        col = self.columns[name]
+        return {
+            "filter": f"{name}={query}",
+            "count": sum(len(self.postings[name][v]) for v in matched),
+            "rows": lambda: [r for v in matched for r in self.postings[name][v]],
+            "check": lambda row: col[row] in hits,
+        }
+
+    def predicates(self, key: str | None = None, bpm: tuple | None = None,
+                   energy: tuple | None = None, brightness: tuple | None = None,
+                   density: tuple | None = None, category: str | None = None,
+                   game: str | None = None) -> list[dict]:
+        """One predicate per given filter, most selective first."""
+        preds = []
+        for name, bounds in (("bpm", bpm), ("energy", energy),
+                             ("brightness", brightness), ("density", density)):
+            if bounds:
+                preds.append(self._range(name, *bounds))
+        for name, query in (("key", key), ("category", category), ("game", game)):
+            if query:
+                preds.append(self._substring(name, query))
+        preds.sort(key=lambda p: p["count"])
+        return preds
+
+    def select(self, rows: set | None = None, **filters) -> list[int] | None:
+        """Rows (in library order) matching every filter.
+
+        ``rows`` is an already-known candidate set (e.g. text index hits) that
+        joins the plan as one more predicate. Returns None when there is
+        nothing to filter on, meaning "all rows".
+        """
+        preds = self.predicates(**filters)
+        if rows is not None:
+            preds.append({"filter": "text", "count": len(rows),
+                          "rows": lambda: rows, "check": rows.__contains__})
+            preds.sort(key=lambda p: p["count"])
+        if not preds:
+            return None
+        if preds[0]["count"] == 0:
+            return []
+        candidates = preds[0]["rows"]()
+        for pred in preds[1:]:
+            check = pred["check"]
+            candidates = [r for r in candidates if check(r)]
+            if not candidates:
+                break
+        return sorted(candidates)
+
+    # -- persistence -----------------------------------------------------
+
+    def to_json(self) -> dict:
+        return {"version": FORMAT_VERSION, "signature": self.signature, "columns": self.columns}
+
+    @classmethod
+    def from_json(cls, data: dict) -> "FilterIndex":
+        return cls(data["columns"], data.get("signature", ""))
+
+
+def load(index_file: str = INDEX_FILE) -> FilterIndex | None:
+    data = track_store.load_index_json(index_file, FORMAT_VERSION)
+    return FilterIndex.from_json(data) if data is not None else None
+
+
+def save(index: FilterIndex, index_file: str = INDEX_FILE):
+    track_store.save_index_json(index, index_file)
+
+
+def open_index(tracks: list[dict], index_file: str = INDEX_FILE,
+               json_path: str = track_store.DB_PATH) -> FilterIndex | None:
+    """The saved index, rebuilt from ``tracks`` (the current library) if stale.
+
+    Returns None when no index has been built (the feature is off).
+    """
+    return track_store.open_index(
+        index_file, load, lambda _, signature: FilterIndex.from_tracks(tracks, signature), save,
+        tracks, json_path)
+
+
+def build(index_file: str = INDEX_FILE, json_path: str = track_store.DB_PATH) -> FilterIndex:
+    signature = track_store.library_signature(json_path)
+    index = FilterIndex.from_tracks(track_store.load_tracks(json_path), signature)
+    save(index, index_file)
+    return index
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("build", "status", "explain"):
+        print(__doc__.strip())
+        sys.exit(1)
+
+    cmd = sys.argv[1]
+    if cmd == "build":
+        index = build()
+        print(f"  {os.path.normpath(INDEX_FILE)}: {len(index)} tracks")
+    elif cmd == "status":
+        track_store.print_index_status("Filter index", INDEX_FILE, load)
+    else:
+        from search_tracks import parse_range
+        filters = {}
+        args = sys.argv[2:]
+        for flag, value in zip(args[::2], args[1::2]):
+            name = flag.lstrip("-")
+            if name in RANGE_FIELDS:
+                filters[name] = parse_range(value)
+            elif name in HASH_FIELDS:
+                filters[name] = value
+            else:
+                print(f"  Unknown filter: {flag}")
+                sys.exit(1)
+        tracks = track_store.load_tracks()
+        index = open_index(tracks) or FilterIndex.from_tracks(tracks)
+        print(f"  Plan over {len(index)} tracks:")
+        for step, pred in enumerate(index.predicates(**filters)):
+            how = "scan index" if step == 0 else "check rows"
+            print(f"    {step + 1}. {how:<10}  {pred['filter']:<24} ~{pred['count']} rows")
+        print(f"  Matches: {len(index.select(**filters) or [])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Fuzzy Title Search
+Typo-tolerant matching of titles, games and aliases.
+
+Every title, game and alias is split into padded word trigrams ("julia" ->
+"  j", " ju", "jul", "uli", "lia", "ia "), and a posting list maps each
+trigram to the strings containing it. A query is matched in two steps:
+
+    1. candidates  count shared trigrams via the postings; keep strings that
+                   share at least MIN_SHARED of the query's trigrams, and only
+                   the MAX_CANDIDATES with the most
+    2. rerank      edit-distance similarity between the query and the
+                   best-matching run of words in each candidate:
+                   1 - levenshtein / max(len)
+
+so "byzantum" finds "Byzantium" (0.89) without computing an edit distance
+against the whole library. An exact substring scores 1.0. Results below the
+threshold (default 0.6) are dropped.
+
+The index is saved to data/tracks.fuzzy.json and rebuilt from the library
+whenever tracks.json or its journal changes. search_tracks falls back to it
+when a text query or --similar title has no exact match, and builds one in
+memory when none has been saved.
+
+Usage:
+    python tools/fuzzy_index.py build
+    python tools/fuzzy_index.py status
+    python tools/fuzzy_index.py query "finl fantsy"
+"""
+
+import sys
+import os
+
+try:
+    sys.stdout.reconfigure(encoding="utf-8")
+except AttributeError:
+    pass
+
+sys.path.insert(0, os.path.dirname(__file__))
+import track_store
+
+INDEX_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "tracks.fuzzy.json")
+FORMAT_VERSION = 1
+
+THRESHOLD = 0.6
+MIN_SHARED = 0.3
+MAX_CANDIDATES = 200
+
+
+def trigrams(text: str) -> set[str]:
+    """Padded trigrams of each word of text (lowercased)."""
+    grams = set()
+    for word in text.lower().split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+def levenshtein(a: str, b: str, max_dist: int | None = None) -> int:
+    """Edit distance; stops early (returning max_dist + 1) once it must exceed max_dist."""
+    if len(a) < len(b):
+        a, b = b, a
+    if max_dist is not None and len(a) - len(b) > max_dist:
+        return max_dist + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if max_dist is not None and min(cur) > max_dist:
+            return max_dist + 1
+        prev = cur
+    if max_dist is not None and prev[-1] > max_dist:
+        return max_dist + 1
+    return prev[-1]
+
+
+def similarity(query: str, text: str, threshold: float = 0.0) -> float:
+    """Edit similarity of query to the closest run of words in text (1.0 = substring)."""
+    q, t = query.lower().strip(), text.lower()
+    if not q:
+        return 0.0
+    if q in t:
+        return 1.0
+    words = t.split()
+    n = len(q.split())
+    best = 0.0
+    for size in range(max(1, n - 1), n + 2):
+        for i in range(max(1, len(words) - size + 1)):
+            window = " ".join(words[i:i + size])
+            longest = max(len(q), len(window))
+            # Anything further than this cannot beat the threshold or the best so far
+            max_dist = int(longest * (1 - max(best, threshold)))
+            dist = levenshtein(q, window, max_dist)
+            if dist <= max_dist:
+                best = max(best, 1 - dist / longest)
+    return best
+
+
+def entry_strings(track: dict) -> list[str]:
+    """Title, game and aliases of a track, lowercased, without duplicates."""
+    strings = [track.get("title") or "", track.get("game") or ""]
+    strings += [alias or "" for alias in (track.get("aliases") or [])]
+    return list(dict.fromkeys(s.lower() for s in strings if s.strip()))
+
+
+def enabled(index_file: str = INDEX_FILE) -> bool:
+    """True once an index has been built (``fuzzy_index.py build``)."""
+    return os.path.exists(index_file)
+
+
+class FuzzyIndex:
+    def __init__(self, size: int, entries: list[tuple[int, str]], signature: str = ""):
+        self.size = size
+        # (row, lowercased string) per title/game/alias
+        self.entries = entries
+        self.signature = signature
+        self.postings: dict[str, list[int]] = {}
+        for e, (_, text) in enumerate(entries):
+            for gram in trigrams(text):
+                self.postings.setdefault(gram, []).append(e)
+
+    @classmethod
+    def from_tracks(cls, tracks: list[dict], signature: str = "") -> "FuzzyIndex":
+        entries = [(row, s) for row, t in enumerate(tracks) for s in entry_strings(t)]
+        return cls(len(tracks), entries, signature)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def candidates(self, query: str) -> list[int]:
+        """Entries sharing enough trigrams with query, most shared first."""
+        grams = trigrams(query)
+        if not grams:
+            return []
+        shared: dict[int, int] = {}
+        for gram in grams:
+            for e in self.postings.get(gram, ()):
+                shared[e] = shared.get(e, 0) + 1
+        need = max(1, int(MIN_SHARED * len(grams)))
+        kept = [e for e, n in shared.items() if n >= need]
+        kept.sort(key=lambda e: (-shared[e], e))
+        return kept[:MAX_CANDIDATES]
+
+    def search(self, query: str, threshold: float = THRESHOLD,
+               limit: int | None = 10) -> list[tuple[float, int]]:
+        """(score, row) of tracks whose title/game/alias fuzzily matches, best first."""
+        best: dict[int, float] = {}
+        for e in self.candidates(query):
+            row, text = self.entries[e]
+            score = similarity(query, text, threshold)
+            if score >= threshold and score > best.get(row, 0.0):
+                best[row] = score
+        ranked = sorted(((s, row) for row, s in best.items()), key=lambda x: (-x[0], x[1]))
+        return ranked[:limit] if limit else ranked
+
+    def to_json(self) -> dict:
+        return {"version": FORMAT_VERSION, "signature": self.signature,
+                "size": self.size, "entries": self.entries}
+
+    @classmethod
+    def from_json(cls, data: dict) -> "FuzzyIndex":
+        entries = [(row, text) for row, text in data["entries"]]
+        return cls(data["size"], entries, data.get("signature", ""))
+
+
+def load(index_file: str = INDEX_FILE) -> FuzzyIndex | None:
+    data = track_store.load_index_json(index_file, FORMAT_VERSION)
+    return FuzzyIndex.from_json(data) if data is not None else None
+
+
+def save(index: FuzzyIndex, index_file: str = INDEX_FILE):
+    track_store.save_index_json(index, index_file)
+
+
+def open_index(tracks: list[dict], index_file: str = INDEX_FILE,
+               json_path: str = track_store.DB_PATH) -> FuzzyIndex | None:
+    """The saved index, rebuilt from ``tracks`` (the current library) if stale.
+
+    Returns None when no index has been built (the feature is off).
+    """
+    return track_store.open_index(
+        index_file, load, lambda _, signature: FuzzyIndex.from_tracks(tracks, signature), save,
+        tracks, json_path)
+
+
+def build(index_file: str = INDEX_FILE, json_path: str = track_store.DB_PATH) -> FuzzyIndex:
+    signature = track_store.library_signature(json_path)
+    index = FuzzyIndex.from_tracks(track_store.load_tracks(json_path), signature)
+    save(index, index_file)
+    return index
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("build", "status", "query"):
+        print(__doc__.strip())
+        sys.exit(1)
+
+    cmd = sys.argv[1]
+    if cmd == "build":
+        index = build()
+        print(f"  {os.path.normpath(INDEX_FILE)}: {len(index)} tracks, "
+              f"{len(index.entries)} names, {len(index.postings)} trigrams")
+    elif cmd == "status":
+        track_store.print_index_status("Fuzzy index", INDEX_FILE, load)
+    else:
+        if len(sys.argv) < 3:
+            print("Usage: python tools/fuzzy_index.py query <text>")
+            sys.exit(1)
+        tracks = track_store.load_tracks()
+        index = open_index(tracks) or FuzzyIndex.from_tracks(tracks)
+        for score, row in index.search(sys.argv[2]):
+            print(f"  {score:.2f}  {tracks[row].get('title', 'Unknown')}")
+
+
+if __name__ == "__main__":
+    main()
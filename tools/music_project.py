@@ -13,7 +13,6 @@ Usage:
 
 import sys
 import os
-import json
 
 try:
     sys.stdout.reconfigure(encoding="utf-8")
@@ -22,15 +21,16 @@ except AttributeError:
 
 import yaml
 
+sys.path.insert(0, os.path.dirname(__file__))
+import track_store
+import track_db
+
 PROJECTS_DIR = os.path.join(os.path.dirname(__file__), "..", "projects")
-DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "tracks.json")
+DB_PATH = track_store.DB_PATH
 
 
 def load_db() -> list[dict]:
-    if not os.path.exists(DB_PATH):
-        return []
-    with open(DB_PATH, "r", encoding="utf-8") as f:
-        return json.load(f).get("tracks", [])
+    return track_store.load_tracks(DB_PATH)
 
 
 def load_project(name: str) -> dict | None:
@@ -55,6 +55,30 @@ def find_track(tracks: list[dict], youtube_id: str) -> dict | None:
     return None
 
 
+def lookup_tracks(youtube_ids: list[str]) -> dict[str, dict]:
+    """youtube_id -> DB track, by index lookup when the SQLite mirror exists."""
+    if track_db.enabled():
+        return track_db.find_by_youtube_ids(track_db.connect(), youtube_ids)
+    db = load_db()
+    found = {}
+    for yt_id in youtube_ids:
+        t = find_track(db, yt_id)
+        if t:
+            found[yt_id] = t
+    return found
+
+
+def parse_target_range(value) -> tuple[float, float] | None:
+    """Parse a project target range like "0.2-0.6"."""
+    if isinstance(value, str) and "-" in value:
+        try:
+            lo, hi = map(float, value.split("-"))
+            return lo, hi
+        except (ValueError, TypeError):
+            pass
+    return None
+
+
 def format_bar(val, width=10):
     if val is None:
         return "-" * width
@@ -104,7 +128,7 @@ def cmd_show(name: str):
     # Tracks
     tracks = proj.get("tracks", [])
     if tracks:
-        db = load_db()
+        db = lookup_tracks([t.get("youtube_id", "") for t in tracks])
         print(f"  Tracks ({len(tracks)}):")
         print(f"  {'-'*40}")
         for t in tracks:
@@ -112,7 +136,7 @@ def cmd_show(name: str):
             title = t.get("title", "Unknown")
             role = t.get("role", "")
             # Look up from DB for metrics
-            db_track = find_track(db, yt_id)
+            db_track = db.get(yt_id)
             if db_track:
                 key = f"{db_track.get('key','')} {db_track.get('mode','')}".strip()
                 bpm = db_track.get("bpm_feel") or db_track.get("bpm", "?")
@@ -178,8 +202,7 @@ def cmd_add(name: str, youtube_id: str, role: str = ""):
             return
 
     # Look up in DB
-    db = load_db()
-    db_track = find_track(db, youtube_id)
+    db_track = lookup_tracks([youtube_id]).get(youtube_id)
 
     entry = {"youtube_id": youtube_id}
     if db_track:
@@ -228,10 +251,18 @@ def cmd_suggest(name: str):
     keywords = target.get("keywords", [])
     existing_ids = {t.get("youtube_id") for t in proj.get("tracks", [])}
 
-    db = load_db()
-    if not db:
-        print("  No tracks in database.")
-        return
+    energy_range = parse_target_range(target.get("energy", ""))
+    brightness_range = parse_target_range(target.get("brightness", ""))
+
+    if track_db.enabled():
+        # Only tracks that can score > 0 (a keyword hit or an in-range metric)
+        db = track_db.mood_candidates(track_db.connect(), keywords, energy_range,
+                                      brightness_range, existing_ids)
+    else:
+        db = load_db()
+        if not db:
+            print("  No tracks in database.")
+            return
 
     # Score each track against target mood
     scored = []
@@ -252,32 +283,24 @@ def cmd_suggest(name: str):
                 score += 1.0
 
         # Energy range matching
-        energy_range = target.get("energy", "")
-        if isinstance(energy_range, str) and "-" in energy_range:
-            try:
-                lo, hi = map(float, energy_range.split("-"))
-                e = track.get("energy")
-                if e is not None:
-                    if lo <= e <= hi:
-                        score += 1.5
-                    else:
-                        score -= abs(e - (lo + hi) / 2)
-            except (ValueError, TypeError):
-                pass
+        if energy_range:
+            lo, hi = energy_range
+            e = track.get("energy")
+            if e is not None:
+                if lo <= e <= hi:
+                    score += 1.5
+                else:
+                    score -= abs(e - (lo + hi) / 2)
 
         # Brightness range matching
-        brightness_range = target.get("brightness", "")
-        if isinstance(brightness_range, str) and "-" in brightness_range:
-            try:
-                lo, hi = map(float, brightness_range.split("-"))
-                b = track.get("brightness")
-                if b is not None:
-                    if lo <= b <= hi:
-                        score += 1.5
-                    else:
-                        score -= abs(b - (lo + hi) / 2)
-            except (ValueError, TypeError):
-                pass
+        if brightness_range:
+            lo, hi = brightness_range
+            b = track.get("brightness")
+            if b is not None:
+                if lo <= b <= hi:
+                    score += 1.5
+                else:
+                    score -= abs(b - (lo + hi) / 2)
 
         if score > 0:
             scored.append((score, track))
@@ -7,6 +7,10 @@ Usage:
     python tools/reference_track.py "https://youtu.be/..."
     python tools/reference_track.py path/to/local/file.mp3
     python tools/reference_track.py "https://youtube.com/watch?v=..." --keep
+    python tools/reference_track.py path/to/live_set.flac --stream
+    python tools/reference_track.py path/to/live_set.flac --json --workers 8
+    python tools/reference_track.py path/to/song.mp3 --segments novelty
+    python tools/reference_track.py --bulk sources.txt [--fetch-concurrency 4] [--workers N]
 """
 
 import sys
@@ -26,7 +30,12 @@ import librosa
 
 # Import mood analysis functions from analyze_mood.py
 sys.path.insert(0, os.path.dirname(__file__))
-from analyze_mood import analyze, tag_mood, KEY_NAMES
+from analyze_mood import (
+    tag_mood, analysis_params, frame_features, slice_frames, concat_frames, stream_frame_features,
+    FeatureAccumulator, KEY_NAMES, SAMPLE_RATE, HOP_LENGTH, CHROMA_CONTEXT,
+)
+from feature_cache import cached
+import track_store
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "tracks.json")
 
@@ -48,103 +57,519 @@ def get_ffmpeg_path() -> str | None:
         return None
 
 
-def download_audio(url: str, output_dir: str) -> str:
-    """Download audio from YouTube URL using yt-dlp."""
-    output_path = os.path.join(output_dir, "reference.%(ext)s")
+def fetch_audio(url: str, output_dir: str) -> dict:
+    """Download best audio and read its metadata in a single yt-dlp invocation.
 
-    # Step 1: Download best audio as-is (no ffmpeg needed for download)
+    Returns {"id", "title", "duration", "filepath"}. The file is kept as-is
+    (webm/m4a/...); decode_audio()/audio_blocks() pipe it through ffmpeg.
+    """
+    output_path = os.path.join(output_dir, "reference.%(ext)s")
     cmd = [
         sys.executable, "-m", "yt_dlp",
         "-f", "bestaudio",
         "--no-playlist",
         "--output", output_path,
+        "--no-simulate",
+        "--print", "after_move:%(.{id,title,duration,filepath})j",
         "--quiet",
         "--no-warnings",
         "--no-post-overwrites",
         url,
     ]
 
-    print(f"  downloading audio...")
+    print(f"  downloading audio...", file=sys.stderr)
     result = subprocess.run(cmd, capture_output=True, text=True)
 
     if result.returncode != 0:
         error = result.stderr.strip() or "download failed"
         raise RuntimeError(f"yt-dlp error: {error}")
 
-    # Find the downloaded file
-    raw_file = None
-    for f in os.listdir(output_dir):
-        if f.startswith("reference"):
-            raw_file = os.path.join(output_dir, f)
-            break
+    lines = result.stdout.strip().splitlines()
+    try:
+        info = json.loads(lines[-1])
+    except (IndexError, ValueError):
+        raise RuntimeError("yt-dlp returned no metadata")
+
+    filepath = info.get("filepath")
+    if not filepath or not os.path.exists(filepath):
+        # Older yt-dlp builds don't expose the final path; fall back to the template name
+        candidates = [f for f in os.listdir(output_dir) if f.startswith("reference")]
+        if not candidates:
+            raise RuntimeError("download completed but file not found")
+        filepath = os.path.join(output_dir, candidates[0])
+
+    return {
+        "id": info.get("id"),
+        "title": info.get("title") or "Unknown",
+        "duration": info.get("duration"),
+        "filepath": filepath,
+    }
 
-    if not raw_file:
-        raise RuntimeError("download completed but file not found")
-
-    # Step 2: Convert to WAV using ffmpeg (for librosa compatibility)
-    wav_file = os.path.join(output_dir, "reference.wav")
-    if not raw_file.endswith(".wav"):
-        ffmpeg_path = get_ffmpeg_path()
-        if ffmpeg_path:
-            print(f"  converting to wav...")
-            conv = subprocess.run(
-                [ffmpeg_path, "-i", raw_file, "-ac", "1", "-ar", "22050",
-                 "-y", "-loglevel", "quiet", wav_file],
-                capture_output=True, text=True,
-            )
-            if conv.returncode == 0:
-                os.unlink(raw_file)
-                return wav_file
-        # If ffmpeg conversion fails, try librosa directly on the raw file
-        return raw_file
-
-    return raw_file
-
-
-def get_video_title(url: str) -> str:
-    """Get the video title."""
-    cmd = [
-        sys.executable, "-m", "yt_dlp",
-        "--get-title",
-        "--no-playlist",
-        "--quiet",
-        "--no-warnings",
-        url,
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    return result.stdout.strip() if result.returncode == 0 else "Unknown"
 
+# --- Download cache ---
+# One directory per video under references/cache/<youtube_id>/ holding the
+# audio file plus meta.json (id, title, duration). meta.json's mtime is the
+# LRU timestamp. Size limit: AUDIAL_DOWNLOAD_CACHE_MB (0 disables the cache).
 
-def analyze_sections(filepath: str, section_duration: float = 15.0) -> list[dict]:
-    """Analyze the track in sections to detect changes over time."""
-    y, sr = librosa.load(filepath, sr=22050, mono=True)
-    total_duration = librosa.get_duration(y=y, sr=sr)
+DOWNLOAD_CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", "references", "cache")
+DEFAULT_DOWNLOAD_CACHE_MB = 2048.0
 
-    sections = []
-    offset = 0.0
 
-    while offset < total_duration - 5:  # skip last <5s
-        end = min(offset + section_duration, total_duration)
-        start_sample = int(offset * sr)
-        end_sample = int(end * sr)
-        section_y = y[start_sample:end_sample]
+def download_cache_limit() -> int:
+    """Download cache size limit in bytes (0 = disabled)."""
+    max_mb = float(os.environ.get("AUDIAL_DOWNLOAD_CACHE_MB", DEFAULT_DOWNLOAD_CACHE_MB))
+    return int(max_mb * 1024 * 1024)
 
-        # Write section to temp file for analysis
-        import soundfile as sf
-        tmp_path = os.path.join(tempfile.gettempdir(), f"audial_section_{int(offset)}.wav")
-        sf.write(tmp_path, section_y, sr)
-        features = analyze(tmp_path)
+
+def download_cache_key(url: str) -> str:
+    """Cache key: the YouTube ID, or a hash of the URL for other sites."""
+    import hashlib
+    return extract_youtube_id(url) or hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+
+
+def _cached_download(entry_dir: str) -> dict | None:
+    meta_path = os.path.join(entry_dir, "meta.json")
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    filepath = os.path.join(entry_dir, meta.get("file", ""))
+    if not os.path.isfile(filepath):
+        return None
+    try:
+        os.utime(meta_path)  # mark as recently used
+    except OSError:
+        pass
+    return {"id": meta.get("id"), "title": meta.get("title"),
+            "duration": meta.get("duration"), "filepath": filepath}
+
+
+def evict_downloads(max_bytes: int, keep: str | None = None):
+    """Delete least-recently-used downloads until the cache fits max_bytes."""
+    import shutil
+    entries = []
+    total = 0
+    try:
+        names = os.listdir(DOWNLOAD_CACHE_DIR)
+    except OSError:
+        return
+    for name in names:
+        entry_dir = os.path.join(DOWNLOAD_CACHE_DIR, name)
+        if name.startswith(".") or not os.path.isdir(entry_dir):
+            continue
+        size = 0
         try:
-            os.unlink(tmp_path)
+            for f in os.listdir(entry_dir):
+                try:
+                    size += os.path.getsize(os.path.join(entry_dir, f))
+                except OSError:
+                    pass  # removed meanwhile
         except OSError:
             pass
+        try:
+            used = os.path.getmtime(os.path.join(entry_dir, "meta.json"))
+        except OSError:
+            used = 0.0  # incomplete entry (no meta.json yet): evict first, at its real size
+        entries.append((used, size, name))
+        total += size
+
+    entries.sort()
+    for _, size, name in entries:
+        if total <= max_bytes:
+            break
+        if name == keep:
+            continue
+        shutil.rmtree(os.path.join(DOWNLOAD_CACHE_DIR, name), ignore_errors=True)
+        total -= size
 
-        features["start"] = round(offset, 1)
-        features["end"] = round(end, 1)
-        sections.append(features)
+
+def fetch_cached(url: str, max_bytes: int | None = None) -> dict:
+    """fetch_audio() through the download cache: repeat fetches never touch the network.
+
+    Returns the same dict as fetch_audio(); the file lives in the cache, so
+    callers must not delete it.
+    """
+    import shutil
+    max_bytes = download_cache_limit() if max_bytes is None else max_bytes
+    key = download_cache_key(url)
+    entry_dir = os.path.join(DOWNLOAD_CACHE_DIR, key)
+    hit = _cached_download(entry_dir)
+    if hit is not None:
+        print(f"  using cached audio", file=sys.stderr)
+        return hit
+
+    os.makedirs(DOWNLOAD_CACHE_DIR, exist_ok=True)
+    # Download into a private temp dir, then rename it into place, so a
+    # concurrent fetch of the same video never sees a half-written entry
+    tmp_dir = tempfile.mkdtemp(dir=DOWNLOAD_CACHE_DIR, prefix=".tmp-")
+    try:
+        info = fetch_audio(url, tmp_dir)
+        filename = os.path.basename(info["filepath"])
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"id": info["id"], "title": info["title"],
+                       "duration": info["duration"], "file": filename}, f, ensure_ascii=False)
+        shutil.rmtree(entry_dir, ignore_errors=True)  # stale or incomplete entry
+        try:
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            hit = _cached_download(entry_dir)  # another process got there first
+            if hit is not None:
+                return hit
+            raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    evict_downloads(max_bytes, keep=key)
+    return {**info, "filepath": os.path.join(entry_dir, filename)}
+
+
+def _ffmpeg_decode_cmd(ffmpeg_path: str, filepath: str) -> list[str]:
+    """ffmpeg writing mono SAMPLE_RATE float32 PCM to stdout."""
+    return [ffmpeg_path, "-nostdin", "-loglevel", "error", "-i", filepath,
+            "-f", "f32le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1"]
+
+
+def _needs_ffmpeg(filepath: str) -> bool:
+    """True for formats libsndfile can't read (webm/opus, m4a, ...)."""
+    import soundfile as sf
+    try:
+        sf.info(filepath)
+        return False
+    except Exception:
+        return get_ffmpeg_path() is not None
+
+
+def decode_audio(filepath: str) -> np.ndarray:
+    """Decode a file to a mono SAMPLE_RATE float32 array.
+
+    Formats libsndfile can't read are decoded by ffmpeg straight from its
+    stdout into the array, with no intermediate WAV on disk; everything else
+    goes through librosa.load as before.
+    """
+    if not _needs_ffmpeg(filepath):
+        y, _ = librosa.load(filepath, sr=SAMPLE_RATE, mono=True)
+        return y
+    proc = subprocess.run(_ffmpeg_decode_cmd(get_ffmpeg_path(), filepath), capture_output=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg error: {proc.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(proc.stdout, dtype="<f4")
+
+
+def audio_blocks(filepath: str, block_seconds: float = 30.0):
+    """Mono SAMPLE_RATE blocks piped from ffmpeg, or None if soundfile can stream the file."""
+    if not _needs_ffmpeg(filepath):
+        return None
+    return _ffmpeg_blocks(filepath, block_seconds)
+
+
+def _ffmpeg_blocks(filepath: str, block_seconds: float):
+    block_bytes = int(block_seconds * SAMPLE_RATE) * 4
+    proc = subprocess.Popen(_ffmpeg_decode_cmd(get_ffmpeg_path(), filepath),
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while True:
+            chunk = proc.stdout.read(block_bytes)
+            if not chunk:
+                break
+            yield np.frombuffer(chunk, dtype="<f4")
+    finally:
+        proc.stdout.close()
+        error = proc.stderr.read().decode(errors="replace").strip()
+        proc.stderr.close()
+        if proc.wait() != 0 and error:
+            raise RuntimeError(f"ffmpeg error: {error}")
+
+
+def section_bounds(total_duration: float, section_duration: float = 15.0) -> list[tuple[float, float]]:
+    """Fixed-grid (start, end) windows, skipping a final stub shorter than 5s."""
+    bounds = []
+    offset = 0.0
+    while offset < total_duration - 5:
+        bounds.append((offset, min(offset + section_duration, total_duration)))
         offset += section_duration
+    return bounds
+
+
+def section_frame_range(start: float, end: float, n_frames: int) -> tuple[int, int]:
+    """Frame indices [lo, hi) whose centres fall in [start, end) seconds."""
+    frames_per_second = SAMPLE_RATE / HOP_LENGTH
+    lo = int(np.ceil(start * frames_per_second))
+    hi = int(np.ceil(end * frames_per_second))
+    return min(lo, n_frames), min(hi, n_frames)
+
+
+def _section_summary(frames: dict, sr: int, start: float, end: float) -> dict:
+    """Reduce one section's frames to a feature dict with start/end."""
+    acc = FeatureAccumulator()
+    acc.update(frames)
+    features = acc.features(sr, end - start)
+    features["start"] = round(start, 1)
+    features["end"] = round(end, 1)
+    return features
+
+
+def _analyze_chunk(y_chunk: np.ndarray, sr: int, lo: int, hi: int, bounds: tuple | None):
+    """Worker: frame features for frames [lo, hi) of a context-padded chunk.
+
+    ``lo``/``hi`` are relative to the chunk. Returns (section or None, frames).
+    """
+    frames = slice_frames(frame_features(y_chunk, sr), lo, hi)
+    section = _section_summary(frames, sr, *bounds) if bounds else None
+    return section, frames
+
+
+def iter_sections(y: np.ndarray, sr: int, section_duration: float = 15.0,
+                  workers: int | None = None):
+    """Yield (section, frames) for consecutive chunks of the track, in order.
+
+    With one worker, frame features are computed once over the whole signal
+    and sliced per section. With a process pool, each section's frame
+    features are computed from its own slice of the signal (padded with
+    CHROMA_CONTEXT either side so frames line up with a whole-track pass)
+    and yielded as soon as it and all earlier sections are done. The one
+    approximation there is the 80 dB floor of the onset spectrogram, which is
+    taken relative to the loudest frame of each chunk rather than of the
+    whole track, so onset strength in quiet passages can differ slightly. A
+    final stub shorter than 5s is yielded with section None so callers still
+    see every frame.
+    """
+    n_frames = 1 + len(y) // HOP_LENGTH
+    chunks = []
+    for start, end in section_bounds(len(y) / sr, section_duration):
+        chunks.append((*section_frame_range(start, end, n_frames), (start, end)))
+    tail = chunks[-1][1] if chunks else 0
+    if tail < n_frames:
+        chunks.append((tail, n_frames, None))
+
+    def chunk_args(lo, hi, bounds):
+        sample_lo = max(0, lo * HOP_LENGTH - CHROMA_CONTEXT)
+        sample_hi = min(len(y), (hi - 1) * HOP_LENGTH + CHROMA_CONTEXT)
+        first = sample_lo // HOP_LENGTH
+        return y[sample_lo:sample_hi], sr, lo - first, hi - first, bounds
+
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+    if workers == 1:
+        # No pool to feed: one pass over the whole track, no overlap to recompute
+        frames = frame_features(y, sr)
+        for lo, hi, bounds in chunks:
+            part = slice_frames(frames, lo, hi)
+            yield (_section_summary(part, sr, *bounds) if bounds else None), part
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_analyze_chunk, *chunk_args(lo, hi, bounds)) for lo, hi, bounds in chunks]
+        for future in futures:
+            yield future.result()
+
+
+def analyze_sections(y: np.ndarray, sr: int, section_duration: float = 15.0,
+                     workers: int | None = None) -> list[dict]:
+    """Analyze the track in sections to detect changes over time.
+
+    Works on the decoded signal, with sections analyzed in parallel.
+    """
+    return [section for section, _ in iter_sections(y, sr, section_duration, workers) if section]
+
+
+# --- Structural segmentation ---
+
+NOVELTY_BLOCK_SECONDS = 0.5   # frames are averaged into blocks before self-similarity
+NOVELTY_KERNEL_SECONDS = 16.0  # checkerboard kernel width (8s either side of a boundary)
+MIN_SEGMENT_SECONDS = 8.0
+
+
+def novelty_features(frames: dict, block_frames: int) -> np.ndarray:
+    """Per-block feature vectors (n_blocks, d): chroma plus timbre, unit length.
+
+    Each dimension is standardized over the track; the harmony (chroma) and
+    timbre groups are weighted equally so neither dominates the similarity.
+    """
+    timbre = np.vstack([
+        np.log1p(100 * frames["rms"]), frames["centroid"], frames["bandwidth"],
+        frames["flatness"], frames["onset"],
+    ])
+    M = np.vstack([frames["chroma"], timbre])
+    starts = np.arange(0, M.shape[1], block_frames)
+    counts = np.diff(np.append(starts, M.shape[1]))
+    X = (np.add.reduceat(M, starts, axis=1) / counts).T
+
+    X = (X - X.mean(axis=0)) / (X.std(axis=0) + 1e-8)
+    X[:, :12] *= np.sqrt(len(timbre) / 12)
+    return X / (np.linalg.norm(X, axis=1, keepdims=True) + 1e-8)
+
+
+def novelty_curve(X: np.ndarray, half_width: int) -> np.ndarray:
+    """Checkerboard-kernel novelty along the diagonal of X's self-similarity.
+
+    Only similarities within 2 * half_width blocks of the diagonal are computed
+    (an n x 2L band rather than the full n x n matrix), so memory is O(n * L)
+    and an hour-long track stays cheap.
+    """
+    n, L = len(X), half_width
+    # band[i, k] = cosine similarity of blocks i and i + k
+    band = np.zeros((n, 2 * L))
+    for k in range(min(2 * L, n)):
+        band[:n - k, k] = np.einsum("ij,ij->i", X[:n - k], X[k:])
+
+    # Gaussian-tapered checkerboard: + within each side, - across the centre
+    offsets = np.arange(-L, L)
+    taper = np.exp(-0.5 * ((offsets + 0.5) / (0.5 * L)) ** 2)
+    rows = np.arange(n)
+    novelty = np.zeros(n)
+    for a in offsets:
+        for b in offsets:
+            weight = taper[a + L] * taper[b + L] * (1.0 if (a < 0) == (b < 0) else -1.0)
+            lag = abs(b - a)
+            first = rows + min(a, b)
+            valid = (first >= 0) & (first + lag < n)
+            novelty[valid] += weight * band[first[valid], lag]
+    return np.maximum(novelty, 0.0)
+
+
+def novelty_bounds(frames: dict, sr: int, total_duration: float,
+                   kernel_seconds: float = NOVELTY_KERNEL_SECONDS,
+                   min_segment: float = MIN_SEGMENT_SECONDS) -> list[tuple[float, float]]:
+    """(start, end) windows of the track's real sections, from novelty peaks."""
+    block_frames = max(1, int(round(NOVELTY_BLOCK_SECONDS * sr / HOP_LENGTH)))
+    block_seconds = block_frames * HOP_LENGTH / sr
+    X = novelty_features(frames, block_frames)
+    half_width = max(2, int(kernel_seconds / block_seconds / 2))
+
+    novelty = novelty_curve(X, half_width)
+    if novelty.max() > 0:
+        novelty /= novelty.max()
+    peaks = librosa.util.peak_pick(
+        novelty, pre_max=half_width, post_max=half_width, pre_avg=2 * half_width,
+        post_avg=2 * half_width, delta=0.1, wait=max(1, int(min_segment / block_seconds)),
+    )
+    # Keep only clearly stronger-than-usual changes
+    peaks = peaks[novelty[peaks] >= novelty.mean() + novelty.std()]
+
+    edges = [0.0]
+    for t in peaks * block_seconds:
+        if t - edges[-1] >= min_segment and total_duration - t >= min_segment:
+            edges.append(float(t))
+    edges.append(total_duration)
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def analyze_segments(frames: dict, sr: int, total_duration: float) -> list[dict]:
+    """Find structural sections from novelty and summarise each one."""
+    n_frames = len(frames["rms"])
+    segments = []
+    for start, end in novelty_bounds(frames, sr, total_duration):
+        lo, hi = section_frame_range(start, end, n_frames)
+        segments.append(_section_summary(slice_frames(frames, lo, hi), sr, start, end))
+    return segments
+
+
+def analyze_track(filepath: str, section_duration: float = 15.0, on_section=None,
+                  workers: int | None = None, segmentation: str = "grid") -> dict:
+    """Decode once and return {"features", "sections"}.
+
+    For tracks longer than 30s, frame features are computed per chunk in
+    parallel (in one pass with a single worker) and the whole-track features
+    are reduced from the same frames.
+    With segmentation="grid", sections are fixed windows passed to
+    ``on_section`` as they complete; with "novelty", they are the track's
+    structural sections, found once all frames are in. Shorter tracks get
+    "sections": None.
+    """
+    y, sr = decode_audio(filepath), SAMPLE_RATE
+    duration = librosa.get_duration(y=y, sr=sr)
+    whole = FeatureAccumulator()
+
+    sections = None
+    if round(duration, 1) > 30:
+        sections = []
+        parts = []
+        for section, frames in iter_sections(y, sr, section_duration, workers):
+            whole.update(frames)
+            if segmentation == "novelty":
+                parts.append(frames)
+            elif section is not None:
+                sections.append(section)
+                if on_section:
+                    on_section(section)
+        if segmentation == "novelty":
+            sections = analyze_segments(concat_frames(parts), sr, duration)
+            for section in sections:
+                if on_section:
+                    on_section(section)
+    else:
+        whole.update(frame_features(y, sr))
+
+    return {"features": whole.features(sr, duration), "sections": sections}
 
-    return sections
+
+def analyze_stream_sections(filepath: str, section_duration: float = 15.0,
+                            on_section=None) -> tuple[dict, list[dict] | None]:
+    """Whole-track features and fixed-grid sections from one streaming pass.
+
+    Reads the file in blocks (see ``analyze_mood.stream_frame_features``), or
+    pipes it through ffmpeg for formats soundfile can't read, so memory stays
+    flat however long the recording is. Each section is passed to
+    ``on_section`` once the stream has moved past it and the track is known
+    to be longer than 30s; like analyze_track, shorter tracks get sections
+    None and nothing is passed on.
+    """
+    frames_per_section = section_duration * SAMPLE_RATE / HOP_LENGTH
+
+    whole = FeatureAccumulator()
+    section_accs = {}
+    sections = []
+    emitted = 0
+
+    def emit_pending():
+        nonlocal emitted
+        if on_section:
+            for section in sections[emitted:]:
+                on_section(section)
+        emitted = len(sections)
+
+    def finish_section(i, end):
+        start = i * section_duration
+        section = section_accs.pop(i).features(SAMPLE_RATE, end - start)
+        section["start"] = round(start, 1)
+        section["end"] = round(end, 1)
+        sections.append(section)
+
+    blocks = audio_blocks(filepath)
+    for frames in stream_frame_features(filepath, blocks=blocks):
+        whole.update(frames)
+        first = frames["start_frame"]
+        n = len(frames["rms"])
+        # Route each contiguous run of frames to the section it falls in
+        section_idx = ((first + np.arange(n)) // frames_per_section).astype(int)
+        for i in np.unique(section_idx):
+            run = np.flatnonzero(section_idx == i)
+            section_accs.setdefault(int(i), FeatureAccumulator()).update(
+                slice_frames(frames, run[0], run[-1] + 1))
+        # Sections the stream has fully passed
+        for i in sorted(section_accs):
+            if first + n >= (i + 1) * frames_per_section:
+                finish_section(i, (i + 1) * section_duration)
+        # Hold sections back until the track is known to be sectioned at all
+        if round((first + n - 1) * HOP_LENGTH / SAMPLE_RATE, 1) > 30:
+            emit_pending()
+
+    # A piped stream's length is only known once it ends; the final partial
+    # section follows section_bounds() and is dropped if shorter than 5s
+    if blocks is None:
+        import soundfile as sf
+        total_duration = sf.info(filepath).duration
+    else:
+        total_duration = max(0, whole.n_frames - 1) * HOP_LENGTH / SAMPLE_RATE
+    if round(total_duration, 1) <= 30:
+        return whole.features(SAMPLE_RATE, total_duration), None
+    for i in sorted(section_accs):
+        if i * section_duration < total_duration - 5:
+            finish_section(i, min((i + 1) * section_duration, total_duration))
+    emit_pending()
+    return whole.features(SAMPLE_RATE, total_duration), sections
 
 
 def generate_audial_prompt(features: dict, tags: list[str], title: str = "") -> str:
@@ -213,6 +638,13 @@ def generate_audial_prompt(features: dict, tags: list[str], title: str = "") ->
     return prompt
 
 
+def format_section_row(s: dict) -> str:
+    """One row of the "Track evolution" table."""
+    energy_bar = "#" * int(s["energy"] * 10)
+    bright_bar = "#" * int(s["brightness"] * 10)
+    return f"    {s['start']:5.0f}s-{s['end']:5.0f}s  E[{energy_bar:<10}] B[{bright_bar:<10}] {s['key']} {s['mode']}"
+
+
 def print_report(filepath: str, features: dict, tags: list[str], title: str, prompt: str, sections: list[dict] | None = None):
     """Print the full analysis report."""
     print(f"\n{'='*60}")
@@ -244,10 +676,7 @@ def print_report(filepath: str, features: dict, tags: list[str], title: str, pro
     if sections and len(sections) > 1:
         print(f"\n  Track evolution:")
         for s in sections:
-            s_tags = tag_mood(s)
-            energy_bar = "#" * int(s["energy"] * 10)
-            bright_bar = "#" * int(s["brightness"] * 10)
-            print(f"    {s['start']:5.0f}s-{s['end']:5.0f}s  E[{energy_bar:<10}] B[{bright_bar:<10}] {s['key']} {s['mode']}")
+            print(format_section_row(s))
 
     print(f"\n  {'='*58}")
     print(f"  AUDIAL PROMPT (paste this into Audial):")
@@ -269,20 +698,10 @@ def extract_youtube_id(url: str) -> str | None:
     return None
 
 
-def save_to_db(youtube_id: str | None, title: str, features: dict, tags: list[str],
-               prompt: str, source_url: str = ""):
-    """Save analysis results to the track database."""
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-
-    # Load existing database
-    if os.path.exists(DB_PATH):
-        with open(DB_PATH, "r", encoding="utf-8") as f:
-            db = json.load(f)
-    else:
-        db = {"tracks": []}
-
-    # Build track entry
-    entry = {
+def build_entry(youtube_id: str | None, title: str, features: dict, tags: list[str],
+                prompt: str) -> dict:
+    """Track database entry for an analysis result."""
+    return {
         "title": title,
         "youtube_id": youtube_id or "",
         "game": "",
@@ -303,59 +722,255 @@ def save_to_db(youtube_id: str | None, title: str, features: dict, tags: list[st
         "notes": "",
     }
 
-    # Check if track already exists (by youtube_id)
-    if youtube_id:
-        for i, t in enumerate(db["tracks"]):
-            if t.get("youtube_id") == youtube_id:
-                # Update existing entry (preserve game/category/aliases/notes)
-                entry["game"] = t.get("game", "")
-                entry["category"] = t.get("category", "")
-                entry["aliases"] = t.get("aliases", [])
-                entry["notes"] = t.get("notes", "")
-                entry["bpm_feel"] = t.get("bpm_feel")
-                db["tracks"][i] = entry
-                break
+
+def save_entries_to_db(entries: list[dict]):
+    """Record several entries in the track database with a single journal append."""
+    track_store.save_entries(entries, DB_PATH)
+
+
+def save_to_db(youtube_id: str | None, title: str, features: dict, tags: list[str],
+               prompt: str, source_url: str = ""):
+    """Save analysis results to the track database."""
+    save_entries_to_db([build_entry(youtube_id, title, features, tags, prompt)])
+
+
+# --- Bulk ingest ---
+
+def read_sources(path: str) -> list[str]:
+    """URLs/paths from a file (or "-" for stdin), one per line; blank and # lines skipped."""
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        lines = [line.strip() for line in f]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def fetch_source(source: str, workdir: str, use_download_cache: bool = True) -> dict:
+    """Fetch stage: download a URL (through the download cache), or pass a local file through.
+
+    Returns {"source", "youtube_id", "title", "filepath", "temporary"}. Only
+    temporary files (downloaded into workdir with the cache off) may be deleted.
+    """
+    if is_url(source):
+        if use_download_cache and download_cache_limit() > 0:
+            info, temporary = fetch_cached(source), False
         else:
-            db["tracks"].append(entry)
-    else:
-        db["tracks"].append(entry)
+            os.makedirs(workdir, exist_ok=True)
+            info, temporary = fetch_audio(source, workdir), True
+        return {
+            "source": source,
+            "youtube_id": extract_youtube_id(source),
+            "title": info["title"],
+            "filepath": info["filepath"],
+            "temporary": temporary,
+        }
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"file not found: {source}")
+    return {
+        "source": source,
+        "youtube_id": None,
+        "title": os.path.splitext(os.path.basename(source))[0],
+        "filepath": source,
+        "temporary": False,
+    }
+
+
+def track_cache_params(segmentation: str = "grid") -> dict:
+    """Cache fingerprint parameters for analyze_track() results."""
+    return {**analysis_params(), "sections": 15.0, "segmentation": segmentation}
+
 
-    # Save
-    with open(DB_PATH, "w", encoding="utf-8") as f:
-        json.dump(db, f, indent=2, ensure_ascii=False)
+def analyze_fetched(item: dict, use_cache: bool = True) -> dict:
+    """Analysis stage (runs in a worker process): decode + analyze one fetched item."""
+    filepath = item["filepath"]
+    compute = lambda: analyze_track(filepath, workers=1)
+    result = cached(filepath, track_cache_params(), compute) if use_cache else compute()
+    features = result["features"]
+    tags = tag_mood(features)
+    prompt = generate_audial_prompt(features, tags, item["title"])
+    return {**item, "features": features, "tags": tags, "prompt": prompt}
+
+
+def bulk_ingest(sources: list[str], fetcher=fetch_source, fetch_concurrency: int = 4,
+                workers: int | None = None, use_cache: bool = True, on_result=None) -> tuple[list[dict], list[dict]]:
+    """Fetch, decode and analyze many sources as an overlapping pipeline.
+
+    Downloads run on a bounded thread pool; as each one lands it is handed to
+    a process pool for decoding and analysis, so network waits hide analysis
+    time. ``fetcher(source, workdir)`` is the download stage (swap in a local
+    stand-in for testing). ``on_result`` is called with each analyzed item or
+    error dict as it completes. Returns (results, errors); nothing is written
+    to the database here.
+    """
+    import shutil
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+    workdir = tempfile.mkdtemp(prefix="audial_ingest_")
+    results, errors = [], []
+
+    def report(record, failed=False):
+        (errors if failed else results).append(record)
+        if on_result:
+            on_result(record)
+
+    try:
+        with ThreadPoolExecutor(max_workers=fetch_concurrency) as fetch_pool, \
+                ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as analysis_pool:
+            pending = {
+                fetch_pool.submit(fetcher, source, os.path.join(workdir, str(i))): ("fetch", source)
+                for i, source in enumerate(sources)
+            }
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, payload = pending.pop(future)
+                    source = payload if stage == "fetch" else payload["source"]
+                    try:
+                        value = future.result()
+                    except Exception as e:
+                        report({"source": source, "stage": stage, "error": f"{type(e).__name__}: {e}"}, True)
+                        value = None
+                    if stage == "fetch" and value is not None:
+                        pending[analysis_pool.submit(analyze_fetched, value, use_cache)] = ("analyze", value)
+                    elif stage == "analyze":
+                        if value is not None:
+                            report(value)
+                        if payload.get("temporary"):
+                            shutil.rmtree(os.path.dirname(payload["filepath"]), ignore_errors=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return results, errors
+
+
+def positive_int_option(args: list[str], name: str, default=None):
+    """The positive integer following ``name`` in args, or default if absent.
+
+    Raises ValueError if the value is missing or not a positive integer.
+    """
+    if name not in args:
+        return default
+    try:
+        value = int(args[args.index(name) + 1])
+    except (IndexError, ValueError):
+        value = 0
+    if value < 1:
+        raise ValueError(f"{name} needs a positive integer")
+    return value
+
+
+def bulk_main(args: list[str]):
+    """--bulk <sources.txt|-> [--fetch-concurrency N] [--workers N] [--no-save] [--no-cache]"""
+    usage = ("Usage: python tools/reference_track.py --bulk <sources.txt|-> "
+             "[--fetch-concurrency N] [--workers N] [--no-save] [--no-cache]")
+    if not args:
+        print(usage)
+        sys.exit(1)
+    try:
+        fetch_concurrency = positive_int_option(args, "--fetch-concurrency", 4)
+        workers = positive_int_option(args, "--workers")
+    except ValueError as e:
+        print(f"Error: {e}")
+        print(usage)
+        sys.exit(1)
+
+    sources = read_sources(args[0])
+    no_save = "--no-save" in args
+    use_cache = "--no-cache" not in args
+
+    done = []
+
+    def on_result(record):
+        done.append(record)
+        prefix = f"  [{len(done)}/{len(sources)}]"
+        if "error" in record:
+            print(f"{prefix} FAILED {record['source']} ({record['stage']}): {record['error']}", flush=True)
+        else:
+            f = record["features"]
+            print(f"{prefix} {record['title']}  {f['key']} {f['mode']}, {f['tempo']} BPM, "
+                  f"E {f['energy']:.2f} B {f['brightness']:.2f}", flush=True)
+
+    print(f"  ingesting {len(sources)} sources...")
+    results, errors = bulk_ingest(sources, fetch_concurrency=fetch_concurrency,
+                                  workers=workers, use_cache=use_cache, on_result=on_result)
+
+    if results and not no_save:
+        save_entries_to_db([
+            build_entry(r["youtube_id"], r["title"], r["features"], r["tags"], r["prompt"])
+            for r in results
+        ])
+        print(f"  saved {len(results)} tracks to {os.path.normpath(DB_PATH)}")
+    print(f"  done: {len(results)} analyzed, {len(errors)} failed")
+    if errors:
+        sys.exit(2)
 
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python tools/reference_track.py <youtube_url_or_file> [--keep] [--no-save]")
+        print("Usage: python tools/reference_track.py <youtube_url_or_file> [--keep] [--no-save] [--stream] [--json]")
         print()
         print("  Analyzes a reference track and generates an Audial prompt.")
-        print("  --keep     Keep the downloaded audio file")
+        print("  --keep     Copy the downloaded audio into references/")
         print("  --no-save  Don't save to the track database")
+        print("  --stream   Analyze in blocks with bounded memory (long recordings)")
+        print("  --no-cache Re-analyze even if this audio was analyzed before")
+        print("  --no-download-cache  Download again even if this video is in references/cache/")
+        print("  --json     Emit JSON lines: one per section as it completes, then the track")
+        print("  --workers  Worker processes for section analysis (default: all cores)")
+        print("  --segments grid|novelty  Fixed 15s sections (default) or detected structure")
         print()
         print("Examples:")
         print('  python tools/reference_track.py "https://youtube.com/watch?v=dQw4w9WgXcQ"')
         print("  python tools/reference_track.py my_song.mp3")
+        print("  python tools/reference_track.py --bulk sources.txt   # many URLs/files, one per line")
         sys.exit(1)
 
+    if sys.argv[1] == "--bulk":
+        bulk_main(sys.argv[2:])
+        return
+
     source = sys.argv[1]
     keep_file = "--keep" in sys.argv
     no_save = "--no-save" in sys.argv
+    stream = "--stream" in sys.argv
+    use_cache = "--no-cache" not in sys.argv
+    use_download_cache = "--no-download-cache" not in sys.argv
+    use_json = "--json" in sys.argv
+    try:
+        workers = positive_int_option(sys.argv, "--workers")
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    segmentation = "grid"
+    if "--segments" in sys.argv:
+        idx = sys.argv.index("--segments")
+        if idx + 1 < len(sys.argv):
+            segmentation = sys.argv[idx + 1]
+    if segmentation not in ("grid", "novelty"):
+        print(f"Error: unknown segmentation: {segmentation} (use grid or novelty)")
+        sys.exit(1)
+    if stream and segmentation == "novelty":
+        print("Error: --segments novelty needs the whole track's frames; drop --stream")
+        sys.exit(1)
 
     youtube_id = None
+    tmp_dir = None
     if is_url(source):
-        # Download from YouTube
-        youtube_id = extract_youtube_id(source)
-        title = get_video_title(source)
-        print(f"  track: {title}")
+        # Download from YouTube: one yt-dlp call for audio + metadata, served
+        # from references/cache/ when this video was fetched before
+        tmp_dir = tempfile.mkdtemp()
+        item = fetch_source(source, tmp_dir, use_download_cache)
+        youtube_id, title, filepath = item["youtube_id"], item["title"], item["filepath"]
+        print(f"  track: {title}", file=sys.stderr if use_json else sys.stdout)
 
         if keep_file:
+            import shutil
             dl_dir = os.path.join(os.path.dirname(__file__), "..", "references")
             os.makedirs(dl_dir, exist_ok=True)
-            filepath = download_audio(source, dl_dir)
-        else:
-            tmp_dir = tempfile.mkdtemp()
-            filepath = download_audio(source, tmp_dir)
+            ext = os.path.splitext(filepath)[1]
+            filepath = shutil.copy2(filepath, os.path.join(dl_dir, f"{youtube_id or 'reference'}{ext}"))
     else:
         # Local file
         filepath = source
@@ -365,34 +980,57 @@ def main():
             sys.exit(1)
 
     try:
-        print("  analyzing...")
-        features = analyze(filepath)
+        print("  analyzing...", file=sys.stderr if use_json else sys.stdout)
+
+        # Emit each section as soon as it is ready (cache hits replay them all)
+        emitted = []
+
+        def emit_section(section):
+            if use_json:
+                print(json.dumps({"type": "section", **section}, ensure_ascii=False), flush=True)
+            else:
+                if not emitted:
+                    print(f"\n  Track evolution:")
+                print(format_section_row(section), flush=True)
+            emitted.append(section)
+
+        if stream:
+            features, sections = analyze_stream_sections(filepath, on_section=emit_section)
+        else:
+            # Whole-track features plus sections for tracks > 30s
+            compute = lambda: analyze_track(filepath, on_section=emit_section, workers=workers,
+                                            segmentation=segmentation)
+            if use_cache:
+                result = cached(filepath, track_cache_params(segmentation), compute)
+            else:
+                result = compute()
+            features, sections = result["features"], result["sections"]
+            for section in (sections or [])[len(emitted):]:
+                emit_section(section)
         tags = tag_mood(features)
 
-        # Section analysis for tracks > 30s
-        sections = None
-        if features["duration"] > 30:
-            sections = analyze_sections(filepath)
-
         prompt = generate_audial_prompt(features, tags, title)
 
-        print_report(filepath, features, tags, title, prompt, sections)
+        if use_json:
+            print(json.dumps({
+                "type": "track", "title": title, "file": filepath, **features,
+                "mood_tags": tags, "audial_prompt": prompt,
+            }, ensure_ascii=False))
+        else:
+            # Sections were already printed as they completed
+            print_report(filepath, features, tags, title, prompt)
 
         # Auto-save to database
         if not no_save:
             save_to_db(youtube_id, title, features, tags, prompt, source)
 
         if keep_file and is_url(source):
-            print(f"  Audio saved: {filepath}")
+            print(f"  Audio saved: {filepath}", file=sys.stderr if use_json else sys.stdout)
     finally:
-        # Clean up temp files (only if not --keep)
-        if is_url(source) and not keep_file:
-            try:
-                os.unlink(filepath)
-                os.rmdir(os.path.dirname(filepath))
-            except OSError:
-                pass
-
+        # Clean up the download if it bypassed the cache
+        if tmp_dir:
+            import shutil
+            shutil.rmtree(tmp_dir, ignore_errors=True)
 
 if __name__ == "__main__":
     main()
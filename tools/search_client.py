@@ -0,0 +1,104 @@
+"""
+Search Client
+Drop-in for search_tracks.py that asks a running search_server.py instead of
+loading the library itself. Takes the same arguments and prints the same
+output, with the same exit code.
+
+If no server is listening (connection refused), the query runs locally
+through search_tracks.py, so scripts can call this unconditionally. So does
+--batch reading stdin. A server that is there but fails to answer (timeout,
+dropped connection, bad reply) is an error rather than a reason to run the
+query a second time locally.
+
+Usage:
+    python tools/search_client.py --mood dark --energy 0.8:1.0 --key minor
+    python tools/search_client.py --recommend "dark sacred slow for Byzantine painting"
+    AUDIAL_SEARCH_PORT=9000 python tools/search_client.py "final fantasy"
+"""
+
+import sys
+import os
+import json
+import http.client
+
+try:
+    sys.stdout.reconfigure(encoding="utf-8")
+except AttributeError:
+    pass
+
+HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+TIMEOUT = 60
+
+# Arguments naming local files: the server may run from another directory
+PATH_OPTIONS = ("--audio", "--batch")
+
+
+def server_port() -> int:
+    try:
+        return int(os.environ.get("AUDIAL_SEARCH_PORT", DEFAULT_PORT))
+    except ValueError:
+        return DEFAULT_PORT
+
+
+def absolute_paths(args: list[str]) -> list[str]:
+    args = list(args)
+    for i, arg in enumerate(args[:-1]):
+        if arg in PATH_OPTIONS and not args[i + 1].startswith("-"):
+            args[i + 1] = os.path.abspath(args[i + 1])
+    return args
+
+
+def query_server(args: list[str], port: int | None = None) -> dict | None:
+    """The server's {"code", "output", "errors"} for args, or None if no server is listening.
+
+    Raises OSError (e.g. TimeoutError) or ValueError when a server was
+    reached but the query did not complete.
+    """
+    conn = http.client.HTTPConnection(HOST, port or server_port(), timeout=TIMEOUT)
+    try:
+        body = json.dumps({"args": absolute_paths(args)})
+        try:
+            conn.request("POST", "/search", body, {"Content-Type": "application/json"})
+        except ConnectionRefusedError:
+            return None
+        response = conn.getresponse()
+        payload = response.read()
+        if response.status != 200:
+            raise ValueError(f"server replied {response.status}: {payload[:200]!r}")
+        return json.loads(payload)
+    finally:
+        conn.close()
+
+
+def reads_stdin(args: list[str]) -> bool:
+    """--batch from stdin: the server cannot see this process's stdin."""
+    if "--batch" not in args:
+        return False
+    i = args.index("--batch")
+    return i + 1 == len(args) or args[i + 1] == "-" or args[i + 1].startswith("--")
+
+
+def main():
+    args = sys.argv[1:]
+    try:
+        result = None if reads_stdin(args) else query_server(args)
+    except TimeoutError:
+        print(f"  Search server on port {server_port()} did not answer within {TIMEOUT}s",
+              file=sys.stderr)
+        sys.exit(1)
+    except (OSError, ValueError) as e:
+        print(f"  Search server on port {server_port()} failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    if result is None:
+        sys.path.insert(0, os.path.dirname(__file__))
+        import search_tracks
+        search_tracks.main(args)
+        return
+    sys.stderr.write(result.get("errors", ""))
+    sys.stdout.write(result["output"])
+    sys.exit(result["code"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Search Server
+Keeps search_tracks hot: the library and every index it uses stay in memory
+between queries, so a query costs only the search itself.
+
+A long-running process serves search_tracks queries over HTTP on localhost.
+Each request carries the same arguments search_tracks.py takes; the server
+runs search_tracks.main() on them in-process and returns its output and exit
+code. Before every query it compares the size/mtime of tracks.json and its
+journal with the ones it loaded. When they changed it drops its cached state,
+and the indexes then refresh themselves (incrementally where they can, see
+text_index.py and similarity_index.py) on the next query that needs them.
+
+Queries run one at a time, in arrival order. The server only listens on
+127.0.0.1.
+
+    POST /search   {"args": ["--mood", "dark", "--limit", "5"]}
+                   -> {"code": 0, "output": "...", "errors": "..."}  (stdout, stderr)
+    GET  /status   -> {"tracks": 148, "queries": 12, "cached": [...]}
+
+search_client.py is the matching client.
+
+Usage:
+    python tools/search_server.py                # port 8765 (AUDIAL_SEARCH_PORT)
+    python tools/search_server.py --port 9000
+"""
+
+import sys
+import os
+import io
+import json
+import time
+import contextlib
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+try:
+    sys.stdout.reconfigure(encoding="utf-8")
+except AttributeError:
+    pass
+
+sys.path.insert(0, os.path.dirname(__file__))
+import search_tracks
+
+HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_REQUEST_BYTES = 1 << 20
+
+
+def server_port() -> int:
+    """Port from AUDIAL_SEARCH_PORT, else DEFAULT_PORT."""
+    try:
+        return int(os.environ.get("AUDIAL_SEARCH_PORT", DEFAULT_PORT))
+    except ValueError:
+        return DEFAULT_PORT
+
+
+def run_query(args: list[str]) -> tuple[int, str, str]:
+    """search_tracks.main(args) in-process: (exit code, captured stdout, captured stderr)."""
+    out = io.StringIO()
+    err = io.StringIO()
+    code = 0
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+        try:
+            search_tracks.main(args)
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            if isinstance(e.code, str):
+                print(e.code)
+        except Exception as e:
+            code = 1
+            print(f"  Error: {type(e).__name__}: {e}")
+    return code, out.getvalue(), err.getvalue()
+
+
+class SearchHandler(BaseHTTPRequestHandler):
+    queries = 0
+
+    def _reply(self, status: int, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/status":
+            self._reply(404, {"error": "not found"})
+            return
+        tracks = search_tracks._hot.get("tracks")
+        self._reply(200, {
+            "tracks": len(tracks) if tracks is not None else None,
+            "queries": SearchHandler.queries,
+            "cached": sorted(k for k in search_tracks._hot if k != "signature"),
+        })
+
+    def do_POST(self):
+        if self.path != "/search":
+            self._reply(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length > MAX_REQUEST_BYTES:
+                raise ValueError("request too large")
+            request = json.loads(self.rfile.read(length) or b"{}")
+            args = request.get("args", [])
+            if not isinstance(args, list) or not all(isinstance(a, str) for a in args):
+                raise ValueError("args must be a list of strings")
+        except ValueError as e:
+            self._reply(400, {"error": str(e)})
+            return
+        start = time.perf_counter()
+        code, output, errors = run_query(args)
+        SearchHandler.queries += 1
+        self._reply(200, {"code": code, "output": output, "errors": errors,
+                          "ms": round((time.perf_counter() - start) * 1000, 2)})
+
+    def log_message(self, format, *args):
+        pass  # one line per query would drown the terminal
+
+
+def main():
+    args = sys.argv[1:]
+    port = server_port()
+    if args[:1] == ["--port"] and len(args) > 1:
+        port = int(args[1])
+    elif args:
+        print(__doc__.strip())
+        sys.exit(1)
+
+    # Load the library up front so the first query is as fast as the rest
+    search_tracks.refresh_hot()
+    tracks = search_tracks.hot("tracks", search_tracks.load_db)
+
+    server = HTTPServer((HOST, port), SearchHandler)
+    print(f"  Search server on http://{HOST}:{port} ({len(tracks)} tracks). Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -15,37 +15,89 @@ Usage:
     python tools/search_tracks.py --category "Sacred"      # by category
     python tools/search_tracks.py --game "FFX"             # by game/source
     python tools/search_tracks.py --similar "Julia"        # find similar tracks
+    python tools/search_tracks.py --similar "Julia" --similar "Zanarkand"   # near both
+    python tools/search_tracks.py --vector 0.6,0.2,0.5,110,minor           # energy,brightness,density,bpm[,mode]
+    python tools/search_tracks.py --audio exports/my_track.wav              # tracks that sound like a file
     python tools/search_tracks.py --sort energy            # sort by metric
     python tools/search_tracks.py --json                   # output as JSON
+    python tools/search_tracks.py --jsonl --fields title,game,bpm   # one JSON line per track, streamed
+    python tools/search_tracks.py --mood dark --facets     # + counts per category/game/key/mode/tag
 
 Combine filters:
     python tools/search_tracks.py --mood dark --energy 0.8:1.0 --key minor
 
 Natural language recommendations:
     python tools/search_tracks.py --recommend "dark sacred slow for Byzantine painting"
+
+Concept search (related words count, not just exact ones):
+    python tools/search_tracks.py --concept "byzantine chant"
+
+Many queries in one run (one JSON object per line, from a file or stdin):
+    python tools/search_tracks.py --batch queries.jsonl --workers 4
+    echo '{"mood": "dark", "bpm": "80:120", "limit": 5}' | python tools/search_tracks.py --batch
+    fields: text mood key bpm energy brightness density category game similar
+            vector audio recommend concept sort limit facets fields id
 """
 
 import sys
 import os
 import json
 import math
+import heapq
+import itertools
 
 try:
     sys.stdout.reconfigure(encoding="utf-8")
 except AttributeError:
     pass
 
-DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "tracks.json")
+sys.path.insert(0, os.path.dirname(__file__))
+import track_store
+import track_db
+import text_index
+import filter_index
+import bitmap_index
+import bm25_index
+import fuzzy_index
+try:
+    import track_columns
+    import similarity_index
+    import semantic_index
+    from similarity import SimilarityEngine, track_vector, seed_query
+except ImportError:  # numpy missing: no columnar snapshot, vectorized similarity or concepts
+    track_columns = None
+    SimilarityEngine = None
+    semantic_index = None
+
+DB_PATH = track_store.DB_PATH
+
+
+# The library and everything derived from it, kept across main() calls in one
+# process (search_server.py) until tracks.json or its journal changes
+_hot = {"signature": None}
+
+
+def refresh_hot():
+    """Drop cached state if the library changed since it was loaded."""
+    signature = track_store.library_signature(DB_PATH)
+    if _hot["signature"] != signature:
+        _hot.clear()
+        _hot["signature"] = signature
+
+
+def hot(name: str, load):
+    """load(), or its result from an earlier query against the same library."""
+    if name not in _hot:
+        _hot[name] = load()
+    return _hot[name]
 
 
 def load_db() -> list[dict]:
-    if not os.path.exists(DB_PATH):
+    if not track_store.exists(DB_PATH):
         print(f"  No track database found at {DB_PATH}")
         print(f"  Run reference_track.py to analyze tracks first.")
         sys.exit(1)
-    with open(DB_PATH, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return data.get("tracks", [])
+    return track_store.load_tracks(DB_PATH)
 
 
 def parse_range(s: str) -> tuple[float, float]:
@@ -101,12 +153,21 @@ def in_range(value, lo, hi) -> bool:
 
 
 def similarity_score(a: dict, b: dict) -> float:
-    """Compute similarity between two tracks based on audio features."""
+    """Compute similarity between two tracks based on audio features.
+
+    A feature missing on either side adds nothing; only tempo falls back
+    from bpm_feel to bpm. similarity.SimilarityEngine computes the same score
+    for the whole library at once.
+    """
     score = 0.0
     weights = {"energy": 2.0, "brightness": 2.0, "density": 1.5, "bpm_feel": 1.0}
     for feat, w in weights.items():
-        va = a.get(feat) or a.get("bpm")
-        vb = b.get(feat) or b.get("bpm")
+        if feat == "bpm_feel":
+            va = a.get(feat) or a.get("bpm")
+            vb = b.get(feat) or b.get("bpm")
+        else:
+            va = a.get(feat)
+            vb = b.get(feat)
         if va is not None and vb is not None:
             if feat == "bpm_feel":
                 # Normalize BPM to 0-1 scale (40-200 range)
@@ -120,6 +181,36 @@ def similarity_score(a: dict, b: dict) -> float:
     return score
 
 
+def parse_vector(s: str) -> tuple:
+    """Parse --vector "energy,brightness,density,bpm[,mode]"; empty fields are missing."""
+    parts = [p.strip() for p in s.split(",")]
+    values = [float(p) if p else None for p in parts[:4]]
+    values += [None] * (4 - len(values))
+    mode = parts[4].lower() if len(parts) > 4 and parts[4] else None
+    track = dict(zip(("energy", "brightness", "density", "bpm"), values))
+    return track_vector(track), mode
+
+
+def find_similar(tracks: list[dict], vector, mode: str | None, k: int = 10,
+                 exclude=()) -> list[tuple[float, dict]]:
+    """(score, track) of the k tracks closest to a feature vector, best first.
+
+    Uses the persisted KD-tree (similarity_index.py) when it has been built,
+    otherwise one vectorized pass over the library.
+    """
+    tree = hot("kdtree", lambda: similarity_index.open_index(tracks))
+    if tree is not None and len(tree) == len(tracks):
+        top = tree.top_k(vector, mode, k=k, exclude=exclude)
+    else:
+        def load_engine():
+            columns = track_columns.open_columns()
+            if columns is not None and len(columns) == len(tracks):
+                return SimilarityEngine.from_columns(columns)
+            return SimilarityEngine.from_tracks(tracks)
+        top = hot("engine", load_engine).top_k(vector, mode, k=k, exclude=exclude)
+    return [(score, tracks[i]) for score, i in top]
+
+
 def format_bar(val: float, width: int = 10) -> str:
     if val is None:
         return " " * width
@@ -187,6 +278,9 @@ TEMPO_HINTS = {
     "driving": (110, 160),
 }
 
+# Most a --recommend result can gain from concept-space closeness (cosine 1.0)
+CONCEPT_WEIGHT = 3.0
+
 
 def parse_description(desc: str) -> dict:
     """Parse a natural language description into search filters."""
@@ -239,8 +333,15 @@ def parse_description(desc: str) -> dict:
     return filters
 
 
-def score_track_for_description(track: dict, filters: dict) -> float:
-    """Score how well a track matches a parsed description."""
+def score_track_for_description(track: dict, filters: dict, text_hits: set | None = None,
+                                text_score: float | None = None) -> float:
+    """Score how well a track matches a parsed description.
+
+    ``text_score`` is the track's BM25 relevance for the text queries
+    (bm25_index.py) and replaces the flat +3.0 per matching word. Without it,
+    ``text_hits`` is the set of text queries this track matches, when already
+    answered by the text index; otherwise each one is checked with matches_text().
+    """
     score = 0.0
 
     # Mood tag matching
@@ -297,26 +398,62 @@ def score_track_for_description(track: dict, filters: dict) -> float:
                 score -= 0.5
 
     # Text query matching
+    if text_score is not None:
+        return score + text_score
     for q in filters.get("text_queries", []):
-        if matches_text(track, q):
+        if (q in text_hits) if text_hits is not None else matches_text(track, q):
             score += 3.0
 
     return score
 
 
-def cmd_recommend(description: str, tracks: list[dict], limit: int = 3):
-    """Natural language recommendation mode."""
-    filters = parse_description(description)
-
-    scored = []
-    for track in tracks:
-        s = score_track_for_description(track, filters)
-        if s > 0:
-            scored.append((s, track))
+def recommend(description: str, tracks: list[dict], limit: int = 3, index=None,
+              ranker=None, concepts=None) -> list[tuple[float, dict]]:
+    """(score, track) of the best matches for a description, best first.
 
-    scored.sort(key=lambda x: x[0], reverse=True)
-    top = scored[:limit]
+    With a BM25 index (``ranker``), free words are scored by relevance from
+    its postings; otherwise each word is a flat substring hit, looked up in
+    the text index (``index``) when there is one. With a semantic index
+    (``concepts``), tracks close to the free words in concept space score up
+    to CONCEPT_WEIGHT more, even without sharing a word.
+    """
+    filters = parse_description(description)
 
+    concept_scores = None
+    if concepts is not None and len(concepts) == len(tracks) and filters["text_queries"]:
+        concept_scores = concepts.scores(" ".join(filters["text_queries"]))
+
+    text_scores = None
+    word_rows = None
+    if ranker is not None and len(ranker) == len(tracks):
+        text_scores = ranker.scores(filters["text_queries"])
+    elif index is not None and len(index) == len(tracks):
+        # One index lookup per query word instead of a text scan per word per track
+        word_rows = {q: index.search(q) for q in filters["text_queries"]}
+
+    def scored():
+        for i, track in enumerate(tracks):
+            text_hits = None
+            if word_rows is not None:
+                text_hits = {q for q, rows in word_rows.items() if i in rows}
+            text_score = text_scores.get(i, 0.0) if text_scores is not None else None
+            s = score_track_for_description(track, filters, text_hits, text_score)
+            if concept_scores is not None and concept_scores[i] > 0:
+                s += CONCEPT_WEIGHT * float(concept_scores[i])
+            if s > 0:
+                yield s, i
+
+    # Best first, ties in library order
+    return [(s, tracks[i]) for s, i in heapq.nlargest(limit, scored(), key=lambda x: (x[0], -x[1]))]
+
+
+def cmd_recommend(description: str, tracks: list[dict], limit: int = 3, index=None,
+                  ranker=None, concepts=None):
+    """Natural language recommendation mode (see recommend())."""
+    print_recommendations(description, recommend(description, tracks, limit, index, ranker, concepts))
+
+
+def print_recommendations(description: str, top: list[tuple[float, dict]]):
     if not top:
         print(f"\n  No good matches for: \"{description}\"")
         print(f"  Try broader terms or check available moods with: --mood <keyword>")
@@ -381,8 +518,425 @@ def cmd_recommend(description: str, tracks: list[dict], limit: int = 3):
             print(f"\n  {blended}\n")
 
 
-def main():
-    args = sys.argv[1:]
+def iter_rows(tracks: list[dict], text_query=None, mood_filter=None, key_filter=None,
+              bpm_range=None, energy_range=None, brightness_range=None, density_range=None,
+              category_filter=None, game_filter=None,
+              columns=None, index=None, planner=None, bitmaps=None):
+    """Rows (in library order) of the tracks matching every search filter, lazily.
+
+    With a filter index of the same library (filter_index.py), the numeric
+    and key/category/game filters are planned: the most selective one is read
+    from its sorted or hashed index and the others are checked on those rows
+    only. Otherwise key/category/game can come from bitmap indexes
+    (bitmap_index.py) and the numeric and key/category filters from a
+    columnar snapshot (track_columns.py) as one vectorized mask. With a text
+    index (text_index.py), the text query is a postings lookup. Whatever is
+    left is checked track by track on the surviving rows only.
+    """
+    rows = None
+    hits = None
+    if text_query and index is not None and len(index) == len(tracks):
+        hits = index.search(text_query)
+        text_query = None
+    if planner is not None and len(planner) == len(tracks):
+        rows = planner.select(rows=hits, key=key_filter, bpm=bpm_range, energy=energy_range,
+                              brightness=brightness_range, density=density_range,
+                              category=category_filter, game=game_filter)
+        key_filter = bpm_range = energy_range = brightness_range = density_range = None
+        category_filter = game_filter = hits = None
+    else:
+        if bitmaps is not None and len(bitmaps) == len(tracks):
+            bits = bitmaps.select(key=key_filter, category=category_filter, game=game_filter)
+            if bits is not None:
+                matched = set(bitmap_index.bits_to_rows(bits))
+                hits = matched if hits is None else hits & matched
+            key_filter = category_filter = game_filter = None
+        if columns is not None and len(columns) == len(tracks):
+            rows = columns.select(key=key_filter, bpm=bpm_range, energy=energy_range,
+                                  brightness=brightness_range, density=density_range,
+                                  category=category_filter).tolist()
+            key_filter = bpm_range = energy_range = brightness_range = density_range = None
+            category_filter = None
+    if hits is not None:
+        rows = sorted(hits) if rows is None else [i for i in rows if i in hits]
+    if rows is None:
+        rows = range(len(tracks))
+
+    def keep(t: dict) -> bool:
+        if text_query and not matches_text(t, text_query):
+            return False
+        if mood_filter and not matches_mood(t, mood_filter):
+            return False
+        if key_filter and not matches_key(t, key_filter):
+            return False
+        for value, bounds in ((t.get("bpm_feel") or t.get("bpm"), bpm_range),
+                              (t.get("energy"), energy_range),
+                              (t.get("brightness"), brightness_range),
+                              (t.get("density"), density_range)):
+            if bounds and not in_range(value, *bounds):
+                return False
+        if category_filter and category_filter.lower() not in t.get("category", "").lower():
+            return False
+        if game_filter and game_filter.lower() not in t.get("game", "").lower():
+            return False
+        return True
+
+    return (i for i in rows if keep(tracks[i]))
+
+
+def filter_rows(tracks: list[dict], *args, **kwargs) -> list[int]:
+    """iter_rows() as a list."""
+    return list(iter_rows(tracks, *args, **kwargs))
+
+
+def sort_tracks(results: list[dict], sort_by: str | None):
+    """Sort results in place by a --sort field (numbers high first, text A-Z)."""
+    key_map = {
+        "energy": lambda t: t.get("energy") or 0,
+        "brightness": lambda t: t.get("brightness") or 0,
+        "density": lambda t: t.get("density") or 0,
+        "bpm": lambda t: t.get("bpm_feel") or t.get("bpm") or 0,
+        "title": lambda t: t.get("title", "").lower(),
+        "game": lambda t: t.get("game", "").lower(),
+        "key": lambda t: t.get("key", ""),
+    }
+    sort_fn = key_map.get(sort_by)
+    if sort_fn:
+        reverse = sort_by not in ("title", "game", "key")
+        results.sort(key=sort_fn, reverse=reverse)
+
+
+def filter_tracks(tracks: list[dict], text_query=None, mood_filter=None, key_filter=None,
+                  bpm_range=None, energy_range=None, brightness_range=None, density_range=None,
+                  category_filter=None, game_filter=None, sort_by=None, limit=None,
+                  columns=None, index=None, planner=None, bitmaps=None) -> list[dict]:
+    """Apply search filters (see filter_rows), sort and limit to an in-memory track list."""
+    rows = filter_rows(tracks, text_query, mood_filter, key_filter, bpm_range, energy_range,
+                       brightness_range, density_range, category_filter, game_filter,
+                       columns, index, planner, bitmaps)
+    results = [tracks[i] for i in rows]
+    if sort_by:
+        sort_tracks(results, sort_by)
+    if limit:
+        results = results[:limit]
+    return results
+
+
+def print_facets(facets: dict[str, list[tuple[str, int]]], top: int = 10):
+    print(f"  Facets")
+    print(f"  {'-'*50}")
+    for facet, counts in facets.items():
+        shown = ", ".join(f"{value or '(none)'} {n}" for value, n in counts[:top])
+        more = f", +{len(counts) - top} more" if len(counts) > top else ""
+        print(f"  {facet + ':':<10} {shown or '-'}{more}")
+    print()
+
+
+def recommend_query(tracks: list[dict], description: str, limit: int = 3) -> list[tuple[float, dict]]:
+    """recommend() with the library's BM25 and (if built) semantic indexes."""
+    ranker = hot("bm25", lambda: bm25_index.open_index(tracks)
+                 or bm25_index.BM25Index.from_tracks(tracks))
+    concepts = hot("semantic", lambda: semantic_index.open_index(tracks)) \
+        if semantic_index else None
+    return recommend(description, tracks, limit=limit, ranker=ranker, concepts=concepts)
+
+
+def concept_query(tracks: list[dict], text: str, limit: int = 10) -> list[tuple[float, dict]]:
+    """(cosine, track) of the tracks closest to text in concept space."""
+    if semantic_index is None:
+        raise ValueError("--concept needs numpy")
+    concepts = hot("semantic", lambda: semantic_index.open_index(tracks)) \
+        or hot("semantic_mem", lambda: semantic_index.SemanticIndex.from_tracks(tracks))
+    return [(score, tracks[i]) for score, i in concepts.top_k(text, k=limit)]
+
+
+def find_seed(tracks: list[dict], name: str) -> tuple[dict, bool]:
+    """The first track whose title contains name, else the closest fuzzy match.
+
+    Returns (track, fuzzy); raises ValueError when nothing is close.
+    """
+    for t in tracks:
+        if name.lower() in t.get("title", "").lower():
+            return t, False
+    # No title contains it: take the closest title/game/alias instead
+    fuzzy = hot("fuzzy", lambda: fuzzy_index.open_index(tracks)
+                or fuzzy_index.FuzzyIndex.from_tracks(tracks))
+    found = fuzzy.search(name, limit=1)
+    if not found:
+        raise ValueError(f"Track not found: {name}")
+    return tracks[found[0][1]], True
+
+
+def similar_query(tracks: list[dict], seeds: list[dict], like_vector: str | None = None,
+                  like_audio: str | None = None, limit: int = 10) -> tuple[str, list[tuple[float, dict]]]:
+    """(label, [(score, track)]) for --similar seeds, a --vector or an --audio file."""
+    if SimilarityEngine is None:
+        if like_vector or like_audio or len(seeds) > 1:
+            raise ValueError("--vector, --audio and multiple --similar seeds need numpy")
+        # Score all other tracks
+        ref = seeds[0]
+        scored = [(similarity_score(ref, t), t) for t in tracks
+                  if t.get("youtube_id") != ref.get("youtube_id")]
+        scored.sort(key=lambda x: x[0], reverse=True)
+        return ref["title"], scored[:limit]
+
+    if seeds:
+        vector, mode = seed_query(seeds)
+        label = " + ".join(r["title"] for r in seeds)
+    elif like_vector:
+        vector, mode = parse_vector(like_vector)
+        label = f"vector {like_vector}"
+    else:
+        if not os.path.exists(like_audio):
+            raise ValueError(f"File not found: {like_audio}")
+        vector, mode = similarity_index.audio_query(like_audio)
+        label = os.path.basename(like_audio)
+    seed_ids = {r.get("youtube_id") for r in seeds}
+    exclude = [i for i, t in enumerate(tracks) if seeds and t.get("youtube_id") in seed_ids]
+    return label, find_similar(tracks, vector, mode, limit, exclude)
+
+
+def filter_indexes(tracks: list[dict], text_query=None, show_facets=False) -> tuple:
+    """(columns, text index, planner, bitmaps) for filter_rows(); None where not available."""
+    planner = hot("filters", lambda: filter_index.open_index(tracks))
+    bitmaps = hot("bitmaps", lambda: bitmap_index.open_index(tracks))
+    if show_facets and bitmaps is None:
+        bitmaps = hot("bitmaps_mem", lambda: bitmap_index.BitmapIndex.from_tracks(tracks))
+    columns = hot("columns", track_columns.open_columns) \
+        if track_columns and planner is None else None
+    index = hot("text", lambda: text_index.open_index(tracks)) if text_query else None
+    return columns, index, planner, bitmaps
+
+
+# Fields of a track entry (see reference_track.build_entry), plus the ranking score
+TRACK_FIELDS = ("title", "youtube_id", "game", "category", "aliases", "key", "mode",
+                "key_confidence", "bpm", "bpm_feel", "energy", "brightness", "density",
+                "rhythm", "duration", "tags", "audial_prompt", "notes")
+PROJECT_FIELDS = TRACK_FIELDS + ("score",)
+
+
+def parse_fields(value: str | list[str]) -> list[str]:
+    """--fields "title,game,bpm" (or a list) -> field names; unknown names are an error."""
+    names = value.split(",") if isinstance(value, str) else value
+    fields = [f.strip() for f in names if f.strip()]
+    unknown = [f for f in fields if f not in PROJECT_FIELDS]
+    if unknown:
+        raise ValueError(f"unknown field(s): {', '.join(unknown)} "
+                         f"(known: {', '.join(PROJECT_FIELDS)})")
+    return fields
+
+
+def project(track: dict, fields: list[str] | None, score: float | None = None) -> dict:
+    """The track restricted to --fields (all fields when None). "score" is the
+    ranking score in --recommend/--similar/--concept modes."""
+    if not fields:
+        return track
+    return {f: (score if f == "score" else track.get(f)) for f in fields}
+
+
+def write_jsonl(items, fields: list[str] | None = None) -> int:
+    """Write one compact JSON line per (score, track) as it comes; returns the count."""
+    n = 0
+    for score, track in items:
+        sys.stdout.write(json.dumps(project(track, fields, score), ensure_ascii=False) + "\n")
+        n += 1
+    sys.stdout.flush()
+    return n
+
+
+def search(tracks: list[dict], text_query=None, mood_filter=None, key_filter=None,
+           bpm_range=None, energy_range=None, brightness_range=None, density_range=None,
+           category_filter=None, game_filter=None, sort_by=None, limit=None,
+           show_facets=False, use_sql=False) -> tuple[list[dict], dict | None, bool]:
+    """Filtered, sorted, limited tracks with every available index.
+
+    Returns (results, facets or None, whether the fuzzy fallback was used).
+    """
+    facets = None
+    if use_sql:
+        results = track_db.search(
+            hot("sqlite", track_db.connect), text=text_query, mood=mood_filter, key=key_filter,
+            bpm=bpm_range, energy=energy_range, brightness=brightness_range,
+            density=density_range, category=category_filter, game=game_filter,
+            sort=sort_by, limit=limit,
+        )
+    else:
+        columns, index, planner, bitmaps = filter_indexes(tracks, text_query, show_facets)
+        rows = filter_rows(tracks, text_query, mood_filter, key_filter, bpm_range,
+                           energy_range, brightness_range, density_range,
+                           category_filter, game_filter, columns, index, planner, bitmaps)
+        if show_facets:
+            # Counted over every match, before --limit
+            facets = bitmaps.facets(bitmap_index.rows_to_bits(rows))
+        results = [tracks[i] for i in rows]
+        if sort_by:
+            sort_tracks(results, sort_by)
+        if limit:
+            results = results[:limit]
+
+    # No exact text match: retry the text as a typo-tolerant title/game/alias
+    # search and apply the other filters to those tracks only
+    fuzzy_used = False
+    if not results and text_query:
+        if not tracks:
+            tracks = hot("tracks", load_db)
+        fuzzy = hot("fuzzy", lambda: fuzzy_index.open_index(tracks)
+                    or fuzzy_index.FuzzyIndex.from_tracks(tracks))
+        ranked = [row for _, row in fuzzy.search(text_query, limit=None)]
+        candidates = [tracks[row] for row in ranked]
+        rows = [ranked[i] for i in filter_rows(candidates, None, mood_filter, key_filter,
+                                               bpm_range, energy_range, brightness_range,
+                                               density_range, category_filter, game_filter)]
+        if show_facets:
+            facets = bitmaps.facets(bitmap_index.rows_to_bits(rows))
+        results = [tracks[i] for i in rows]
+        if sort_by:
+            sort_tracks(results, sort_by)
+        if limit:
+            results = results[:limit]
+        fuzzy_used = bool(results)
+
+    return results, facets, fuzzy_used
+
+
+BATCH_FIELDS = ("id", "text", "mood", "key", "bpm", "energy", "brightness", "density",
+                "category", "game", "similar", "vector", "audio", "recommend", "concept",
+                "sort", "limit", "facets", "fields")
+BATCH_TEXT_FIELDS = ("text", "mood", "key", "category", "game", "vector", "audio",
+                     "recommend", "concept", "sort")
+
+
+def batch_range(value) -> tuple[float, float]:
+    """A --batch range: "lo:hi" like the CLI, [lo, hi] (null = open) or one number."""
+    if isinstance(value, str):
+        return parse_range(value)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value), float(value)
+    if isinstance(value, list) and len(value) == 2:
+        lo, hi = value
+        return (-math.inf if lo is None else float(lo)), (math.inf if hi is None else float(hi))
+    raise ValueError(f"bad range: {value!r}")
+
+
+def run_batch_query(query: dict) -> dict:
+    """Evaluate one --batch query object against the (hot) library."""
+    unknown = sorted(set(query) - set(BATCH_FIELDS))
+    if unknown:
+        raise ValueError(f"unknown field(s): {', '.join(unknown)}")
+    for name in BATCH_TEXT_FIELDS:
+        if query.get(name) is not None and not isinstance(query[name], str):
+            raise ValueError(f"{name} must be a string: {query[name]!r}")
+    for name in ("similar", "fields"):
+        value = query.get(name)
+        if value is not None and not isinstance(value, str) and not (
+                isinstance(value, list) and all(isinstance(v, str) for v in value)):
+            raise ValueError(f"{name} must be a string or a list of strings: {value!r}")
+    limit = query.get("limit")
+    if limit is not None and (not isinstance(limit, int) or isinstance(limit, bool)):
+        raise ValueError(f"bad limit: {limit!r}")
+    similar = query.get("similar") or []
+    if isinstance(similar, str):
+        similar = [similar]
+
+    scored = None
+    facets = None
+    fuzzy_used = False
+    # Plain filter queries use the SQLite mirror when it exists, as single queries do
+    ranked = any(query.get(name) for name in ("recommend", "concept", "vector", "audio"))
+    use_sql = track_db.enabled() and not (ranked or similar or query.get("facets"))
+    tracks = [] if use_sql else hot("tracks", load_db)
+    if query.get("recommend"):
+        mode = "recommend"
+        scored = recommend_query(tracks, query["recommend"], limit=limit or 3)
+    elif query.get("concept"):
+        mode = "concept"
+        scored = concept_query(tracks, query["concept"], limit=limit or 10)
+    elif similar or query.get("vector") or query.get("audio"):
+        mode = "similar"
+        seeds = [find_seed(tracks, name)[0] for name in similar]
+        _, scored = similar_query(tracks, seeds, query.get("vector"), query.get("audio"),
+                                  limit or 10)
+    else:
+        mode = "search"
+        ranges = {name: batch_range(query[name]) if query.get(name) is not None else None
+                  for name in ("bpm", "energy", "brightness", "density")}
+        results, facets, fuzzy_used = search(
+            tracks, query.get("text"), query.get("mood"), query.get("key"), ranges["bpm"],
+            ranges["energy"], ranges["brightness"], ranges["density"], query.get("category"),
+            query.get("game"), query.get("sort"), limit, bool(query.get("facets")), use_sql)
+
+    fields = parse_fields(query["fields"]) if query.get("fields") is not None else None
+    out = {"id": query.get("id"), "mode": mode}
+    if scored is not None:
+        results = [project(t, fields, round(score, 4)) for score, t in scored]
+        out["scores"] = [round(score, 4) for score, _ in scored]
+    else:
+        results = [project(t, fields) for t in results]
+    out["count"] = len(results)
+    out["results"] = results
+    if facets is not None:
+        out["facets"] = facets
+    if fuzzy_used:
+        out["fuzzy"] = True
+    return out
+
+
+def batch_line(item: tuple[int, str]) -> str:
+    """One JSONL input line -> one JSONL output line (errors included, never raised)."""
+    line_no, line = item
+    query_id = line_no
+    try:
+        query = json.loads(line)
+        if not isinstance(query, dict):
+            raise ValueError("query must be a JSON object")
+        query_id = query.setdefault("id", line_no)
+        out = run_batch_query(query)
+    except ValueError as e:
+        out = {"id": query_id, "error": str(e)}
+    except Exception as e:
+        # Whatever else one query hits, the rest of the batch still runs
+        out = {"id": query_id, "error": f"{type(e).__name__}: {e}"}
+    return json.dumps(out, ensure_ascii=False)
+
+
+_forked_connections = []
+
+
+def _batch_worker_init():
+    # Forked workers inherit the parent's loaded library; others load it once here
+    refresh_hot()
+    # A SQLite connection must not be used across fork: the worker opens its own.
+    # The inherited one is kept, unused, so it is not closed from here either.
+    if "sqlite" in _hot:
+        _forked_connections.append(_hot.pop("sqlite"))
+
+
+def cmd_batch(source: str, workers: int = 1):
+    """--batch: one JSON query object per input line, one JSON result per output line.
+
+    The library and its indexes load once. With workers > 1 the queries run
+    in that many processes; results still come out in input order.
+    """
+    f = sys.stdin if source == "-" else open(source, "r", encoding="utf-8")
+    try:
+        lines = [(n, line) for n, line in enumerate(f, 1) if line.strip()]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    hot("tracks", load_db)
+    if workers > 1 and len(lines) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(workers, initializer=_batch_worker_init) as pool:
+            chunk = max(1, len(lines) // (workers * 4))
+            for out in pool.map(batch_line, lines, chunksize=chunk):
+                print(out, flush=True)
+    else:
+        for item in lines:
+            print(batch_line(item), flush=True)
+
+
+def main(argv: list[str] | None = None):
+    args = sys.argv[1:] if argv is None else argv
 
     # Parse arguments
     text_query = None
@@ -394,10 +948,18 @@ def main():
     density_range = None
     category_filter = None
     game_filter = None
-    similar_to = None
+    similar_to = []
+    like_vector = None
+    like_audio = None
     recommend_desc = None
+    concept_text = None
     sort_by = None
     output_json = False
+    output_jsonl = False
+    fields = None
+    show_facets = False
+    batch_source = None
+    workers = 1
     verbose = True
     limit = None
 
@@ -422,13 +984,37 @@ def main():
         elif arg == "--game" and i + 1 < len(args):
             game_filter = args[i + 1]; i += 2
         elif arg == "--similar" and i + 1 < len(args):
-            similar_to = args[i + 1]; i += 2
+            similar_to.append(args[i + 1]); i += 2
+        elif arg == "--vector" and i + 1 < len(args):
+            like_vector = args[i + 1]; i += 2
+        elif arg == "--audio" and i + 1 < len(args):
+            like_audio = args[i + 1]; i += 2
         elif arg == "--recommend" and i + 1 < len(args):
             recommend_desc = args[i + 1]; i += 2
+        elif arg == "--concept" and i + 1 < len(args):
+            concept_text = args[i + 1]; i += 2
         elif arg == "--sort" and i + 1 < len(args):
             sort_by = args[i + 1]; i += 2
+        elif arg == "--batch":
+            if i + 1 < len(args) and (args[i + 1] == "-" or not args[i + 1].startswith("--")):
+                batch_source = args[i + 1]; i += 2
+            else:
+                batch_source = "-"; i += 1
+        elif arg == "--workers" and i + 1 < len(args):
+            workers = int(args[i + 1]) if args[i + 1].isdigit() else 0
+            if workers < 1:
+                print(f"  --workers needs a positive integer, got {args[i + 1]!r}")
+                print("  Usage: python tools/search_tracks.py --batch [file|-] [--workers N]")
+                sys.exit(1)
+            i += 2
+        elif arg == "--facets":
+            show_facets = True; i += 1
         elif arg == "--json":
             output_json = True; i += 1
+        elif arg == "--jsonl":
+            output_jsonl = True; i += 1
+        elif arg == "--fields" and i + 1 < len(args):
+            fields = args[i + 1]; i += 2
         elif arg == "--compact":
             verbose = False; i += 1
         elif arg == "--limit" and i + 1 < len(args):
@@ -442,92 +1028,116 @@ def main():
             print(f"  Unknown option: {arg}")
             sys.exit(1)
 
-    if positionals:
-        text_query = " ".join(positionals)
-
-    tracks = load_db()
+    if fields is not None:
+        if not (output_json or output_jsonl):
+            print("  --fields needs --json or --jsonl")
+            sys.exit(1)
+        try:
+            fields = parse_fields(fields)
+        except ValueError as e:
+            print(f"  {e}")
+            sys.exit(1)
 
-    # Handle --recommend mode
-    if recommend_desc:
-        cmd_recommend(recommend_desc, tracks, limit=limit or 3)
+    if batch_source:
+        refresh_hot()
+        cmd_batch(batch_source, workers)
         return
 
-    # Handle --similar mode
-    if similar_to:
-        # Find the reference track
-        ref = None
-        for t in tracks:
-            if similar_to.lower() in t.get("title", "").lower():
-                ref = t
-                break
-        if not ref:
-            print(f"  Track not found: {similar_to}")
-            sys.exit(1)
+    if positionals:
+        text_query = " ".join(positionals)
 
-        # Score all other tracks
-        scored = []
-        for t in tracks:
-            if t.get("youtube_id") == ref.get("youtube_id"):
-                continue
-            score = similarity_score(ref, t)
-            scored.append((score, t))
-        scored.sort(key=lambda x: x[0], reverse=True)
+    # With the SQLite mirror in place, plain filter queries run inside SQLite
+    similar_mode = bool(similar_to or like_vector or like_audio)
+    use_sql = track_db.enabled() and not (recommend_desc or concept_text or similar_mode
+                                          or show_facets)
+    refresh_hot()
+    tracks = [] if use_sql else hot("tracks", load_db)
+
+    try:
+        # Handle --recommend mode
+        if recommend_desc:
+            top = recommend_query(tracks, recommend_desc, limit=limit or 3)
+            if output_jsonl:
+                write_jsonl(top, fields)
+                return
+            print_recommendations(recommend_desc, top)
+            return
+
+        # Handle --concept mode
+        if concept_text:
+            top = concept_query(tracks, concept_text, limit=limit or 10)
+            if output_jsonl:
+                write_jsonl(top, fields)
+                return
+            if output_json:
+                print(json.dumps([project(t, fields, s) for s, t in top], indent=2,
+                                 ensure_ascii=False))
+                return
+            print(f"\n  Concept search: {concept_text}")
+            print(f"  {'='*50}\n")
+            if not top:
+                print(f"  No track is close to these words (try words used in prompts or tags)")
+            for score, t in top:
+                print_track(t, verbose=verbose)
+            return
+
+        # Handle --similar / --vector / --audio mode
+        if similar_mode:
+            # Find the reference track(s)
+            seeds = []
+            for name in similar_to:
+                seed, fuzzy = find_seed(tracks, name)
+                if fuzzy:
+                    print(f"  No title contains \"{name}\"; using closest match: {seed.get('title')}",
+                          file=sys.stderr if output_jsonl else sys.stdout)
+                seeds.append(seed)
+            label, scored = similar_query(tracks, seeds, like_vector, like_audio, limit or 10)
+            if output_jsonl:
+                write_jsonl(scored, fields)
+                return
+            print(f"\n  Tracks similar to: {label}")
+            print(f"  {'='*50}\n")
+            for score, t in scored:
+                print_track(t, verbose=verbose)
+            return
+    except ValueError as e:
+        print(f"  {e}")
+        sys.exit(1)
 
-        print(f"\n  Tracks similar to: {ref['title']}")
-        print(f"  {'='*50}\n")
-        for score, t in scored[:limit or 10]:
-            print_track(t, verbose=verbose)
-        return
+    # Stream plain filter results straight from the row filter: each match is
+    # written as soon as it is found, and --limit stops the scan early
+    if output_jsonl and not (use_sql or sort_by or show_facets):
+        rows = iter_rows(tracks, text_query, mood_filter, key_filter, bpm_range, energy_range,
+                         brightness_range, density_range, category_filter, game_filter,
+                         *filter_indexes(tracks, text_query))
+        if write_jsonl(((None, tracks[i]) for i in itertools.islice(rows, limit or None)), fields) \
+                or not text_query:
+            return
+        # Nothing matched the text exactly: fall through to the fuzzy fallback
 
     # Apply filters
-    results = tracks
-    if text_query:
-        results = [t for t in results if matches_text(t, text_query)]
-    if mood_filter:
-        results = [t for t in results if matches_mood(t, mood_filter)]
-    if key_filter:
-        results = [t for t in results if matches_key(t, key_filter)]
-    if bpm_range:
-        lo, hi = bpm_range
-        results = [t for t in results if in_range(t.get("bpm_feel") or t.get("bpm"), lo, hi)]
-    if energy_range:
-        lo, hi = energy_range
-        results = [t for t in results if in_range(t.get("energy"), lo, hi)]
-    if brightness_range:
-        lo, hi = brightness_range
-        results = [t for t in results if in_range(t.get("brightness"), lo, hi)]
-    if density_range:
-        lo, hi = density_range
-        results = [t for t in results if in_range(t.get("density"), lo, hi)]
-    if category_filter:
-        cf = category_filter.lower()
-        results = [t for t in results if cf in t.get("category", "").lower()]
-    if game_filter:
-        gf = game_filter.lower()
-        results = [t for t in results if gf in t.get("game", "").lower()]
-
-    # Sort
-    if sort_by:
-        key_map = {
-            "energy": lambda t: t.get("energy") or 0,
-            "brightness": lambda t: t.get("brightness") or 0,
-            "density": lambda t: t.get("density") or 0,
-            "bpm": lambda t: t.get("bpm_feel") or t.get("bpm") or 0,
-            "title": lambda t: t.get("title", "").lower(),
-            "game": lambda t: t.get("game", "").lower(),
-            "key": lambda t: t.get("key", ""),
-        }
-        sort_fn = key_map.get(sort_by)
-        if sort_fn:
-            reverse = sort_by not in ("title", "game", "key")
-            results.sort(key=sort_fn, reverse=reverse)
-
-    if limit:
-        results = results[:limit]
+    results, facets, fuzzy_used = search(
+        tracks, text_query, mood_filter, key_filter, bpm_range, energy_range,
+        brightness_range, density_range, category_filter, game_filter, sort_by, limit,
+        show_facets, use_sql)
 
     # Output
+    # Facets and the fuzzy-fallback marker follow the tracks, so approximate
+    # matches never pass for exact ones
+    extra = {}
+    if facets is not None:
+        extra["facets"] = facets
+    if fuzzy_used:
+        extra["fuzzy"] = True
+    if output_jsonl:
+        write_jsonl(((None, t) for t in results), fields)
+        if extra:
+            print(json.dumps(extra, ensure_ascii=False))
+        return
     if output_json:
-        print(json.dumps(results, indent=2, ensure_ascii=False))
+        results = [project(t, fields) for t in results]
+        out = {"tracks": results, **extra} if extra else results
+        print(json.dumps(out, indent=2, ensure_ascii=False))
         return
 
     # Print header
@@ -549,8 +1159,12 @@ def main():
 
     filter_str = ", ".join(filters_used) if filters_used else "all tracks"
     print(f"\n  Search: {filter_str}")
+    if fuzzy_used:
+        print(f"  No exact matches; closest titles/games/aliases:")
     print(f"  Found: {len(results)} tracks")
     print(f"  {'='*50}\n")
+    if facets is not None:
+        print_facets(facets)
 
     for t in results:
         print_track(t, verbose=verbose)
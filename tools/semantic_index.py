@@ -0,0 +1,250 @@
+"""
+Semantic Index
+Offline concept search over audial prompts, tags and notes (latent semantic
+analysis, no network model).
+
+Each track's prompt, tags and notes become a hashed TF-IDF vector: words are
+hashed into HASH_DIM buckets (with a hashed sign, so collisions tend to
+cancel), weighted 1 + log(tf) times a smoothed idf. A randomized truncated
+SVD of that sparse track x bucket matrix gives DIMS latent concepts; words
+that keep appearing together ("sacred", "chant", "cathedral", "byzantine")
+load on the same concepts, so a query can match tracks that never use its
+exact words.
+
+A query is hashed the same way, projected onto the concepts, and compared
+with every track by one matrix-vector product over the unit-length track
+embeddings (cosine), top k via argpartition.
+
+The index is stored as one compact NumPy file (data/tracks.semantic.npz:
+float32 embeddings, float16 concept basis, idf) and rebuilt from the library
+whenever tracks.json or its journal changes.
+
+Usage:
+    python tools/semantic_index.py build
+    python tools/semantic_index.py status
+    python tools/semantic_index.py query "cathedral"
+"""
+
+import sys
+import os
+import re
+import zlib
+
+try:
+    sys.stdout.reconfigure(encoding="utf-8")
+except AttributeError:
+    pass
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+import track_store
+
+INDEX_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "tracks.semantic.npz")
+FORMAT_VERSION = 1
+
+HASH_DIM = 1 << 13
+DIMS = 64
+OVERSAMPLE = 10
+POWER_ITERATIONS = 3
+SEED = 0
+
+TOKEN_RE = re.compile(r"[a-z][a-z']+")
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "in", "on", "at", "to", "for", "with", "by",
+    "from", "into", "over", "around", "through", "is", "it", "its", "as", "bpm",
+}
+
+
+def words(text: str) -> list[str]:
+    return [w for w in TOKEN_RE.findall(text.lower()) if w not in STOPWORDS]
+
+
+def document_words(track: dict) -> list[str]:
+    parts = [track.get("audial_prompt") or "", track.get("notes") or ""]
+    parts += [tag or "" for tag in (track.get("tags") or [])]
+    return [w for part in parts for w in words(part)]
+
+
+def _hash(word: str) -> tuple[int, float]:
+    h = zlib.crc32(word.encode("utf-8"))
+    return h % HASH_DIM, (1.0 if h & 0x80000000 else -1.0)
+
+
+def hashed_counts(word_list: list[str]) -> dict[int, float]:
+    """Signed term counts per hash bucket."""
+    counts: dict[int, float] = {}
+    for word in word_list:
+        bucket, sign = _hash(word)
+        counts[bucket] = counts.get(bucket, 0.0) + sign
+    return counts
+
+
+def _weight(counts: dict[int, float], idf: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Bucket indices and unit-length sublinear TF-IDF weights of one document."""
+    cols = np.fromiter(counts, dtype=np.int64, count=len(counts))
+    tf = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+    vals = np.sign(tf) * (1 + np.log(np.maximum(np.abs(tf), 1))) * idf[cols]
+    norm = np.linalg.norm(vals)
+    return cols, (vals / norm if norm else vals)
+
+
+class _Sparse:
+    """Minimal COO matrix: just the two products the randomized SVD needs."""
+
+    def __init__(self, rows, cols, vals, shape):
+        self.rows, self.cols, self.vals, self.shape = rows, cols, vals, shape
+
+    def dot(self, m: np.ndarray) -> np.ndarray:  # self @ m
+        return np.column_stack([np.bincount(self.rows, self.vals * m[self.cols, j],
+                                            minlength=self.shape[0]) for j in range(m.shape[1])])
+
+    def tdot(self, m: np.ndarray) -> np.ndarray:  # self.T @ m
+        return np.column_stack([np.bincount(self.cols, self.vals * m[self.rows, j],
+                                            minlength=self.shape[1]) for j in range(m.shape[1])])
+
+
+def truncated_svd(x: _Sparse, k: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Randomized truncated SVD (Halko et al.): top-k U, S, Vt of a sparse matrix."""
+    rng = np.random.default_rng(SEED)
+    q = x.dot(rng.standard_normal((x.shape[1], min(k + OVERSAMPLE, x.shape[1]))))
+    q, _ = np.linalg.qr(q)
+    for _ in range(POWER_ITERATIONS):
+        z, _ = np.linalg.qr(x.tdot(q))
+        q, _ = np.linalg.qr(x.dot(z))
+    u_small, s, vt = np.linalg.svd(x.tdot(q).T, full_matrices=False)
+    return (q @ u_small)[:, :k], s[:k], vt[:k]
+
+
+def enabled(index_file: str = INDEX_FILE) -> bool:
+    """True once an index has been built (``semantic_index.py build``)."""
+    return os.path.exists(index_file)
+
+
+class SemanticIndex:
+    def __init__(self, embeddings: np.ndarray, components: np.ndarray, idf: np.ndarray,
+                 signature: str = ""):
+        self.embeddings = embeddings  # (tracks, dims), unit rows; zero rows = no text
+        self.components = components  # (dims, HASH_DIM)
+        self.idf = idf                # (HASH_DIM,)
+        self.signature = signature
+
+    @classmethod
+    def from_tracks(cls, tracks: list[dict], signature: str = "") -> "SemanticIndex":
+        docs = [hashed_counts(document_words(t)) for t in tracks]
+        df = np.zeros(HASH_DIM)
+        for counts in docs:
+            df[list(counts)] += 1
+        idf = np.log((1 + len(docs)) / (1 + df)) + 1
+
+        rows, cols, vals = [], [], []
+        for row, counts in enumerate(docs):
+            if counts:
+                c, v = _weight(counts, idf)
+                rows.append(np.full(len(c), row))
+                cols.append(c)
+                vals.append(v)
+        dims = min(DIMS, len(docs), int((df > 0).sum()))
+        if not rows or dims == 0:
+            return cls(np.zeros((len(docs), 0), np.float32),
+                       np.zeros((0, HASH_DIM), np.float32), idf.astype(np.float32), signature)
+
+        x = _Sparse(np.concatenate(rows), np.concatenate(cols), np.concatenate(vals),
+                    (len(docs), HASH_DIM))
+        u, s, vt = truncated_svd(x, dims)
+        embeddings = u * s
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = np.divide(embeddings, norms, out=np.zeros_like(embeddings), where=norms > 0)
+        return cls(embeddings.astype(np.float32), vt.astype(np.float32),
+                   idf.astype(np.float32), signature)
+
+    def __len__(self) -> int:
+        return len(self.embeddings)
+
+    def embed(self, text: str) -> np.ndarray:
+        """Unit-length concept vector of a query (zeros when no word is known)."""
+        counts = hashed_counts(words(text))
+        vec = np.zeros(self.components.shape[0], dtype=np.float32)
+        if counts:
+            cols, vals = _weight(counts, self.idf.astype(np.float64))
+            vec = self.components[:, cols] @ vals.astype(np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def scores(self, text: str) -> np.ndarray:
+        """Cosine similarity of every track to the query."""
+        return self.embeddings @ self.embed(text)
+
+    def top_k(self, text: str, k: int = 10, min_score: float = 0.0) -> list[tuple[float, int]]:
+        """(cosine, row) of the k closest tracks, best first; ties keep library order."""
+        scores = self.scores(text)
+        candidates = np.flatnonzero(scores > min_score)
+        if k < len(candidates):
+            part = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            candidates = candidates[scores[candidates] >= scores[part].min()]
+        order = candidates[np.lexsort((candidates, -scores[candidates]))][:k]
+        return [(float(scores[i]), int(i)) for i in order]
+
+    def save(self, index_file: str = INDEX_FILE):
+        track_store.replace_atomic(index_file, lambda f: np.savez(
+            f, version=FORMAT_VERSION, signature=self.signature,
+            embeddings=self.embeddings, idf=self.idf,
+            # Half precision halves the file; queries only need ~3 digits
+            components=self.components.astype(np.float16)), binary=True)
+
+    @classmethod
+    def load(cls, index_file: str = INDEX_FILE) -> "SemanticIndex | None":
+        try:
+            with np.load(index_file, allow_pickle=False) as data:
+                if int(data["version"]) != FORMAT_VERSION or data["idf"].shape != (HASH_DIM,):
+                    return None
+                return cls(data["embeddings"], data["components"].astype(np.float32), data["idf"],
+                           str(data["signature"]))
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+def open_index(tracks: list[dict], index_file: str = INDEX_FILE,
+               json_path: str = track_store.DB_PATH) -> SemanticIndex | None:
+    """The saved index, rebuilt from ``tracks`` (the current library) if stale.
+
+    Returns None when no index has been built (the feature is off).
+    """
+    return track_store.open_index(
+        index_file, SemanticIndex.load,
+        lambda _, signature: SemanticIndex.from_tracks(tracks, signature),
+        SemanticIndex.save, tracks, json_path)
+
+
+def build(index_file: str = INDEX_FILE, json_path: str = track_store.DB_PATH) -> SemanticIndex:
+    signature = track_store.library_signature(json_path)
+    index = SemanticIndex.from_tracks(track_store.load_tracks(json_path), signature)
+    index.save(index_file)
+    return index
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("build", "status", "query"):
+        print(__doc__.strip())
+        sys.exit(1)
+
+    cmd = sys.argv[1]
+    if cmd == "build":
+        index = build()
+        size = os.path.getsize(INDEX_FILE)
+        print(f"  {os.path.normpath(INDEX_FILE)}: {len(index)} tracks, "
+              f"{index.embeddings.shape[1]} concepts, {size / 1024:.1f} KB")
+    elif cmd == "status":
+        track_store.print_index_status("Semantic index", INDEX_FILE, SemanticIndex.load)
+    else:
+        if len(sys.argv) < 3:
+            print("Usage: python tools/semantic_index.py query <text>")
+            sys.exit(1)
+        tracks = track_store.load_tracks()
+        index = open_index(tracks) or SemanticIndex.from_tracks(tracks)
+        for score, row in index.top_k(sys.argv[2], k=10):
+            print(f"  {score:.2f}  {tracks[row].get('title', 'Unknown')}")
+
+
+if __name__ == "__main__":
+    main()
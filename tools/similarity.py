@@ -0,0 +1,128 @@
+"""
+Track Similarity Engine
+Vectorized top-k version of search_tracks.similarity_score().
+
+The library is turned once into a normalized feature matrix (energy,
+brightness, density, tempo rescaled from 40-200 BPM to 0-1) with NaN for
+missing values. Scoring every track against a reference is then a handful of
+NumPy column operations, and the top k come from argpartition instead of
+sorting the whole library.
+
+Scores are exactly similarity_score()'s:
+
+    sum over features present in both tracks of  weight * (1 - |a - b|)
+    + MODE_BONUS if the modes are equal
+
+A feature missing on either side adds nothing (brightness is null for about a
+third of the library). Tempo is bpm_feel, falling back to bpm.
+"""
+
+import numpy as np
+
+FEATURES = ("energy", "brightness", "density", "bpm_feel")
+WEIGHTS = np.array([2.0, 2.0, 1.5, 1.0])
+MODE_BONUS = 1.0
+BPM_MIN, BPM_SPAN = 40.0, 160.0
+
+
+def _number(value) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return np.nan
+    return float(value)
+
+
+def track_vector(track: dict) -> np.ndarray:
+    """Normalized feature vector of one track (NaN = missing)."""
+    bpm = track.get("bpm_feel") or track.get("bpm")
+    return np.array([
+        _number(track.get("energy")),
+        _number(track.get("brightness")),
+        _number(track.get("density")),
+        (_number(bpm) - BPM_MIN) / BPM_SPAN,
+    ])
+
+
+def score_rows(matrix: np.ndarray, modes: np.ndarray, vector: np.ndarray,
+               mode: str | None = None) -> np.ndarray:
+    """similarity_score() of each row of matrix against a feature vector (and mode)."""
+    total = np.zeros(len(matrix))
+    # Accumulate feature by feature, in similarity_score()'s order, so the
+    # floating-point sums (and therefore tie order) match it exactly
+    for j, w in enumerate(WEIGHTS):
+        if np.isnan(vector[j]):
+            continue
+        with np.errstate(invalid="ignore"):
+            term = w * (1 - np.abs(matrix[:, j] - vector[j]))
+        total += np.where(np.isnan(term), 0.0, term)
+    if mode is not None:
+        total += np.where(modes == (mode or ""), MODE_BONUS, 0.0)
+    return total
+
+
+def rank(scores: np.ndarray, candidates: np.ndarray, k: int) -> list[tuple[float, int]]:
+    """(score, row) of the k best candidates, best first; ties keep row order."""
+    if k <= 0 or not len(candidates):
+        return []
+    if k < len(candidates):
+        part = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        # Everything tied with the k-th score stays in, so ties resolve by row
+        kth = scores[part].min()
+        candidates = candidates[scores[candidates] >= kth]
+    order = candidates[np.lexsort((candidates, -scores[candidates]))][:k]
+    return [(float(scores[i]), int(i)) for i in order]
+
+
+def seed_query(tracks: list[dict]) -> tuple[np.ndarray, str]:
+    """Query vector and mode for one or more seed tracks: the centroid of their
+    features (ignoring missing values) and their most common mode."""
+    vectors = np.array([track_vector(t) for t in tracks])
+    with np.errstate(invalid="ignore"):
+        present = ~np.isnan(vectors)
+        counts = present.sum(axis=0)
+        centroid = np.where(present, vectors, 0.0).sum(axis=0) / np.where(counts, counts, 1)
+    centroid[counts == 0] = np.nan
+    modes = [t.get("mode") or "" for t in tracks]
+    return centroid, max(modes, key=modes.count)
+
+
+class SimilarityEngine:
+    """Feature matrix + mode labels for a track list, in library order."""
+
+    def __init__(self, matrix: np.ndarray, modes: np.ndarray):
+        self.matrix = matrix
+        self.modes = modes
+
+    @classmethod
+    def from_tracks(cls, tracks: list[dict]) -> "SimilarityEngine":
+        matrix = np.array([track_vector(t) for t in tracks]).reshape(len(tracks), len(FEATURES))
+        modes = np.array([t.get("mode") or "" for t in tracks], dtype=str)
+        return cls(matrix, modes)
+
+    @classmethod
+    def from_columns(cls, columns) -> "SimilarityEngine":
+        """Build from a track_columns snapshot without touching the JSON."""
+        bpm = columns.column("bpm_eff")
+        matrix = np.column_stack([
+            columns.column("energy"), columns.column("brightness"), columns.column("density"),
+            (bpm - BPM_MIN) / BPM_SPAN,
+        ])
+        modes = np.asarray(columns.vocabularies["mode"], dtype=str)[columns.codes("mode")]
+        return cls(matrix, modes)
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    def scores(self, vector: np.ndarray, mode: str | None = None) -> np.ndarray:
+        """similarity_score() of every track against a feature vector (and mode)."""
+        return score_rows(self.matrix, self.modes, vector, mode)
+
+    def top_k(self, vector: np.ndarray, mode: str | None = None, k: int = 10,
+              exclude=None) -> list[tuple[float, int]]:
+        """(score, row) of the k best tracks, best first; ties keep library order."""
+        scores = self.scores(vector, mode)
+        candidates = np.arange(len(scores))
+        if exclude is not None and len(exclude):
+            keep = np.ones(len(scores), dtype=bool)
+            keep[np.asarray(exclude, dtype=np.int64)] = False
+            candidates = candidates[keep]
+        return rank(scores, candidates, k)
@@ -0,0 +1,288 @@
+"""
+Similarity Index
+Persisted KD-tree over the track feature space (data/tracks.kdtree.npz).
+
+The tree partitions the normalized feature matrix from similarity.py into
+small leaves, each node keeping the bounding box of its tracks per feature
+(and whether any of them lack that feature). A query computes an upper bound
+on similarity_score() for every node, then visits nodes best-bound first,
+stopping once no remaining node can beat the current k-th result. Only the
+leaves that can still matter are scored, and results are identical to the
+brute-force engine, ties included.
+
+Queries can be a seed track, the centroid of several seeds, a raw feature
+vector, or an audio file (analyzed with analyze_mood first).
+
+The index follows the library incrementally: tracks added by save_to_db (or
+whose features changed) go to a small pending set that is scanned directly;
+the tree itself is only rebuilt once the pending set grows past a tenth of
+the library.
+
+Usage:
+    python tools/similarity_index.py build
+    python tools/similarity_index.py status
+"""
+
+import sys
+import os
+import heapq
+
+try:
+    sys.stdout.reconfigure(encoding="utf-8")
+except AttributeError:
+    pass
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+import track_store
+import track_columns
+from similarity import SimilarityEngine, WEIGHTS, MODE_BONUS, score_rows, rank
+
+INDEX_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "tracks.kdtree.npz")
+FORMAT_VERSION = 1
+LEAF_SIZE = 32
+REBUILD_FRACTION = 0.1
+REBUILD_MIN = 256
+BOUND_EPSILON = 1e-9  # keeps bounds >= exact scores despite float summation order
+
+
+def enabled(index_file: str = INDEX_FILE) -> bool:
+    """True once an index has been built (``similarity_index.py build``)."""
+    return os.path.exists(index_file)
+
+
+def _library_engine(json_path: str, tracks: list[dict] | None = None) -> SimilarityEngine:
+    """Feature matrix of the current library (columnar snapshot if there is one)."""
+    if tracks is None:
+        columns = track_columns.open_columns(json_path=json_path)
+        if columns is not None:
+            return SimilarityEngine.from_columns(columns)
+        tracks = track_store.load_tracks(json_path)
+    return SimilarityEngine.from_tracks(tracks)
+
+
+class KDTree:
+    def __init__(self, matrix: np.ndarray, modes: np.ndarray):
+        self.matrix = np.array(matrix, dtype=np.float64)
+        self.modes = np.asarray(modes, dtype=str)
+        self.in_tree = np.zeros(len(self.matrix), dtype=bool)
+        self.signature = ""
+        self._build()
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    def _build(self):
+        """Median-split the rows on the widest feature until leaves hold <= LEAF_SIZE."""
+        n, d = self.matrix.shape
+        perm = np.arange(n)
+        lo, hi, missing, start, end, left, right = [], [], [], [], [], [], []
+
+        def new_node(s, e):
+            pts = self.matrix[perm[s:e]]
+            nan = np.isnan(pts)
+            lo.append(np.where(nan, np.inf, pts).min(axis=0) if len(pts) else np.full(d, np.inf))
+            hi.append(np.where(nan, -np.inf, pts).max(axis=0) if len(pts) else np.full(d, -np.inf))
+            missing.append(nan.any(axis=0))
+            start.append(s)
+            end.append(e)
+            left.append(-1)
+            right.append(-1)
+            return len(start) - 1
+
+        stack = [new_node(0, n)]
+        while stack:
+            node = stack.pop()
+            s, e = start[node], end[node]
+            if e - s <= LEAF_SIZE:
+                continue
+            spread = np.where(np.isfinite(hi[node] - lo[node]), hi[node] - lo[node], -1.0)
+            dim = int(np.argmax(spread))
+            if spread[dim] <= 0:
+                continue  # identical points: keep as one leaf
+            rows = perm[s:e]
+            perm[s:e] = rows[np.argsort(self.matrix[rows, dim], kind="stable")]  # NaN sorts last
+            mid = s + (e - s) // 2
+            left[node] = new_node(s, mid)
+            right[node] = new_node(mid, e)
+            stack.extend((left[node], right[node]))
+
+        self.perm = perm
+        self.node_lo = np.array(lo).reshape(-1, d)
+        self.node_hi = np.array(hi).reshape(-1, d)
+        self.node_missing = np.array(missing).reshape(-1, d)
+        self.node_start = np.array(start)
+        self.node_end = np.array(end)
+        self.node_left = np.array(left)
+        self.node_right = np.array(right)
+        self.in_tree[:] = True
+
+    @property
+    def pending(self) -> np.ndarray:
+        """Rows not (or no longer) represented in the tree; scanned directly."""
+        return np.flatnonzero(~self.in_tree)
+
+    def update(self, matrix: np.ndarray, modes: np.ndarray) -> int:
+        """Sync with the library's current feature matrix. Returns rows changed."""
+        matrix = np.asarray(matrix, dtype=np.float64)
+        modes = np.asarray(modes, dtype=str)
+        n_old = len(self.matrix)
+        if len(matrix) < n_old:
+            self.__init__(matrix, modes)  # tracks removed: rebuild
+            return len(matrix)
+        same = (self.matrix == matrix[:n_old]) | (np.isnan(self.matrix) & np.isnan(matrix[:n_old]))
+        changed = np.flatnonzero(~same.all(axis=1) | (self.modes != modes[:n_old]))
+        self.in_tree[changed] = False
+        self.matrix = matrix
+        self.modes = modes
+        self.in_tree = np.concatenate([self.in_tree, np.zeros(len(matrix) - n_old, dtype=bool)])
+        if len(self.pending) > max(REBUILD_MIN, REBUILD_FRACTION * len(matrix)):
+            self._build()
+        return len(changed) + len(matrix) - n_old
+
+    def _upper_bounds(self, vector: np.ndarray, mode: str | None) -> np.ndarray:
+        """Highest similarity_score() any row inside each node's box could reach."""
+        bound = np.zeros(len(self.node_start))
+        for j, w in enumerate(WEIGHTS):
+            if np.isnan(vector[j]):
+                continue
+            has_values = self.node_lo[:, j] <= self.node_hi[:, j]
+            gap = np.maximum(np.maximum(self.node_lo[:, j] - vector[j], vector[j] - self.node_hi[:, j]), 0.0)
+            term = np.where(has_values, w * (1 - gap), 0.0)
+            # Rows missing this feature score 0 for it, which may beat a negative term
+            term = np.where(self.node_missing[:, j], np.maximum(term, 0.0), term)
+            bound += term
+        if mode is not None:
+            bound += MODE_BONUS
+        return bound + BOUND_EPSILON
+
+    def top_k(self, vector: np.ndarray, mode: str | None = None, k: int = 10,
+              exclude=None) -> list[tuple[float, int]]:
+        """(score, row) of the k best rows, best first; same result as SimilarityEngine.top_k."""
+        if k <= 0 or not len(self.matrix):
+            return []
+        excluded = np.zeros(len(self.matrix), dtype=bool)
+        if exclude is not None and len(exclude):
+            excluded[np.asarray(exclude, dtype=np.int64)] = True
+
+        # Heap of the best k as (score, -row): the root is the current worst result
+        best: list[tuple[float, int]] = []
+
+        def offer(rows: np.ndarray):
+            rows = rows[~excluded[rows]]
+            if not len(rows):
+                return
+            scores = score_rows(self.matrix[rows], self.modes[rows], vector, mode)
+            for score, row in zip(scores.tolist(), rows.tolist()):
+                item = (score, -row)
+                if len(best) < k:
+                    heapq.heappush(best, item)
+                elif item > best[0]:
+                    heapq.heapreplace(best, item)
+
+        offer(self.pending)
+
+        bounds = self._upper_bounds(vector, mode)
+        frontier = [(-bounds[0], 0)]
+        while frontier:
+            neg_bound, node = heapq.heappop(frontier)
+            if len(best) == k and -neg_bound < best[0][0]:
+                break  # nothing left can reach the k-th score
+            if self.node_left[node] < 0:
+                rows = self.perm[self.node_start[node]:self.node_end[node]]
+                offer(rows[self.in_tree[rows]])
+            else:
+                for child in (self.node_left[node], self.node_right[node]):
+                    heapq.heappush(frontier, (-bounds[child], child))
+
+        scores = np.full(len(self.matrix), -np.inf)
+        rows = np.array([-r for _, r in best], dtype=np.int64)
+        scores[rows] = [s for s, _ in best]
+        return rank(scores, rows, k)
+
+    def save(self, index_file: str = INDEX_FILE):
+        track_store.replace_atomic(index_file, lambda f: np.savez(
+            f, version=FORMAT_VERSION, signature=self.signature,
+            matrix=self.matrix, modes=self.modes, in_tree=self.in_tree, perm=self.perm,
+            node_lo=self.node_lo, node_hi=self.node_hi, node_missing=self.node_missing,
+            node_start=self.node_start, node_end=self.node_end,
+            node_left=self.node_left, node_right=self.node_right,
+        ), binary=True)
+
+    @classmethod
+    def load(cls, index_file: str = INDEX_FILE) -> "KDTree | None":
+        try:
+            with np.load(index_file, allow_pickle=False) as data:
+                if int(data["version"]) != FORMAT_VERSION:
+                    return None
+                tree = cls.__new__(cls)
+                tree.signature = str(data["signature"])
+                for name in ("matrix", "modes", "in_tree", "perm", "node_lo", "node_hi",
+                             "node_missing", "node_start", "node_end", "node_left", "node_right"):
+                    setattr(tree, name, data[name])
+                return tree
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+def open_index(tracks: list[dict] | None = None, index_file: str = INDEX_FILE,
+               json_path: str = track_store.DB_PATH) -> KDTree | None:
+    """The saved tree, brought up to date with the library.
+
+    ``tracks`` (the current library, if already loaded) saves re-reading it
+    when the library changed. Returns None when no index has been built.
+    """
+    def refresh(tree, signature):
+        engine = _library_engine(json_path, tracks)
+        if tree is None:
+            tree = KDTree(engine.matrix, engine.modes)
+        else:
+            tree.update(engine.matrix, engine.modes)
+        tree.signature = signature
+        return tree
+
+    return track_store.open_index(index_file, KDTree.load, refresh, KDTree.save, tracks, json_path)
+
+
+def build(index_file: str = INDEX_FILE, json_path: str = track_store.DB_PATH) -> KDTree:
+    signature = track_store.library_signature(json_path)
+    engine = _library_engine(json_path)
+    tree = KDTree(engine.matrix, engine.modes)
+    tree.signature = signature
+    tree.save(index_file)
+    return tree
+
+
+def audio_query(filepath: str) -> tuple[np.ndarray, str]:
+    """Query vector and mode for an audio file, via analyze_mood (cached)."""
+    from analyze_mood import cached_analyze
+    from similarity import track_vector
+    features = cached_analyze(filepath)
+    track = {
+        "energy": features.get("energy"),
+        "brightness": features.get("brightness"),
+        "density": features.get("density"),
+        "bpm": features.get("tempo"),
+        "mode": features.get("mode"),
+    }
+    return track_vector(track), track["mode"] or ""
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("build", "status"):
+        print(__doc__.strip())
+        sys.exit(1)
+
+    if sys.argv[1] == "build":
+        tree = build()
+        print(f"  {os.path.normpath(INDEX_FILE)}: {len(tree)} tracks, "
+              f"{len(tree.node_start)} nodes (leaf size {LEAF_SIZE})")
+    else:
+        track_store.print_index_status(
+            "Similarity index", INDEX_FILE, KDTree.load, on_stale="updates on next use",
+            describe=lambda tree: f"{len(tree)} ({len(tree.pending)} pending)")
+
+
+if __name__ == "__main__":
+    main()
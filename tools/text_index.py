@@ -0,0 +1,223 @@
+"""
+Inverted Text Index
+Substring search over the track library without scanning every track.
+
+search_tracks matches text as "the query is a case-insensitive substring of
+the title, game, category, youtube_id, prompt, notes, an alias or a tag".
+This index keeps, per track, those strings lowercased, plus two posting maps:
+
+    grams   every 1-, 2- and 3-character substring -> tracks containing it
+    tokens  every whole word -> tracks containing it
+
+A query of up to 3 characters is a single gram lookup. Longer queries
+intersect the postings of their trigrams (rarest first) and only verify the
+few candidates left; a candidate already in the query's token postings needs
+no verification at all. Text lookups become set intersections.
+
+The index is saved to data/tracks.textindex.json. When the library changes
+only the tracks whose searchable text differs are re-indexed.
+
+Usage:
+    python tools/text_index.py build
+    python tools/text_index.py status
+    python tools/text_index.py query "final fantasy"
+"""
+
+import sys
+import os
+import re
+
+try:
+    sys.stdout.reconfigure(encoding="utf-8")
+except AttributeError:
+    pass
+
+sys.path.insert(0, os.path.dirname(__file__))
+import track_store
+
+INDEX_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "tracks.textindex.json")
+FORMAT_VERSION = 1
+GRAM_SIZE = 3
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def searchable_text(track: dict) -> list[str]:
+    """The lowercased strings search_tracks.matches_text() looks in."""
+    fields = [
+        track.get("title") or "",
+        track.get("game") or "",
+        track.get("category") or "",
+        track.get("youtube_id") or "",
+        track.get("audial_prompt") or "",
+        track.get("notes") or "",
+    ]
+    fields += [alias or "" for alias in (track.get("aliases") or [])]
+    fields += [tag or "" for tag in (track.get("tags") or [])]
+    return [s.lower() for s in fields]
+
+
+def _grams(strings: list[str]) -> set[str]:
+    grams = set()
+    for s in strings:
+        for n in range(1, GRAM_SIZE + 1):
+            for i in range(len(s) - n + 1):
+                grams.add(s[i:i + n])
+    return grams
+
+
+def _tokens(strings: list[str]) -> set[str]:
+    return {tok for s in strings for tok in TOKEN_RE.findall(s)}
+
+
+def enabled(index_file: str = INDEX_FILE) -> bool:
+    """True once an index has been built (``text_index.py build``)."""
+    return os.path.exists(index_file)
+
+
+class TextIndex:
+    def __init__(self):
+        self.rows: list[list[str]] = []
+        self.grams: dict[str, set[int]] = {}
+        self.tokens: dict[str, set[int]] = {}
+        self.signature = ""
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _add_row(self, row: int, strings: list[str]):
+        for gram in _grams(strings):
+            self.grams.setdefault(gram, set()).add(row)
+        for tok in _tokens(strings):
+            self.tokens.setdefault(tok, set()).add(row)
+
+    def _remove_row(self, row: int):
+        strings = self.rows[row]
+        for postings, keys in ((self.grams, _grams(strings)), (self.tokens, _tokens(strings))):
+            for key in keys:
+                rows = postings.get(key)
+                if rows is not None:
+                    rows.discard(row)
+                    if not rows:
+                        del postings[key]
+
+    def update(self, tracks: list[dict]) -> int:
+        """Re-index only tracks whose searchable text changed. Returns the number re-indexed."""
+        changed = 0
+        for row in range(len(tracks), len(self.rows)):
+            self._remove_row(row)
+        del self.rows[len(tracks):]
+        for row, track in enumerate(tracks):
+            strings = searchable_text(track)
+            if row < len(self.rows):
+                if self.rows[row] == strings:
+                    continue
+                self._remove_row(row)
+                self.rows[row] = strings
+            else:
+                self.rows.append(strings)
+            self._add_row(row, strings)
+            changed += 1
+        return changed
+
+    def search(self, query: str) -> set[int]:
+        """Rows where search_tracks.matches_text(track, query) is true."""
+        q = query.lower()
+        if not q:
+            return set(range(len(self.rows)))
+        if len(q) <= GRAM_SIZE:
+            return set(self.grams.get(q, ()))
+
+        postings = []
+        for i in range(len(q) - GRAM_SIZE + 1):
+            rows = self.grams.get(q[i:i + GRAM_SIZE])
+            if not rows:
+                return set()
+            postings.append(rows)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for rows in postings[1:]:
+            candidates &= rows
+            if not candidates:
+                return candidates
+
+        sure = self.tokens.get(q, set())
+        return {row for row in candidates
+                if row in sure or any(q in s for s in self.rows[row])}
+
+    def to_json(self) -> dict:
+        return {
+            "version": FORMAT_VERSION,
+            "signature": self.signature,
+            "rows": self.rows,
+            "grams": {g: sorted(rows) for g, rows in self.grams.items()},
+            "tokens": {t: sorted(rows) for t, rows in self.tokens.items()},
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "TextIndex":
+        index = cls()
+        index.signature = data.get("signature", "")
+        index.rows = data["rows"]
+        index.grams = {g: set(rows) for g, rows in data["grams"].items()}
+        index.tokens = {t: set(rows) for t, rows in data["tokens"].items()}
+        return index
+
+
+def load(index_file: str = INDEX_FILE) -> TextIndex | None:
+    data = track_store.load_index_json(index_file, FORMAT_VERSION)
+    return TextIndex.from_json(data) if data is not None else None
+
+
+def save(index: TextIndex, index_file: str = INDEX_FILE):
+    track_store.save_index_json(index, index_file)
+
+
+def open_index(tracks: list[dict], index_file: str = INDEX_FILE,
+               json_path: str = track_store.DB_PATH) -> TextIndex | None:
+    """The saved index, brought up to date with ``tracks`` (the current library).
+
+    Returns None when no index has been built (the feature is off).
+    """
+    def refresh(index, signature):
+        index = index or TextIndex()
+        index.update(tracks)
+        index.signature = signature
+        return index
+
+    return track_store.open_index(index_file, load, refresh, save, tracks, json_path)
+
+
+def build(index_file: str = INDEX_FILE, json_path: str = track_store.DB_PATH) -> TextIndex:
+    index = TextIndex()
+    index.update(track_store.load_tracks(json_path))
+    index.signature = track_store.library_signature(json_path)
+    save(index, index_file)
+    return index
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("build", "status", "query"):
+        print(__doc__.strip())
+        sys.exit(1)
+
+    cmd = sys.argv[1]
+    if cmd == "build":
+        index = build()
+        print(f"  {os.path.normpath(INDEX_FILE)}: {len(index)} tracks, "
+              f"{len(index.grams)} grams, {len(index.tokens)} tokens")
+    elif cmd == "status":
+        track_store.print_index_status("Text index", INDEX_FILE, load,
+                                       on_stale="updates on next use")
+    else:
+        if len(sys.argv) < 3:
+            print("Usage: python tools/text_index.py query <text>")
+            sys.exit(1)
+        tracks = track_store.load_tracks()
+        index = open_index(tracks) or build()
+        for row in sorted(index.search(sys.argv[2])):
+            print(f"  {tracks[row].get('title', 'Unknown')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Columnar Track Snapshot
+Memory-mapped numeric columns of the track library (data/tracks.columns.npy).
+
+Numeric filters and similarity only need a handful of numbers per track, not
+the full JSON entries. ``build`` writes them once as a NumPy structured array
+(one row per track, in library order) that later runs open with mmap instead
+of parsing tracks.json:
+
+    energy, brightness, density, bpm, bpm_feel, rhythm   float64, NaN = null
+    null                                                  bitmask, bit i = NUMERIC_FIELDS[i] missing
+    key, mode, category                                   integer codes into the vocabularies
+
+A sidecar (data/tracks.columns.json) holds the vocabularies and the SHA-256 of
+tracks.json + journal the snapshot was built from. Opening the snapshot checks
+it against the current files (size/mtime first, hashing only when those
+changed) and rebuilds it when the library has changed.
+
+Usage:
+    python tools/track_columns.py build
+    python tools/track_columns.py status
+"""
+
+import sys
+import os
+import json
+import hashlib
+
+try:
+    sys.stdout.reconfigure(encoding="utf-8")
+except AttributeError:
+    pass
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+import track_store
+
+COLUMNS_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "tracks.columns.npy")
+FORMAT_VERSION = 1
+
+NUMERIC_FIELDS = ("energy", "brightness", "density", "bpm", "bpm_feel", "rhythm")
+CODED_FIELDS = ("key", "mode", "category")
+
+DTYPE = np.dtype(
+    [(name, "<f8") for name in NUMERIC_FIELDS]
+    + [("null", "<u1")]
+    + [("key", "<i2"), ("mode", "<i2"), ("category", "<i4")]
+)
+
+
+def meta_path(columns_file: str = COLUMNS_FILE) -> str:
+    return os.path.splitext(columns_file)[0] + ".json"
+
+
+def enabled(columns_file: str = COLUMNS_FILE) -> bool:
+    """True once a snapshot has been built (``track_columns.py build``)."""
+    return os.path.exists(columns_file)
+
+
+def library_hash(json_path: str = track_store.DB_PATH) -> str:
+    """SHA-256 over the bytes of tracks.json and its journal."""
+    h = hashlib.sha256()
+    for path in (json_path, track_store.journal_path(json_path)):
+        try:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+        except FileNotFoundError:
+            pass
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _number(value) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return np.nan
+    return float(value)
+
+
+def _encode(values: list[str]) -> tuple[np.ndarray, list[str]]:
+    vocab, codes, index = [], [], {}
+    for v in values:
+        if v not in index:
+            index[v] = len(vocab)
+            vocab.append(v)
+        codes.append(index[v])
+    return np.asarray(codes), vocab
+
+
+def build_array(tracks: list[dict]) -> tuple[np.ndarray, dict]:
+    """Structured array + vocabularies for a track list."""
+    arr = np.zeros(len(tracks), dtype=DTYPE)
+    null = np.zeros(len(tracks), dtype=np.uint8)
+    for bit, name in enumerate(NUMERIC_FIELDS):
+        col = np.array([_number(t.get(name)) for t in tracks], dtype=np.float64)
+        arr[name] = col
+        null |= np.isnan(col).astype(np.uint8) << bit
+    arr["null"] = null
+    vocabularies = {}
+    for name in CODED_FIELDS:
+        codes, vocab = _encode([t.get(name) or "" for t in tracks])
+        arr[name] = codes
+        vocabularies[name] = vocab
+    return arr, vocabularies
+
+
+def build(columns_file: str = COLUMNS_FILE, json_path: str = track_store.DB_PATH) -> "Columns":
+    """Write a fresh snapshot of the library and return it."""
+    with track_store.locked(json_path, shared=True):
+        signature = track_store.library_signature(json_path)
+        content_hash = library_hash(json_path)
+        tracks = track_store.load_data(json_path, lock=False)["tracks"]
+    arr, vocabularies = build_array(tracks)
+    meta = {
+        "version": FORMAT_VERSION,
+        "count": len(arr),
+        "content_hash": content_hash,
+        "signature": signature,
+        "vocabularies": vocabularies,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(columns_file)), exist_ok=True)
+    track_store.replace_atomic(columns_file, lambda f: np.save(f, arr, allow_pickle=False),
+                               binary=True)
+    # Ties the sidecar to this exact array file, so a reader racing a rebuild
+    # never pairs new rows with old vocabularies
+    meta["array_signature"] = _file_signature(columns_file)
+    track_store.replace_atomic(meta_path(columns_file),
+                               lambda f: json.dump(meta, f, ensure_ascii=False))
+    return Columns(arr, meta)
+
+
+def _file_signature(path: str) -> str:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return ""
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def _read_meta(columns_file: str) -> dict | None:
+    try:
+        with open(meta_path(columns_file), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_fresh(meta: dict | None, json_path: str = track_store.DB_PATH,
+             columns_file: str = COLUMNS_FILE) -> bool:
+    """Does the snapshot described by meta match the library on disk?"""
+    if not meta or meta.get("version") != FORMAT_VERSION:
+        return False
+    signature = track_store.library_signature(json_path)
+    if meta.get("signature") == signature:
+        return True
+    if meta.get("content_hash") != library_hash(json_path):
+        return False
+    # Same content, new mtime (checkout, touch): remember the new signature
+    meta["signature"] = signature
+    try:
+        track_store.replace_atomic(meta_path(columns_file),
+                                   lambda f: json.dump(meta, f, ensure_ascii=False))
+    except OSError:
+        pass
+    return True
+
+
+def open_columns(columns_file: str = COLUMNS_FILE,
+                 json_path: str = track_store.DB_PATH) -> "Columns | None":
+    """The snapshot, memory-mapped; rebuilt first if the library changed.
+
+    Returns None when no snapshot has been built (the feature is off).
+    """
+    if not enabled(columns_file):
+        return None
+    meta = _read_meta(columns_file)
+    if (meta and meta.get("array_signature") == _file_signature(columns_file)
+            and is_fresh(meta, json_path, columns_file)):
+        try:
+            arr = np.load(columns_file, mmap_mode="r", allow_pickle=False)
+            if arr.dtype == DTYPE and len(arr) == meta["count"]:
+                return Columns(arr, meta)
+        except (OSError, ValueError):
+            pass
+    return build(columns_file, json_path)
+
+
+class Columns:
+    """Column access and vectorized predicates over a snapshot."""
+
+    def __init__(self, arr: np.ndarray, meta: dict):
+        self.arr = arr
+        self.meta = meta
+        self.vocabularies = meta["vocabularies"]
+
+    def __len__(self) -> int:
+        return len(self.arr)
+
+    def column(self, name: str) -> np.ndarray:
+        """A numeric column (NaN where null). "bpm_eff" is bpm_feel, falling back to bpm."""
+        if name == "bpm_eff":
+            feel = self.arr["bpm_feel"]
+            # search_tracks reads tempo as `bpm_feel or bpm`: 0 and null fall through
+            return np.where(np.isnan(feel) | (feel == 0), self.arr["bpm"], feel)
+        return self.arr[name]
+
+    def is_null(self, name: str) -> np.ndarray:
+        return (self.arr["null"] >> NUMERIC_FIELDS.index(name)) & 1 == 1
+
+    def codes(self, name: str) -> np.ndarray:
+        return self.arr[name]
+
+    def in_range(self, name: str, lo: float, hi: float) -> np.ndarray:
+        """Boolean mask of rows with lo <= value <= hi (nulls never match)."""
+        col = self.column(name)
+        with np.errstate(invalid="ignore"):
+            return (col >= lo) & (col <= hi)
+
+    def vocab_mask(self, name: str, predicate) -> np.ndarray:
+        """Rows whose coded value satisfies predicate(value) (evaluated once per distinct value)."""
+        hits = np.array([bool(predicate(v)) for v in self.vocabularies[name]], dtype=bool)
+        if not len(hits):
+            return np.zeros(len(self), dtype=bool)
+        return hits[self.codes(name)]
+
+    def key_mask(self, key_query: str) -> np.ndarray:
+        """search_tracks --key semantics: substring of "<key> <mode>", case-insensitive."""
+        k = key_query.lower()
+        keys, modes = self.vocabularies["key"], self.vocabularies["mode"]
+        hits = np.zeros((max(len(keys), 1), max(len(modes), 1)), dtype=bool)
+        for i, key in enumerate(keys):
+            for j, mode in enumerate(modes):
+                hits[i, j] = k in f"{key} {mode}".strip().lower()
+        return hits[self.codes("key"), self.codes("mode")]
+
+    def select(self, key: str | None = None, bpm: tuple | None = None,
+               energy: tuple | None = None, brightness: tuple | None = None,
+               density: tuple | None = None, category: str | None = None) -> np.ndarray:
+        """Row indices (in library order) matching all given numeric/categorical filters."""
+        mask = np.ones(len(self), dtype=bool)
+        for name, bounds in (("bpm_eff", bpm), ("energy", energy),
+                             ("brightness", brightness), ("density", density)):
+            if bounds:
+                mask &= self.in_range(name, *bounds)
+        if key:
+            mask &= self.key_mask(key)
+        if category:
+            cf = category.lower()
+            mask &= self.vocab_mask("category", lambda c: cf in c.lower())
+        return np.flatnonzero(mask)
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("build", "status"):
+        print(__doc__.strip())
+        sys.exit(1)
+
+    if sys.argv[1] == "build":
+        cols = build()
+        size = os.path.getsize(COLUMNS_FILE)
+        print(f"  {os.path.normpath(COLUMNS_FILE)}: {len(cols)} tracks, {size / 1024:.1f} KB")
+    else:
+        if not enabled():
+            print(f"  Columnar snapshot: off (no {os.path.normpath(COLUMNS_FILE)})")
+            return
+        meta = _read_meta(COLUMNS_FILE)
+        fresh = is_fresh(meta)
+        print(f"  Columnar snapshot: {os.path.normpath(COLUMNS_FILE)}")
+        print(f"  tracks: {meta.get('count') if meta else '?'}"
+              f"{'' if fresh else ' (stale: rebuilds on next use)'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+"""
+SQLite Track Database
+Optional indexed mirror of the track library (data/tracks.sqlite).
+
+tracks.json (plus its journal, see track_store.py) stays the source of truth.
+Once the SQLite file has been created with ``import``, the other tools detect
+it and push their filters down into SQL instead of parsing and scanning the
+whole JSON library. Before each use the mirror is brought up to date: new
+journal entries are applied incrementally, and a rewritten tracks.json
+(compaction, hand edits) triggers a full re-import.
+
+Every track row keeps the full JSON entry, so exports reproduce tracks.json
+exactly. Numeric/categorical columns are indexed, and a trigram FTS5 table
+over title/aliases/tags/audial_prompt/notes answers the same case-insensitive
+substring queries search_tracks.py has always supported.
+
+Usage:
+    python tools/track_db.py import                # build/refresh data/tracks.sqlite
+    python tools/track_db.py import more.json      # merge a tracks.json-format file, then refresh
+    python tools/track_db.py export [out.json]     # write tracks.json format (default: stdout)
+    python tools/track_db.py status
+"""
+
+import sys
+import os
+import json
+import math
+import sqlite3
+
+try:
+    sys.stdout.reconfigure(encoding="utf-8")
+except AttributeError:
+    pass
+
+sys.path.insert(0, os.path.dirname(__file__))
+import track_store
+
+DB_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "tracks.sqlite")
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,          -- position in tracks.json
+    youtube_id TEXT,
+    title TEXT,
+    game TEXT,
+    category TEXT,
+    key TEXT,                        -- lowercased, like search_tracks compares them
+    mode TEXT,
+    bpm REAL,
+    bpm_feel REAL,
+    energy REAL,
+    brightness REAL,
+    density REAL,
+    rhythm REAL,
+    aliases TEXT,                    -- newline-joined, for the non-FTS fallback
+    tags TEXT,
+    audial_prompt TEXT,
+    notes TEXT,
+    doc TEXT NOT NULL                -- the full JSON entry
+);
+CREATE TABLE IF NOT EXISTS track_tags (
+    track_id INTEGER NOT NULL,
+    pos INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (track_id, pos)
+);
+CREATE INDEX IF NOT EXISTS idx_tracks_youtube_id ON tracks (youtube_id);
+CREATE INDEX IF NOT EXISTS idx_tracks_mode_key ON tracks (mode, key);
+CREATE INDEX IF NOT EXISTS idx_tracks_bpm ON tracks (COALESCE(NULLIF(bpm_feel, 0), bpm));
+CREATE INDEX IF NOT EXISTS idx_tracks_energy ON tracks (energy);
+CREATE INDEX IF NOT EXISTS idx_tracks_brightness ON tracks (brightness);
+CREATE INDEX IF NOT EXISTS idx_tracks_density ON tracks (density);
+CREATE INDEX IF NOT EXISTS idx_tracks_category ON tracks (category);
+CREATE INDEX IF NOT EXISTS idx_tracks_game ON tracks (game);
+CREATE INDEX IF NOT EXISTS idx_track_tags_tag ON track_tags (tag);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS tracks_fts USING fts5(
+    title, aliases, tags, audial_prompt, notes, tokenize = 'trigram'
+);
+"""
+
+# search_tracks reads tempo as `bpm_feel or bpm`; this matches idx_tracks_bpm
+BPM_EXPR = "COALESCE(NULLIF(bpm_feel, 0), bpm)"
+
+SORT_COLUMNS = {
+    # search_tracks --sort: (expression, descending)
+    "energy": ("COALESCE(energy, 0)", True),
+    "brightness": ("COALESCE(brightness, 0)", True),
+    "density": ("COALESCE(density, 0)", True),
+    "bpm": (f"COALESCE({BPM_EXPR}, 0)", True),
+    "title": ("pylower(title)", False),
+    "game": ("pylower(game)", False),
+    "key": ("COALESCE(key, '')", False),
+}
+
+
+def enabled(db_file: str = DB_FILE) -> bool:
+    """True once the SQLite mirror has been created (``track_db.py import``)."""
+    return os.path.exists(db_file)
+
+
+def _lower(s):
+    return s.lower() if s else ""
+
+
+def connect(db_file: str = DB_FILE, json_path: str = track_store.DB_PATH,
+            refresh: bool = True) -> sqlite3.Connection:
+    """Open the mirror (creating it if needed) and bring it up to date with the store."""
+    conn = sqlite3.connect(db_file)
+    conn.row_factory = sqlite3.Row
+    # Python's lower() so substring semantics match the JSON code paths exactly
+    conn.create_function("pylower", 1, _lower, deterministic=True)
+    conn.executescript(SCHEMA)
+    try:
+        conn.executescript(FTS_SCHEMA)
+    except sqlite3.OperationalError:
+        pass  # SQLite built without FTS5/trigram (< 3.34): fall back to instr()
+    if refresh:
+        sync(conn, json_path)
+    return conn
+
+
+def has_fts(conn: sqlite3.Connection) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'tracks_fts'").fetchone()
+    return row is not None
+
+
+def _get_meta(conn: sqlite3.Connection, name: str, default: str = "") -> str:
+    row = conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else default
+
+
+def _set_meta(conn: sqlite3.Connection, name: str, value):
+    conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, str(value)))
+
+
+def _write_row(conn: sqlite3.Connection, track_id: int, t: dict, fts: bool):
+    aliases = "\n".join(a or "" for a in (t.get("aliases") or []))
+    tags = [tag or "" for tag in (t.get("tags") or [])]
+    conn.execute(
+        "INSERT OR REPLACE INTO tracks (id, youtube_id, title, game, category, key, mode, bpm,"
+        " bpm_feel, energy, brightness, density, rhythm, aliases, tags, audial_prompt, notes, doc)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (track_id, t.get("youtube_id") or "", t.get("title") or "", t.get("game") or "",
+         t.get("category") or "", _lower(t.get("key")), _lower(t.get("mode")), t.get("bpm"),
+         t.get("bpm_feel"), t.get("energy"), t.get("brightness"), t.get("density"),
+         t.get("rhythm"), aliases, "\n".join(tags), t.get("audial_prompt") or "",
+         t.get("notes") or "", json.dumps(t, ensure_ascii=False)),
+    )
+    conn.execute("DELETE FROM track_tags WHERE track_id = ?", (track_id,))
+    conn.executemany("INSERT INTO track_tags (track_id, pos, tag) VALUES (?, ?, ?)",
+                     [(track_id, pos, tag) for pos, tag in enumerate(tags)])
+    if fts:
+        conn.execute("DELETE FROM tracks_fts WHERE rowid = ?", (track_id,))
+        conn.execute(
+            "INSERT INTO tracks_fts (rowid, title, aliases, tags, audial_prompt, notes)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (track_id, t.get("title") or "", aliases, "\n".join(tags),
+             t.get("audial_prompt") or "", t.get("notes") or ""),
+        )
+
+
+def _import_all(conn: sqlite3.Connection, json_path: str, fts: bool):
+    conn.execute("DELETE FROM tracks")
+    conn.execute("DELETE FROM track_tags")
+    if fts:
+        conn.execute("DELETE FROM tracks_fts")
+    data = track_store.read_snapshot(json_path)
+    for i, t in enumerate(data.get("tracks", [])):
+        _write_row(conn, i, t, fts)
+
+
+def _apply_journal(conn: sqlite3.Connection, entries: list[dict], fts: bool):
+    """Replay journal entries with track_store.merge_entry semantics."""
+    for entry in entries:
+        youtube_id = entry.get("youtube_id")
+        row = None
+        if youtube_id:
+            row = conn.execute("SELECT id, doc FROM tracks WHERE youtube_id = ? ORDER BY id LIMIT 1",
+                               (youtube_id,)).fetchone()
+        if row is not None:
+            existing = [json.loads(row["doc"])]
+            track_store.merge_entry(existing, entry)
+            _write_row(conn, row["id"], existing[0], fts)
+        else:
+            next_id = conn.execute("SELECT COALESCE(MAX(id) + 1, 0) FROM tracks").fetchone()[0]
+            _write_row(conn, next_id, entry, fts)
+
+
+def sync(conn: sqlite3.Connection, json_path: str = track_store.DB_PATH):
+    """Bring the mirror up to date with tracks.json + journal."""
+    fts = has_fts(conn)
+    with track_store.locked(json_path, shared=True):
+        signature = track_store.snapshot_signature(json_path)
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            offset = int(_get_meta(conn, "journal_offset", "0") or 0)
+            current = (_get_meta(conn, "schema") == str(SCHEMA_VERSION)
+                       and _get_meta(conn, "snapshot") == signature)
+            if not current:
+                _import_all(conn, json_path, fts)
+                offset = 0
+            entries, offset = track_store.read_journal(json_path, offset)
+            if entries:
+                _apply_journal(conn, entries, fts)
+            _set_meta(conn, "schema", SCHEMA_VERSION)
+            _set_meta(conn, "snapshot", signature)
+            _set_meta(conn, "journal_offset", offset)
+
+
+def _docs(rows) -> list[dict]:
+    return [json.loads(row["doc"]) for row in rows]
+
+
+def all_tracks(conn: sqlite3.Connection) -> list[dict]:
+    return _docs(conn.execute("SELECT doc FROM tracks ORDER BY id"))
+
+
+def find_by_youtube_ids(conn: sqlite3.Connection, youtube_ids) -> dict[str, dict]:
+    """youtube_id -> track for the ids present in the library (first match wins)."""
+    found = {}
+    for youtube_id in youtube_ids:
+        row = conn.execute("SELECT doc FROM tracks WHERE youtube_id = ? ORDER BY id LIMIT 1",
+                           (youtube_id,)).fetchone()
+        if row is not None:
+            found[youtube_id] = json.loads(row["doc"])
+    return found
+
+
+def _substring_clause(conn: sqlite3.Connection, query: str, fts_columns: list[str],
+                      plain_columns: list[str]) -> tuple[str, list]:
+    """SQL for "query is a case-insensitive substring of any of these columns"."""
+    q = query.lower()
+    clauses, params = [], []
+    if has_fts(conn) and len(q) >= 3:
+        phrase = '"' + q.replace('"', '""') + '"'
+        clauses.append("id IN (SELECT rowid FROM tracks_fts WHERE tracks_fts MATCH ?)")
+        params.append(f"{{{' '.join(fts_columns)}}} : {phrase}")
+    else:
+        plain_columns = fts_columns + plain_columns
+    for col in plain_columns:
+        clauses.append(f"instr(pylower({col}), ?) > 0")
+        params.append(q)
+    return "(" + " OR ".join(clauses) + ")", params
+
+
+def _range_clause(expr: str, lo: float, hi: float) -> tuple[str, list]:
+    clauses, params = [f"{expr} IS NOT NULL"], []
+    if lo > -math.inf:
+        clauses.append(f"{expr} >= ?")
+        params.append(lo)
+    if hi < math.inf:
+        clauses.append(f"{expr} <= ?")
+        params.append(hi)
+    return " AND ".join(clauses), params
+
+
+def search(conn: sqlite3.Connection, text: str | None = None, mood: str | None = None,
+           key: str | None = None, bpm: tuple | None = None, energy: tuple | None = None,
+           brightness: tuple | None = None, density: tuple | None = None,
+           category: str | None = None, game: str | None = None,
+           sort: str | None = None, limit: int | None = None) -> list[dict]:
+    """search_tracks.py's filters as one SQL query; same matching rules as the JSON path."""
+    where, params = [], []
+
+    def add(clause, clause_params=()):
+        where.append(clause)
+        params.extend(clause_params)
+
+    if text:
+        add(*_substring_clause(conn, text, ["title", "aliases", "tags", "audial_prompt", "notes"],
+                               ["game", "category", "youtube_id"]))
+    if mood:
+        add(*_substring_clause(conn, mood, ["title", "tags", "audial_prompt"], []))
+    if key:
+        # Substring of "{key} {mode}", like matches_key: "b minor" also finds Bb/Eb minor
+        add("instr(trim(key || ' ' || mode), ?) > 0", [key.lower()])
+    for expr, bounds in ((BPM_EXPR, bpm), ("energy", energy),
+                         ("brightness", brightness), ("density", density)):
+        if bounds:
+            add(*_range_clause(expr, *bounds))
+    if category:
+        add("instr(pylower(category), ?) > 0", [category.lower()])
+    if game:
+        add("instr(pylower(game), ?) > 0", [game.lower()])
+
+    sql = "SELECT doc FROM tracks"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    order = "id"
+    if sort in SORT_COLUMNS:
+        expr, desc = SORT_COLUMNS[sort]
+        order = f"{expr} {'DESC' if desc else 'ASC'}, id"
+    sql += f" ORDER BY {order}"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return _docs(conn.execute(sql, params))
+
+
+def mood_candidates(conn: sqlite3.Connection, keywords: list[str],
+                    energy: tuple | None = None, brightness: tuple | None = None,
+                    exclude_ids=()) -> list[dict]:
+    """Tracks that can score > 0 in music_project suggest: any keyword in tags or
+    prompt, or energy/brightness inside the target range."""
+    where, params = [], []
+    for kw in keywords:
+        clause, clause_params = _substring_clause(conn, kw, ["tags", "audial_prompt"], [])
+        where.append(clause)
+        params.extend(clause_params)
+    for col, bounds in (("energy", energy), ("brightness", brightness)):
+        if bounds:
+            clause, clause_params = _range_clause(col, *bounds)
+            where.append(f"({clause})")
+            params.extend(clause_params)
+    if not where:
+        return []
+    sql = "SELECT doc FROM tracks WHERE (" + " OR ".join(where) + ")"
+    exclude_ids = [i for i in exclude_ids if i]
+    if exclude_ids:
+        sql += f" AND youtube_id NOT IN ({', '.join('?' * len(exclude_ids))})"
+        params.extend(exclude_ids)
+    return _docs(conn.execute(sql + " ORDER BY id", params))
+
+
+def category_counts(conn: sqlite3.Connection) -> list[tuple[str, int]]:
+    """(category, count), most common first; blank categories count as "Other"."""
+    return [tuple(row) for row in conn.execute(
+        "SELECT CASE WHEN trim(category) = '' THEN 'Other' ELSE trim(category) END AS cat,"
+        " COUNT(*) AS n FROM tracks GROUP BY cat ORDER BY n DESC, MIN(id)")]
+
+
+def tag_counts(conn: sqlite3.Connection, min_count: int = 1) -> list[tuple[str, int]]:
+    """(tag, count) with at least min_count tracks, most common first."""
+    return [tuple(row) for row in conn.execute(
+        "SELECT tag, COUNT(*) AS n FROM track_tags GROUP BY tag HAVING n >= ?"
+        " ORDER BY n DESC, MIN(track_id * 65536 + pos)", (min_count,))]
+
+
+def export_json(conn: sqlite3.Connection, out_path: str | None = None):
+    """Write the library in tracks.json format (atomically), or to stdout."""
+    data = {"tracks": all_tracks(conn)}
+    if out_path and out_path != "-":
+        track_store.write_atomic(out_path, data)
+    else:
+        print(json.dumps(data, indent=2, ensure_ascii=False))
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("import", "export", "status"):
+        print(__doc__.strip())
+        sys.exit(1)
+
+    cmd = sys.argv[1]
+    if cmd == "import":
+        if len(sys.argv) > 2:
+            with open(sys.argv[2], "r", encoding="utf-8") as f:
+                incoming = json.load(f).get("tracks", [])
+            track_store.save_entries(incoming)
+            print(f"  merged {len(incoming)} tracks from {sys.argv[2]}")
+        conn = connect()
+        n = conn.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+        fts = "trigram FTS" if has_fts(conn) else "no FTS5 (substring scans)"
+        print(f"  {os.path.normpath(DB_FILE)}: {n} tracks, {fts}")
+    elif cmd == "export":
+        if not enabled():
+            print(f"  No SQLite database at {os.path.normpath(DB_FILE)}; run: track_db.py import")
+            sys.exit(1)
+        export_json(connect(), sys.argv[2] if len(sys.argv) > 2 else None)
+    else:
+        if not enabled():
+            print(f"  SQLite backend: off (no {os.path.normpath(DB_FILE)})")
+            return
+        conn = connect(refresh=False)
+        n = conn.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+        stale = _get_meta(conn, "snapshot") != track_store.snapshot_signature()
+        print(f"  SQLite backend: on ({os.path.normpath(DB_FILE)})")
+        print(f"  tracks: {n}{' (stale: refreshes on next use)' if stale else ''}")
+        print(f"  FTS:    {'trigram' if has_fts(conn) else 'unavailable'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""
+Track Store
+Transactional access to data/tracks.json shared by all tools.
+
+Saves append one JSON line per track to a change journal next to the
+snapshot (data/tracks.journal.jsonl) instead of rewriting tracks.json, so the
+cost of a save doesn't grow with the library. Readers see the snapshot with
+the journal replayed on top. Once the journal grows past a quarter of the
+snapshot's size it is compacted into tracks.json with an atomic
+temp-file + rename. A lock file (data/tracks.json.lock) serializes writers
+across processes; readers take it shared so they never observe a compaction
+half-way.
+
+Usage:
+    python tools/track_store.py compact     # fold the journal into tracks.json now
+    python tools/track_store.py status      # snapshot/journal sizes
+"""
+
+import sys
+import os
+import json
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+try:
+    sys.stdout.reconfigure(encoding="utf-8")
+except AttributeError:
+    pass
+
+DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "tracks.json")
+
+# Compact once the journal is bigger than this fraction of the snapshot
+# (amortized O(1) per save), but never for less than COMPACT_MIN_BYTES.
+COMPACT_RATIO = 0.25
+COMPACT_MIN_BYTES = 64 * 1024
+
+# Curated fields a re-analysis must not overwrite
+PRESERVED_FIELDS = ("game", "category", "aliases", "notes", "bpm_feel")
+
+
+def journal_path(path: str = DB_PATH) -> str:
+    return os.path.splitext(path)[0] + ".journal.jsonl"
+
+
+@contextmanager
+def locked(path: str = DB_PATH, shared: bool = False):
+    """Hold the store's inter-process lock (exclusive for writers, shared for readers)."""
+    lock_path = path + ".lock"
+    try:
+        f = open(lock_path, "a+b")
+    except OSError:
+        if shared:  # read-only checkout: nobody can be writing
+            yield
+            return
+        raise
+    with f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        else:
+            # msvcrt has no shared locks; readers just serialize with writers
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def merge_entry(tracks: list[dict], entry: dict, index: dict | None = None):
+    """Insert an entry, or update the existing one with the same youtube_id.
+
+    ``index`` maps youtube_id -> position in ``tracks``; pass one in (and it is
+    kept up to date) to avoid a linear scan per entry.
+    """
+    youtube_id = entry.get("youtube_id")
+    if youtube_id:
+        if index is None:
+            i = next((i for i, t in enumerate(tracks) if t.get("youtube_id") == youtube_id), None)
+        else:
+            i = index.get(youtube_id)
+        if i is not None:
+            # Update existing entry (preserve game/category/aliases/notes/bpm_feel)
+            existing = tracks[i]
+            for field in PRESERVED_FIELDS:
+                entry[field] = existing.get(field, entry.get(field))
+            tracks[i] = entry
+            return
+        if index is not None:
+            index[youtube_id] = len(tracks)
+    tracks.append(entry)
+
+
+def read_snapshot(path: str) -> dict:
+    if not os.path.exists(path):
+        return {"tracks": []}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_journal(path: str = DB_PATH, offset: int = 0) -> tuple[list[dict], int]:
+    """Journal entries from byte ``offset`` on, and the offset just past the last one.
+
+    Only complete lines are consumed, so a reader that remembers the returned
+    offset can pick up later appends without re-reading the journal.
+    """
+    try:
+        f = open(journal_path(path), "rb")
+    except FileNotFoundError:
+        return [], 0
+    with f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b"\n") + 1  # a torn final line from a crashed writer stays unread
+    entries = []
+    for line in data[:end].splitlines():
+        if not line.strip():
+            continue
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            continue
+    return entries, offset + end
+
+
+def _read_journal(path: str) -> list[dict]:
+    return read_journal(path)[0]
+
+
+def snapshot_signature(path: str = DB_PATH) -> str:
+    """Cheap change marker for tracks.json (size + mtime); changes on every compaction."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return ""
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def library_signature(path: str = DB_PATH) -> str:
+    """Cheap change marker for the whole library: tracks.json plus its journal.
+
+    Every derived index stores this and refreshes itself when it differs.
+    """
+    return f"{snapshot_signature(path)}|{snapshot_signature(journal_path(path))}"
+
+
+def _replay(data: dict, entries: list[dict]) -> dict:
+    tracks = data.setdefault("tracks", [])
+    index = {}
+    for i, t in enumerate(tracks):
+        if t.get("youtube_id"):
+            index.setdefault(t["youtube_id"], i)  # first match wins, like the linear scan
+    for entry in entries:
+        merge_entry(tracks, entry, index)
+    return data
+
+
+def load_data(path: str = DB_PATH, lock: bool = True) -> dict:
+    """The whole database document ({"tracks": [...]}) with the journal applied.
+
+    Pass lock=False when the caller already holds the store lock.
+    """
+    if not lock:
+        return _replay(read_snapshot(path), _read_journal(path))
+    with locked(path, shared=True):
+        return _replay(read_snapshot(path), _read_journal(path))
+
+
+def load_tracks(path: str = DB_PATH) -> list[dict]:
+    """All tracks, journal included. Empty if there is no database yet."""
+    return load_data(path)["tracks"]
+
+
+def exists(path: str = DB_PATH) -> bool:
+    return os.path.exists(path) or os.path.exists(journal_path(path))
+
+
+def inherit_mode(tmp_path: str, path: str):
+    """Give a temp file about to replace path the permissions path has.
+
+    mkstemp creates files 0600 and os.replace keeps that, which would leave
+    the library owner-only after its first save. A new file gets the usual
+    0666 minus the umask.
+    """
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+    os.chmod(tmp_path, mode)
+
+
+def replace_atomic(path: str, write, binary: bool = False, fsync: bool = False):
+    """Call write(f) on a temp file in path's directory, then rename it over path.
+
+    Readers see the old file or the new one, never a partial write.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    name = os.path.splitext(os.path.basename(path))[0]
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}-", suffix=".tmp")
+    try:
+        with (os.fdopen(fd, "wb") if binary else os.fdopen(fd, "w", encoding="utf-8")) as f:
+            write(f)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        inherit_mode(tmp_path, path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_atomic(path: str, data: dict):
+    """Write JSON to a temp file in the same directory, fsync, then rename over path."""
+    replace_atomic(path, lambda f: json.dump(data, f, indent=2, ensure_ascii=False), fsync=True)
+
+
+# --- Derived indexes ---
+#
+# The optional accelerator files (text_index.py, filter_index.py, ...) share
+# one lifecycle: built on request, stamped with library_signature(), and
+# refreshed from the library on first use after it changes.
+
+def save_index_json(index, index_file: str):
+    """Save an index's to_json() compactly and atomically."""
+    replace_atomic(index_file, lambda f: json.dump(index.to_json(), f, ensure_ascii=False,
+                                                   separators=(",", ":")))
+
+
+def load_index_json(index_file: str, version: int) -> dict | None:
+    """A saved index document, or None if missing, unreadable or another format version."""
+    try:
+        with open(index_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != version:
+        return None
+    return data
+
+
+def open_index(index_file: str, load, refresh, save, tracks: list[dict] | None = None,
+               json_path: str = DB_PATH):
+    """The index saved at index_file, refreshed first if the library changed.
+
+    ``load(index_file)`` returns the saved index or None. It is stale when its
+    ``signature`` differs from the library's, or when ``tracks`` (the current
+    library, if the caller has it loaded) has another length. Then
+    ``refresh(old index or None, signature)`` returns an up-to-date one, which
+    is saved with ``save(index, index_file)``. A read-only checkout keeps the
+    refreshed index in memory. Returns None when no index has been built (the
+    feature is off).
+    """
+    if not os.path.exists(index_file):
+        return None
+    signature = library_signature(json_path)
+    index = load(index_file)
+    if index is not None and index.signature == signature and \
+            (tracks is None or len(index) == len(tracks)):
+        return index
+    index = refresh(index, signature)
+    try:
+        save(index, index_file)
+    except OSError:
+        pass  # read-only checkout: use the in-memory index
+    return index
+
+
+def print_index_status(name: str, index_file: str, load, json_path: str = DB_PATH,
+                       describe=len, on_stale: str = "rebuilds on next use"):
+    """The ``status`` command of an index tool."""
+    path = os.path.normpath(index_file)
+    if not os.path.exists(index_file):
+        print(f"  {name}: off (no {path})")
+        return
+    index = load(index_file)
+    stale = index is None or index.signature != library_signature(json_path)
+    print(f"  {name}: {path}")
+    print(f"  tracks: {describe(index) if index is not None else '?'}"
+          f"{f' (stale: {on_stale})' if stale else ''}")
+
+
+def _compact_locked(path: str):
+    data = _replay(read_snapshot(path), _read_journal(path))
+    write_atomic(path, data)
+    # The snapshot now contains every journaled entry; a crash before this
+    # truncate only means they are replayed (idempotently) once more
+    with open(journal_path(path), "w", encoding="utf-8"):
+        pass
+
+
+def compact(path: str = DB_PATH):
+    """Fold the journal into the snapshot."""
+    with locked(path):
+        _compact_locked(path)
+
+
+def _should_compact(path: str) -> bool:
+    try:
+        journal_size = os.path.getsize(journal_path(path))
+    except OSError:
+        return False
+    try:
+        snapshot_size = os.path.getsize(path)
+    except OSError:
+        snapshot_size = 0
+    return journal_size > max(COMPACT_MIN_BYTES, snapshot_size * COMPACT_RATIO)
+
+
+def save_entries(entries: list[dict], path: str = DB_PATH):
+    """Durably record new/updated tracks: one journal append, compacting when due."""
+    if not entries:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    lines = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries)
+    with locked(path):
+        with open(journal_path(path), "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        if _should_compact(path):
+            _compact_locked(path)
+
+
+def save_tracks(tracks: list[dict], path: str = DB_PATH):
+    """Replace the whole library (for bulk edits): atomic snapshot write, journal cleared."""
+    with locked(path):
+        data = read_snapshot(path)
+        data["tracks"] = tracks
+        write_atomic(path, data)
+        with open(journal_path(path), "w", encoding="utf-8"):
+            pass
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("compact", "status"):
+        print(__doc__.strip())
+        sys.exit(1)
+
+    if sys.argv[1] == "compact":
+        compact()
+        print(f"  compacted {len(load_tracks())} tracks into {os.path.normpath(DB_PATH)}")
+    else:
+        snapshot = os.path.getsize(DB_PATH) if os.path.exists(DB_PATH) else 0
+        journal = journal_path()
+        pending = len(_read_journal(DB_PATH))
+        print(f"  snapshot: {os.path.normpath(DB_PATH)} ({snapshot / 1024:.0f} KB)")
+        print(f"  journal:  {os.path.normpath(journal)} ({pending} pending entries)")
+        print(f"  tracks:   {len(load_tracks())}")
+
+
+if __name__ == "__main__":
+    main()